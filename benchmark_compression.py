@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark đọc + parse SQL log nén (gzip, bz2, xz, zstd) so với file không nén
+
+Chỉ đo phần đọc/giải nén/parse (không ghi database) để thấy chi phí giải nén.
+
+Cách chạy:
+    python benchmark_compression.py                  # 1.000.000 dòng
+    python benchmark_compression.py --lines 5000000
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import time
+import argparse
+
+from logs.compression import open_log_file, zstandard
+from logs.parsing import parse_log_line
+from benchmark_parser import build_corpus
+
+
+def write_files(directory, total_lines):
+    """Ghi cùng một nội dung ra file thường và các định dạng nén"""
+    corpus = build_corpus()
+    plain_path = os.path.join(directory, 'logsql.log')
+    with open(plain_path, 'w', encoding='utf-8') as file:
+        for i in range(total_lines):
+            file.write(corpus[i % len(corpus)])
+
+    openers = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+    if zstandard is not None:
+        openers['.zst'] = lambda path, mode: zstandard.open(path, mode)
+
+    paths = {'plain': plain_path}
+    for extension, opener in openers.items():
+        path = plain_path + extension
+        with open(plain_path, 'rb') as source, opener(path, 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        paths[extension[1:]] = path
+    return paths
+
+
+def measure(name, file_path, plain_size):
+    """Đọc và parse toàn bộ file, in số dòng/giây và MB/giây (tính trên dữ liệu đã giải nén)"""
+    lines = 0
+    start = time.perf_counter()
+    file, raw_file, compression = open_log_file(file_path)
+    with raw_file, file:
+        for raw_line in file:
+            parse_log_line(raw_line.decode('utf-8'))
+            lines += 1
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(file_path)
+    print(f"{name:<8} {size / 1024 / 1024:>9.1f} MB ({size / plain_size:>6.1%})  {elapsed:>7.2f} s  "
+          f"{lines / elapsed:>12,.0f} dòng/s  {plain_size / 1024 / 1024 / elapsed:>8.1f} MB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark đọc SQL log nén')
+    parser.add_argument('--lines', type=int, default=1_000_000, help='Số dòng của file test (mặc định 1.000.000)')
+    args = parser.parse_args()
+
+    print("=== BENCHMARK ĐỌC SQL LOG NÉN ===")
+    if zstandard is None:
+        print("(chưa cài zstandard, bỏ qua .zst)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, args.lines)
+        plain_size = os.path.getsize(paths['plain'])
+        baseline = None
+        for name, path in paths.items():
+            elapsed = measure(name, path, plain_size)
+            if baseline is None:
+                baseline = elapsed
+            else:
+                print(f"{'':<8} chậm hơn file thường: x{elapsed / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark tốc độ ghi SQL log khi import từ web: save() từng dòng so với SqlLogBatchWriter
+
+Cách chạy:
+    python benchmark_import.py                      # 1.000.000 dòng
+    python benchmark_import.py --lines 100000 --batch-size 2000
+"""
+
+import os
+import time
+import argparse
+import django
+
+# Thiết lập Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'log_analyzer.settings')
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.utils import timezone
+from logs.models import QueryFingerprint, SqlLog, SqlLogRollup, StatisticsVersion
+from logs.ingestion import iter_uploaded_lines, SqlLogBatchWriter
+
+BENCH_DATABASE = 'BENCHMARK'
+
+
+def build_upload(line_count):
+    """Tạo file upload giả lập theo format timestamp|database|sql_query|exec_time|exec_count"""
+    now = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+    lines = [
+        f"{now}|{BENCH_DATABASE}|SELECT * FROM accounts WHERE account_id = {i}|{i % 3000}|{i % 500 + 1}"
+        for i in range(line_count)
+    ]
+    return SimpleUploadedFile('benchmark.log', '\n'.join(lines).encode('utf-8'))
+
+
+def parse_upload(upload):
+    """Parse file upload giống process_log_file"""
+    for line_num, line in enumerate(iter_uploaded_lines(upload), 1):
+        parts = line.strip().split('|')
+        yield line_num, parts[1], parts[2], int(parts[3]), int(parts[4])
+
+
+def run_per_row_save(upload):
+    """Cách cũ: mỗi dòng một lệnh INSERT và một lần commit"""
+    count = 0
+    for line_num, db_name, sql_query, exec_time_ms, exec_count in parse_upload(upload):
+        SqlLog(
+            database_name=db_name,
+            sql_query=sql_query,
+            exec_time_ms=exec_time_ms,
+            exec_count=exec_count,
+            line_number=line_num
+        ).save()
+        count += 1
+    return count
+
+
+def run_batch_writer(upload, batch_size):
+    """Cách mới: bulk_create theo batch trong transaction"""
+    # Dữ liệu giả lập giống nhau ở mỗi lần chạy: không bỏ qua dòng đã import
+    writer = SqlLogBatchWriter(batch_size=batch_size, deduplicate=False)
+    for line_num, db_name, sql_query, exec_time_ms, exec_count in parse_upload(upload):
+        writer.add(db_name, sql_query, exec_time_ms, exec_count, line_number=line_num)
+    writer.flush()
+    return writer.written_count
+
+
+def cleanup():
+    """Xóa mọi dữ liệu của BENCH_DATABASE: SqlLog, bảng tổng hợp, version thống kê và mẫu câu SQL chỉ nó dùng"""
+    with transaction.atomic():
+        fingerprint_ids = set(
+            SqlLog.objects.filter(database_name=BENCH_DATABASE).exclude(fingerprint=None)
+            .order_by().values_list('fingerprint_id', flat=True).distinct()
+        )
+        rollups = SqlLogRollup.objects.filter(database_name=BENCH_DATABASE)
+        fingerprint_ids.update(rollups.order_by().values_list('fingerprint_id', flat=True).distinct())
+        SqlLog.objects.filter(database_name=BENCH_DATABASE).delete()
+        rollups.delete()
+        StatisticsVersion.objects.filter(database_name=BENCH_DATABASE).delete()
+        QueryFingerprint.objects.filter(id__in=fingerprint_ids, logs__isnull=True, rollups__isnull=True).delete()
+
+
+def measure(name, func, *args):
+    """Chạy một phương pháp ghi và in số dòng/giây"""
+    cleanup()
+    start = time.perf_counter()
+    rows = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<25} {rows:>12,} dòng  {elapsed:>9.2f} s  {rows / elapsed:>12,.0f} dòng/s")
+    cleanup()
+    return rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ghi SQL log khi import')
+    parser.add_argument('--lines', type=int, default=1_000_000, help='Số dòng giả lập (mặc định 1.000.000)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Kích thước batch cho bulk_create')
+    parser.add_argument('--skip-per-row', action='store_true', help='Bỏ qua cách cũ (rất chậm với file lớn)')
+    args = parser.parse_args()
+
+    print("=== BENCHMARK IMPORT SQL LOG ===")
+    print(f"Database: {django.db.connection.vendor}, số dòng: {args.lines:,}, batch size: {args.batch_size}")
+    upload = build_upload(args.lines)
+
+    before = None if args.skip_per_row else measure('save() từng dòng', run_per_row_save, upload)
+    after = measure(f'bulk_create (batch {args.batch_size})', run_batch_writer, upload, args.batch_size)
+
+    if before:
+        print(f"\nTăng tốc: x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark index SqlLog: in EXPLAIN (kế hoạch thực thi) của các truy vấn mà view dùng
+
+Sinh dữ liệu giả lập cố định (seed) cho vài database BENCH_*, chạy ANALYZE rồi in
+kế hoạch + thời gian của từng truy vấn. --compare chạy thêm một lượt sau khi xóa
+các index của migration 0013/0014 trong transaction (rollback sau khi đo) để so
+sánh trước/sau (chỉ PostgreSQL). Nên chạy trên PostgreSQL (EXPLAIN ANALYZE);
+SQLite chỉ có EXPLAIN QUERY PLAN.
+
+Cách chạy:
+    python benchmark_indexes.py                      # 1.000.000 dòng
+    python benchmark_indexes.py --rows 5000000 --compare
+    python benchmark_indexes.py --no-generate --keep # dùng lại dữ liệu đã sinh
+"""
+
+import os
+import time
+import random
+import argparse
+import django
+
+# Thiết lập Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'log_analyzer.settings')
+django.setup()
+
+from datetime import timedelta
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+from logs.models import SqlLog, SqlLogRollup
+from logs.ingestion import SqlLogBatchWriter, SqlLogCopyWriter
+from logs.pagination import ORDERING, seek_filter
+from logs.rollups import bump_statistics_versions
+
+BENCH_DATABASES = ['BENCH_A', 'BENCH_B', 'BENCH_C', 'BENCH_D', 'BENCH_E']
+
+# Index được thêm cho các view (migration 0013, 0014) và index đơn cột mà chúng thay thế
+VIEW_INDEXES = [
+    index for index in SqlLog._meta.indexes
+    if index.fields[0] == 'database_name' or index.condition is not None or index.fields == ['created_at', 'id']
+]
+OLD_INDEXES = [
+    models.Index(fields=['database_name'], name='bench_sqllog_database_idx'),
+    models.Index(fields=['created_at'], name='bench_sqllog_created_idx'),
+]
+
+
+def cleanup():
+    """Xóa dữ liệu BENCH_* (cả bảng tổng hợp) để không lẫn vào dashboard"""
+    with transaction.atomic():
+        SqlLog.objects.filter(database_name__in=BENCH_DATABASES).delete()
+        SqlLogRollup.objects.filter(database_name__in=BENCH_DATABASES).delete()
+        bump_statistics_versions(BENCH_DATABASES)
+
+
+def generate(rows, batch_size, seed):
+    """Sinh dữ liệu: database lệch (BENCH_A nhiều nhất), khoảng 2% truy vấn bất thường"""
+    rng = random.Random(seed)
+    writer_class = SqlLogCopyWriter if connection.vendor == 'postgresql' else SqlLogBatchWriter
+    start = timezone.now() - timedelta(days=90)
+    step = timedelta(days=90) / rows
+    # Dữ liệu giả lập giống nhau ở mỗi lần chạy: không bỏ qua dòng đã import
+    with writer_class(batch_size=batch_size, deduplicate=False) as writer:
+        for i in range(rows):
+            database_name = BENCH_DATABASES[min(int(rng.expovariate(1.0)), len(BENCH_DATABASES) - 1)]
+            abnormal = rng.random() < 0.02
+            exec_time_ms = rng.randint(501, 20000) if abnormal else rng.randint(1, 800)
+            exec_count = rng.randint(101, 5000) if abnormal else rng.randint(1, 150)
+            writer.add(
+                database_name, f'SELECT * FROM table_{i % 200} WHERE id = {i}', exec_time_ms, exec_count,
+                line_number=i + 1, created_at=start + step * i
+            )
+    return writer.written_count
+
+
+def view_queries():
+    """Các truy vấn giống hệt trong logs/views.py (user thường: lọc database_name__in)"""
+    accessible = BENCH_DATABASES[:3]
+    logs = SqlLog.objects.filter(database_name__in=accessible)
+    one_db = logs.filter(database_name='BENCH_B')
+    abnormal = SqlLog.objects.filter(exec_time_ms__gt=500, exec_count__gt=100, database_name__in=accessible)
+    # Khóa của dòng thứ 20.000 (tương đương trang 1.000 với 20 dòng/trang)
+    # (hoặc dòng cũ nhất nếu dữ liệu ít hơn)
+    deep = (one_db.order_by(*ORDERING).values_list('created_at', 'id')[20000 - 1:20000].first()
+            or one_db.order_by('created_at', 'id').values_list('created_at', 'id').first())
+
+    return [
+        ('index: trang đầu', lambda: logs.order_by(*ORDERING)[:21]),
+        ('index: trang 1.000 (cursor), 1 database', lambda: one_db.filter(
+            seek_filter(*deep)
+        ).order_by(*ORDERING)[:21]),
+        ('statistics: chậm nhất', lambda: logs.order_by('-exec_time_ms')[:10]),
+        ('statistics: chậm nhất, 1 database', lambda: one_db.order_by('-exec_time_ms')[:10]),
+        ('statistics: thực thi nhiều nhất, 1 database', lambda: one_db.order_by('-exec_count')[:10]),
+        ('abnormal_queries: trang đầu', lambda: abnormal.order_by('-created_at')[:20]),
+        ('abnormal_queries: trang đầu, 1 database', lambda: abnormal.filter(
+            database_name='BENCH_B'
+        ).order_by('-created_at')[:20]),
+        ('abnormal_queries: theo database', lambda: abnormal.values('database_name').annotate(
+            count=Count('id'), avg_exec_time=Avg('exec_time_ms'), avg_exec_count=Avg('exec_count')
+        ).order_by('-count')),
+        ('báo cáo abnormal: theo exec_time_ms', lambda: abnormal.order_by('-exec_time_ms')[:1000]),
+    ]
+
+
+def explain_all(title):
+    """In kế hoạch và thời gian của mỗi truy vấn"""
+    print(f"\n##### {title} #####")
+    options = {'analyze': True, 'buffers': True} if connection.vendor == 'postgresql' else {}
+    for name, build in view_queries():
+        queryset = build()
+        start = time.perf_counter()
+        list(queryset)
+        elapsed = time.perf_counter() - start
+        print(f"\n--- {name}: {elapsed * 1000:.1f} ms")
+        print(queryset.explain(**options))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN các truy vấn của view trên SqlLog')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Số dòng giả lập (mặc định 1.000.000)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Kích thước batch khi sinh dữ liệu')
+    parser.add_argument('--seed', type=int, default=42, help='Seed sinh dữ liệu (mặc định 42)')
+    parser.add_argument('--compare', action='store_true', help='Đo thêm khi chưa có các index cho view')
+    parser.add_argument('--no-generate', action='store_true', help='Dùng lại dữ liệu BENCH_* đã có')
+    parser.add_argument('--keep', action='store_true', help='Không xóa dữ liệu BENCH_* sau khi chạy')
+    args = parser.parse_args()
+
+    print("=== BENCHMARK INDEX SQLLOG (EXPLAIN) ===")
+    print(f"Database: {connection.vendor}")
+    if not args.no_generate:
+        cleanup()
+        start = time.perf_counter()
+        written = generate(args.rows, args.batch_size, args.seed)
+        print(f"Sinh {written:,} dòng trong {time.perf_counter() - start:.1f} s")
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    try:
+        if args.compare and connection.vendor != 'postgresql':
+            print("--compare chỉ hỗ trợ PostgreSQL, bỏ qua")
+        elif args.compare:
+            # DDL trên PostgreSQL nằm trong transaction nên rollback trả lại index
+            with transaction.atomic():
+                with connection.schema_editor(atomic=False) as schema_editor:
+                    for index in VIEW_INDEXES:
+                        schema_editor.remove_index(SqlLog, index)
+                    for index in OLD_INDEXES:
+                        schema_editor.add_index(SqlLog, index)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                explain_all('TRƯỚC: chỉ có index đơn cột')
+                transaction.set_rollback(True)
+        explain_all('SAU: index composite/partial')
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
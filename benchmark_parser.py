@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark parser dòng SQL log (logs.parsing) so với regex cũ
+
+Cách chạy:
+    python benchmark_parser.py                  # corpus giả lập 10.000.000 dòng
+    python benchmark_parser.py --lines 1000000
+    python benchmark_parser.py --corpus logsql.log --lines 3000000
+"""
+
+import re
+import time
+import random
+import argparse
+from itertools import cycle, islice
+
+from logs.parsing import parse_log_line
+
+DATABASES = ['T24VN', 'WAY4', 'EBANK', 'CRM', 'CARD']
+TABLES = ['transactions', 'accounts', 'users', 'action_log', 'customers']
+
+
+def legacy_parse_log_line(line):
+    """Cách cũ: re.match với pattern dạng chuỗi ở mỗi lần gọi"""
+    pattern = r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
+    match = re.match(pattern, line.strip())
+    if match:
+        database_name, sql_query, exec_time_ms, exec_count = match.groups()
+        return {
+            'database_name': database_name,
+            'sql_query': sql_query,
+            'exec_time_ms': int(exec_time_ms),
+            'exec_count': int(exec_count)
+        }
+    return None
+
+
+_match_without_commas = re.compile(
+    r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
+).match
+
+
+def precompiled_parse_log_line(line):
+    """Regex [^,]+ compile sẵn (trước khi hỗ trợ SQL có dấu phẩy)"""
+    match = _match_without_commas(line.strip())
+    if match is None:
+        return None
+    database_name, sql_query, exec_time_ms, exec_count = match.groups()
+    return database_name, sql_query, int(exec_time_ms), int(exec_count)
+
+
+def build_corpus(distinct_lines=100_000, seed=42):
+    """Tạo tập dòng log giả lập giống logsql.log (~1% dòng lỗi, ~10% SQL có dấu phẩy)"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(distinct_lines):
+        if i % 100 == 99:
+            lines.append(f"invalid line {i}\n")
+            continue
+        table = rng.choice(TABLES)
+        columns = 'id, name, balance' if i % 10 == 0 else '*'
+        lines.append(
+            f"DB:{rng.choice(DATABASES)},sql:SELECT {columns} FROM {table} WHERE id = {rng.randint(1, 10**6)},"
+            f"exec_time_ms:{rng.randint(1, 6000)},exec_count:{rng.randint(1, 600)}\n"
+        )
+    return lines
+
+
+def load_corpus(file_path):
+    """Đọc corpus từ file log thật (VD: logsql.log)"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return [line for line in file if line.strip()]
+
+
+def measure(name, parse, corpus, total_lines):
+    """Parse total_lines dòng (lặp lại corpus) và in số dòng/giây"""
+    parsed = 0
+    start = time.perf_counter()
+    for line in islice(cycle(corpus), total_lines):
+        if parse(line) is not None:
+            parsed += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {total_lines:>12,} dòng  {elapsed:>8.2f} s  {total_lines / elapsed:>12,.0f} dòng/s"
+          f"  (parse được {parsed / total_lines:.1%})")
+    return total_lines / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark parser SQL log')
+    parser.add_argument('--lines', type=int, default=10_000_000, help='Số dòng cần parse (mặc định 10.000.000)')
+    parser.add_argument('--corpus', help='File log dùng làm corpus (mặc định: corpus giả lập)')
+    args = parser.parse_args()
+
+    print("=== BENCHMARK PARSER SQL LOG ===")
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus()
+    print(f"Corpus: {args.corpus or 'giả lập'} ({len(corpus):,} dòng khác nhau)")
+
+    before = measure('re.match (cũ)', legacy_parse_log_line, corpus, args.lines)
+    precompiled = measure('regex [^,]+ compile sẵn', precompiled_parse_log_line, corpus, args.lines)
+    after = measure('logs.parsing.parse_log_line', parse_log_line, corpus, args.lines)
+
+    print(f"\nSo với re.match cũ: x{after / before:.2f}")
+    print(f"So với regex [^,]+ compile sẵn: x{after / precompiled:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark tạo PDF báo cáo chi tiết với nhiều dòng
+
+Dữ liệu giả lập được đưa thẳng vào export_detailed_pdf (không đọc database) để chỉ
+đo phần dựng PDF: bảng chia theo trang (pdf_rendering.iter_table_chunks), lặp lại
+dòng tiêu đề, file tạm khi vượt REPORT_PDF_SPOOL_BYTES. --compare đo thêm cách cũ
+(một Table chứa mọi dòng, ghi vào BytesIO) cho các cỡ không quá --compare-max dòng,
+vì thời gian layout của cách cũ tăng nhanh hơn tuyến tính. --memory đo bộ nhớ cấp
+phát lớn nhất bằng tracemalloc (chạy chậm hơn vài lần).
+
+Cách chạy:
+    python benchmark_pdf.py                          # 10.000, 100.000, 1.000.000 dòng
+    python benchmark_pdf.py --rows 10000 100000 --compare --memory
+"""
+
+import io
+import os
+import time
+import argparse
+import tracemalloc
+import django
+
+# Thiết lập Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'log_analyzer.settings')
+django.setup()
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table
+from logs import pdf_rendering
+from logs.reports import DETAILED_REPORT_HEADERS, export_detailed_pdf, truncate_sql
+
+
+def generate_rows(total):
+    """Dòng báo cáo chi tiết giả lập (cùng dạng với iter_detailed_rows)"""
+    for i in range(total):
+        exec_time_ms = 50 + (i * 37) % 5000
+        exec_count = 1 + (i * 13) % 400
+        yield [
+            i + 1,
+            f'BENCH_{"ABCDE"[i % 5]}',
+            truncate_sql(f'SELECT c.id, c.ten_khach_hang, a.so_du FROM khach_hang c JOIN tai_khoan a '
+                         f'ON a.khach_hang_id = c.id WHERE c.chi_nhanh = {i % 97} AND a.trang_thai = \'ĐANG DÙNG\''),
+            exec_time_ms,
+            exec_count,
+            round(exec_time_ms / exec_count, 2),
+            i + 1,
+            '01/01/2025 08:00:00',
+        ]
+
+
+def render_paged(total):
+    """Cách hiện tại: export_detailed_pdf, trả về (số byte, có ghi ra file tạm không)"""
+    response = export_detailed_pdf(generate_rows(total), total, '')
+    try:
+        return int(response['Content-Length']), response.file_to_stream._rolled
+    finally:
+        response.close()
+
+
+def render_single_table(total):
+    """Cách cũ: một Table chứa mọi dòng, dựng trong BytesIO"""
+    buffer = io.BytesIO()
+    table = Table(
+        [DETAILED_REPORT_HEADERS] + [[str(value) for value in row] for row in generate_rows(total)],
+        colWidths=[0.8*inch] * len(DETAILED_REPORT_HEADERS), repeatRows=1
+    )
+    table.setStyle(pdf_rendering.data_table_style(8, 6))
+    SimpleDocTemplate(buffer, pagesize=A4).build([table])
+    return len(buffer.getvalue()), False
+
+
+def measure(name, render, total, memory):
+    """Chạy render(total), in thời gian, dòng/giây, kích thước file và bộ nhớ lớn nhất"""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size, spooled = render(total)
+    elapsed = time.perf_counter() - start
+    peak = ''
+    if memory:
+        peak = f'  {tracemalloc.get_traced_memory()[1] / 1024 / 1024:>8.1f} MB'
+        tracemalloc.stop()
+    print(f"{name:<12} {total:>10,} dòng  {elapsed:>8.2f} s  {total / elapsed:>8,.0f} dòng/s  "
+          f"{size / 1024 / 1024:>8.1f} MB{' (file tạm)' if spooled else ''}{peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tạo PDF báo cáo chi tiết')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Số dòng của mỗi lần đo (mặc định 10.000 100.000 1.000.000)')
+    parser.add_argument('--compare', action='store_true', help='Đo thêm cách cũ (một Table cho mọi dòng)')
+    parser.add_argument('--compare-max', type=int, default=100_000,
+                        help='Chỉ đo cách cũ với số dòng không quá giá trị này (mặc định 100.000)')
+    parser.add_argument('--memory', action='store_true', help='Đo bộ nhớ cấp phát lớn nhất (tracemalloc)')
+    args = parser.parse_args()
+
+    print("=== BENCHMARK PDF BÁO CÁO CHI TIẾT ===")
+    print(f"Font: {pdf_rendering.pdf_font()}, {pdf_rendering.PDF_TABLE_CHUNK_ROWS} dòng mỗi bảng")
+    for total in args.rows:
+        measure('chia trang', render_paged, total, args.memory)
+        if args.compare and total <= args.compare_max:
+            measure('một bảng', render_single_table, total, args.memory)
+
+
+if __name__ == '__main__':
+    main()
@@ -239,6 +239,9 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# File báo cáo tạo nền (ReportJob) lưu trong MEDIA_ROOT/reports/, chỉ tải qua view có kiểm tra quyền
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -256,3 +259,25 @@ LOGOUT_REDIRECT_URL = '/auth/login/'
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+
+# Log import settings
+LOG_IMPORT_BATCH_SIZE = 1000  # Số dòng mỗi lần bulk_create khi import từ web
+INGESTED_LINE_RETENTION_DAYS = 90  # Giữ hash chống trùng (IngestedLine) bao nhiêu ngày, compact_logs xóa hash cũ hơn (None: giữ mãi)
+
+# Report settings
+REPORT_CHUNK_SIZE = 2000  # Số dòng mỗi lần đọc từ server-side cursor khi tạo báo cáo
+REPORT_JOB_TTL_HOURS = 24  # File báo cáo tạo nền được giữ bao nhiêu giờ trước khi bị xóa
+REPORT_JOB_STALE_SECONDS = 1800  # Job đang chạy không cập nhật tiến độ quá lâu (worker bị dừng) được đưa lại vào hàng đợi
+REPORT_CACHE_DIR = BASE_DIR / 'report_cache'  # Cache file báo cáo đã tạo (xem logs/report_cache.py)
+REPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Dung lượng tối đa của cache báo cáo (0: tắt)
+PDF_FONT_PATH = None  # File .ttf hỗ trợ tiếng Việt cho báo cáo PDF (None: tìm trong logs/fonts/ và font hệ thống)
+REPORT_PDF_MAX_ROWS = 100000  # Số dòng tối đa của báo cáo chi tiết PDF (0: không giới hạn, CSV luôn đủ dòng)
+REPORT_PDF_SYNC_MAX_ROWS = 2000  # PDF chi tiết / bất thường nhiều dòng hơn được tự chuyển sang tạo nền (0: luôn tạo trong request)
+REPORT_PDF_SPOOL_BYTES = 8 * 1024 * 1024  # PDF lớn hơn được ghi ra file tạm thay vì giữ trong bộ nhớ
+
+# Statistics settings
+STATISTICS_CACHE_TIMEOUT = 300  # Số giây cache thống kê (cache cũng hết hiệu lực ngay khi có import mới)
+
+# SqlLog partitioning settings (PostgreSQL, xem lệnh manage_partitions)
+SQLLOG_PARTITION_MONTHS_AHEAD = 3  # Số tháng tới được tạo trước phân vùng
+SQLLOG_RETENTION_MONTHS = None  # Giữ SqlLog bao nhiêu tháng (None: không xóa phân vùng cũ)
@@ -4,7 +4,6 @@
 Script để đọc file logsql.log và lưu vào H2 database in-memory
 """
 
-import re
 import logging
 from typing import List, Dict, Optional
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, text
@@ -13,6 +12,8 @@ from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
 
+from logs.parsing import parse_log_line, LOG_FIELDS
+
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -82,19 +83,11 @@ class LogProcessor:
             Dictionary chứa thông tin đã parse hoặc None nếu không parse được
         """
         try:
-            # Pattern để parse log line
             # Format: DB:database_name,sql:SQL_query,exec_time_ms:time,exec_count:count
-            pattern = r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
-            match = re.match(pattern, line.strip())
+            parsed = parse_log_line(line)
             
-            if match:
-                database_name, sql_query, exec_time_ms, exec_count = match.groups()
-                return {
-                    'database_name': database_name,
-                    'sql_query': sql_query,
-                    'exec_time_ms': int(exec_time_ms),
-                    'exec_count': int(exec_count)
-                }
+            if parsed:
+                return dict(zip(LOG_FIELDS, parsed))
             else:
                 logger.warning(f"Không thể parse dòng: {line.strip()}")
                 return None
@@ -5,12 +5,13 @@ Script đơn giản để đọc file logsql.log và hiển thị thống kê
 Không cần database, chỉ đọc và phân tích dữ liệu
 """
 
-import re
 import json
 from typing import List, Dict, Optional
 from datetime import datetime
 import os
 
+from logs.parsing import parse_log_line, LOG_FIELDS
+
 class SimpleLogReader:
     """Class đơn giản để đọc và phân tích file log"""
     
@@ -21,17 +22,9 @@ class SimpleLogReader:
     def parse_log_line(self, line: str) -> Optional[Dict]:
         """Parse một dòng log thành dictionary"""
         try:
-            pattern = r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
-            match = re.match(pattern, line.strip())
-            
-            if match:
-                database_name, sql_query, exec_time_ms, exec_count = match.groups()
-                return {
-                    'database_name': database_name,
-                    'sql_query': sql_query,
-                    'exec_time_ms': int(exec_time_ms),
-                    'exec_count': int(exec_count)
-                }
+            parsed = parse_log_line(line)
+            if parsed:
+                return dict(zip(LOG_FIELDS, parsed))
             return None
         except Exception as e:
             print(f"Lỗi khi parse dòng '{line}': {e}")
@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import SqlLog, LogFile
+from django.db import transaction
+from .models import SqlLog, LogFile, QueryFingerprint, LogCompaction, ReportJob
+from .rollups import bump_statistics_versions, refresh_rollups
+
+# Các trường của SqlLog mà bảng tổng hợp dùng (thứ tự của refresh_rollups)
+ROLLUP_FIELDS = ('database_name', 'fingerprint_id', 'exec_time_ms', 'exec_count', 'created_at')
 
 
 @admin.register(SqlLog)
@@ -11,11 +16,12 @@ class SqlLogAdmin(admin.ModelAdmin):
     list_filter = ['database_name', 'created_at']
     search_fields = ['sql_query', 'database_name']
     readonly_fields = ['avg_time_per_execution', 'exec_time_seconds']
+    raw_id_fields = ['fingerprint']
     ordering = ['-created_at']
     
     fieldsets = (
         ('Thông tin cơ bản', {
-            'fields': ('database_name', 'sql_query', 'line_number')
+            'fields': ('database_name', 'sql_query', 'fingerprint', 'line_number')
         }),
         ('Thống kê thực thi', {
             'fields': ('exec_time_ms', 'exec_count', 'avg_time_per_execution', 'exec_time_seconds')
@@ -25,14 +31,66 @@ class SqlLogAdmin(admin.ModelAdmin):
         }),
     )
 
+    # Sửa log qua admin cũng cập nhật bảng tổng hợp, làm mới cache thống kê và cache báo cáo
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            removed = list(SqlLog.objects.filter(pk=obj.pk).values_list(*ROLLUP_FIELDS)) if change else []
+            super().save_model(request, obj, form, change)
+            refresh_rollups(removed, [tuple(getattr(obj, field) for field in ROLLUP_FIELDS)])
+            bump_statistics_versions({obj.database_name} | {row[0] for row in removed})
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            refresh_rollups([tuple(getattr(obj, field) for field in ROLLUP_FIELDS)])
+            bump_statistics_versions([obj.database_name])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            removed = list(queryset.values_list(*ROLLUP_FIELDS))
+            super().delete_queryset(request, queryset)
+            refresh_rollups(removed)
+            bump_statistics_versions({row[0] for row in removed})
+
+
+@admin.register(QueryFingerprint)
+class QueryFingerprintAdmin(admin.ModelAdmin):
+    list_display = ['id', 'normalized_sql', 'fingerprint', 'created_at']
+    search_fields = ['normalized_sql', 'fingerprint']
+    readonly_fields = ['fingerprint', 'created_at']
+    ordering = ['-created_at']
+
+    # Mẫu câu SQL được tạo khi import và dùng chung cho SqlLog / bảng tổng hợp: không xóa qua admin
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LogCompaction)
+class LogCompactionAdmin(admin.ModelAdmin):
+    list_display = ['cutoff', 'deleted_rows', 'reclaimed_bytes', 'started_at', 'finished_at']
+    readonly_fields = ['cutoff', 'deleted_rows', 'reclaimed_bytes', 'started_at', 'finished_at']
+    ordering = ['-started_at']
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'user', 'report_type', 'format_type', 'database_filter', 'status',
+        'processed_rows', 'total_rows', 'created_at', 'finished_at', 'expires_at'
+    ]
+    list_filter = ['status', 'report_type', 'format_type']
+    search_fields = ['user__username', 'database_filter']
+    raw_id_fields = ['user']
+    ordering = ['-created_at']
+
 
 @admin.register(LogFile)
 class LogFileAdmin(admin.ModelAdmin):
     list_display = [
         'file_name', 'file_size', 'imported_count', 'skipped_count', 
-        'error_count', 'processed_by', 'processed_at'
+        'error_count', 'status', 'processed_by', 'processed_at'
     ]
-    list_filter = ['processed_at', 'processed_by']
+    list_filter = ['status', 'processed_at', 'processed_by']
     search_fields = ['file_name', 'processed_by__username']
     readonly_fields = ['processed_at']
     ordering = ['-processed_at']
@@ -45,6 +103,9 @@ class LogFileAdmin(admin.ModelAdmin):
             'fields': ('imported_count', 'skipped_count', 'error_count', 'total_lines', 'processed_lines')
         }),
         ('Thông tin xử lý', {
-            'fields': ('processed_by', 'processed_at')
+            'fields': ('processed_by', 'processed_at', 'import_method', 'rows_per_second', 'phase_timings')
+        }),
+        ('Checkpoint', {
+            'fields': ('status', 'last_offset', 'last_line_number', 'inode')
         }),
     )
\ No newline at end of file
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Retention cho SqlLog: xóa dòng cũ sau khi số liệu đã nằm trong bảng tổng hợp
+
+Bucket ngày của SqlLogRollup (theo database và mẫu câu SQL) đã được cộng dồn khi
+import nên chỉ cần gộp thêm các dòng chưa có mẫu (fingerprint NULL) trước khi xóa.
+Dòng được xóa theo batch, mỗi batch một transaction ngắn và khóa các dòng của
+batch (SELECT ... FOR UPDATE) nên an toàn khi import vẫn đang chạy hoặc có hai
+lần compact cùng lúc.
+
+Hash chống trùng IngestedLine cũng được xóa theo batch sau
+INGESTED_LINE_RETENTION_DAYS ngày (prune_ingested_lines).
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import BigIntegerField, Count, Max, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Length
+from django.utils import timezone
+
+from .ingestion import SqlLogBatchWriter
+from .models import IngestedLine, LogCompaction, SqlLog, SqlLogRollup
+from .rollups import bump_statistics_versions
+
+
+def compaction_cutoff(days):
+    """Đầu ngày (giờ địa phương) cách đây days ngày: trùng ranh giới bucket ngày"""
+    local_time = timezone.localtime(timezone.now() - timedelta(days=days))
+    return local_time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def latest_cutoff(using='default'):
+    """Mốc compact mới nhất (kể cả lần bị dừng giữa chừng), None nếu chưa compact"""
+    return LogCompaction.objects.using(using).aggregate(cutoff=Max('cutoff'))['cutoff']
+
+
+def row_size(using='default'):
+    """Biểu thức kích thước một dòng SqlLog (byte); ước lượng theo độ dài text nếu không phải PostgreSQL"""
+    if connections[using].vendor == 'postgresql':
+        return RawSQL(f'pg_column_size({SqlLog._meta.db_table}.*)', [], output_field=BigIntegerField())
+    # 8 byte cho mỗi cột số/thời gian
+    return (Length('database_name') + Length('sql_query')
+            + Coalesce(Length('optimization_suggestion'), Value(0)) + Value(48))
+
+
+def estimate(cutoff, using='default'):
+    """(số dòng, tổng byte) của các SqlLog sẽ bị compact"""
+    totals = SqlLog.objects.using(using).filter(created_at__lt=cutoff).aggregate(
+        rows=Count('id'), size=Coalesce(Sum(row_size(using)), Value(0))
+    )
+    return totals['rows'], totals['size']
+
+
+def compact_logs(cutoff, batch_size=5000, using='default', pause=0.0, progress=None):
+    """
+    Gộp và xóa các SqlLog tạo trước cutoff theo batch, trả về LogCompaction đã lưu
+
+    progress(compaction) được gọi sau mỗi batch; pause (giây) là thời gian nghỉ
+    giữa các batch để nhường tài nguyên cho import.
+    """
+    # Lưu mốc trước khi xóa để rebuild_rollups giữ các bucket cũ kể cả khi bị dừng giữa chừng
+    compaction = LogCompaction.objects.using(using).create(cutoff=cutoff)
+    writer = SqlLogBatchWriter(using=using)
+    old_logs = SqlLog.objects.using(using).filter(created_at__lt=cutoff)
+
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(
+                old_logs.select_for_update().annotate(row_bytes=row_size(using))
+                .order_by('created_at', 'id').values_list('id', 'fingerprint_id', 'row_bytes')[:batch_size]
+            )
+            if not batch:
+                break
+            ids = [log_id for log_id, _, _ in batch]
+
+            # Dòng chưa có mẫu câu SQL chưa nằm trong bảng tổng hợp
+            missing = [log_id for log_id, fingerprint_id, _ in batch if fingerprint_id is None]
+            if missing:
+                rows = list(old_logs.filter(id__in=missing).values_list(
+                    'database_name', 'sql_query', 'exec_time_ms', 'exec_count', 'line_number', 'created_at'
+                ))
+                writer.resolve_fingerprints(rows)
+                writer.update_rollups(rows)
+
+            deleted, _ = old_logs.filter(id__in=ids).delete()
+            compaction.deleted_rows += deleted
+            compaction.reclaimed_bytes += sum(row_bytes for _, _, row_bytes in batch)
+            compaction.save(using=using, update_fields=['deleted_rows', 'reclaimed_bytes'])
+
+        if progress is not None:
+            progress(compaction)
+        if pause:
+            time.sleep(pause)
+
+    # Bucket giờ trước cutoff không còn cần: số liệu đã có trong bucket ngày
+    with transaction.atomic(using=using):
+        hourly = SqlLogRollup.objects.using(using).filter(period='hour', bucket_start__lt=cutoff)
+        database_names = set(hourly.order_by().values_list('database_name', flat=True).distinct())
+        hourly.delete()
+        bump_statistics_versions(database_names, using)
+        compaction.finished_at = timezone.now()
+        compaction.save(using=using, update_fields=['finished_at'])
+    return compaction
+
+
+def prune_ingested_lines(before, batch_size=5000, using='default'):
+    """Xóa các hash IngestedLine ghi trước before theo batch, trả về số hash đã xóa"""
+    ledger = IngestedLine.objects.using(using)
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            hashes = list(ledger.filter(ingested_at__lt=before).values_list('row_hash', flat=True)[:batch_size])
+            if not hashes:
+                return deleted
+            deleted += ledger.filter(row_hash__in=hashes).delete()[0]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Giải nén file SQL log theo luồng (gzip, bz2, xz và zstd nếu đã cài zstandard)
+
+Dữ liệu được giải nén dần trong lúc đọc, không tạo file tạm. Module này không
+phụ thuộc Django để dùng được cả trong lệnh import lẫn khi upload từ web.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+from typing import BinaryIO, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd là tùy chọn
+    zstandard = None
+
+# Magic number ở đầu file của từng định dạng nén
+MAGIC_NUMBERS = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+COMPRESSED_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+
+PLAIN_EXTENSIONS = ['.log', '.txt', '.sql']
+
+
+def supported_extensions() -> List[str]:
+    """Danh sách phần mở rộng được hỗ trợ (.zst chỉ có khi đã cài zstandard)"""
+    return PLAIN_EXTENSIONS + [
+        extension for extension, compression in COMPRESSED_EXTENSIONS.items()
+        if compression != 'zstd' or zstandard is not None
+    ]
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """Nhận dạng định dạng nén từ các byte đầu file, None nếu là file text"""
+    for magic, compression in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def detect_file_compression(file_path: str) -> Optional[str]:
+    """Nhận dạng định dạng nén của file theo magic number (không dựa vào phần mở rộng)"""
+    with open(file_path, 'rb') as file:
+        return detect_compression(file.read(8))
+
+
+def open_decompressed(fileobj: BinaryIO, compression: Optional[str]) -> BinaryIO:
+    """
+    Bọc một file object (binary) để đọc dữ liệu đã giải nén
+
+    Object trả về hỗ trợ read(), đọc theo dòng và seek() tiến (giải nén rồi bỏ qua).
+    """
+    if compression is None:
+        return fileobj
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(fileobj, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(fileobj, mode='rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError('Cần cài thư viện zstandard để đọc file .zst')
+        reader = zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+        return io.BufferedReader(reader)
+    raise ValueError(f'Định dạng nén không được hỗ trợ: {compression}')
+
+
+def open_log_file(file_path: str) -> Tuple[BinaryIO, BinaryIO, Optional[str]]:
+    """
+    Mở file log (nén hoặc không) ở chế độ binary
+
+    Returns:
+        (stream, raw_file, compression): stream để đọc dữ liệu đã giải nén, raw_file là
+        file gốc (raw_file.tell() cho biết số byte nén đã đọc, dùng cho tiến trình)
+    """
+    raw_file = open(file_path, 'rb')
+    try:
+        compression = detect_compression(raw_file.peek(8)[:8])
+        return open_decompressed(raw_file, compression), raw_file, compression
+    except Exception:
+        raw_file.close()
+        raise
+
+
+def skip_bytes(stream: BinaryIO, count: int, chunk_size: int = 1024 * 1024) -> int:
+    """Bỏ qua count byte đầu của stream đã giải nén (không phải stream nào cũng seek được)"""
+    skipped = 0
+    while skipped < count:
+        data = stream.read(min(chunk_size, count - skipped))
+        if not data:
+            break
+        skipped += len(data)
+    return skipped
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Chuẩn hóa câu SQL thành mẫu (fingerprint) để gom các câu chỉ khác nhau ở giá trị literal
+
+VD: "select *  from users where id = 32" và "SELECT * FROM users WHERE id = 45"
+cùng có mẫu "SELECT * FROM USERS WHERE ID = ?".
+
+Module này không phụ thuộc Django để dùng được trong migration và script độc lập.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Chuỗi trong dấu nháy đơn ('' là dấu nháy được escape)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# Số nguyên/thập phân đứng riêng (không nằm trong tên như table1)
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+# Danh sách IN (?, ?, ?) có độ dài khác nhau được coi là cùng một mẫu
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql_query: str) -> str:
+    """Thay literal bằng ?, gộp khoảng trắng và chuyển về chữ hoa"""
+    normalized = _STRING_LITERAL.sub('?', sql_query)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (?)', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return normalized.upper()
+
+
+@lru_cache(maxsize=65536)
+def fingerprint_sql(sql_query: str) -> Tuple[str, str]:
+    """
+    Trả về (mẫu đã chuẩn hóa, mã hash SHA-1 của mẫu)
+
+    Có cache theo nội dung câu SQL vì log thường lặp lại nguyên văn cùng một câu.
+    """
+    normalized = normalize_sql(sql_query)
+    return normalized, hashlib.sha1(normalized.encode('utf-8')).hexdigest()
@@ -7,6 +7,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
 from .models import CustomUser, DatabasePermission, SqlLog
+from .compression import COMPRESSED_EXTENSIONS, supported_extensions
 
 
 class UserRegistrationForm(forms.Form):
@@ -503,10 +504,12 @@ class LogImportForm(forms.Form):
     
     log_file = forms.FileField(
         label='File Log SQL',
-        help_text='Chọn file log SQL để import (định dạng: .log, .txt, .sql)',
+        help_text='Chọn file log SQL để import (định dạng: {}; file nén được giải nén khi import)'.format(
+            ', '.join(supported_extensions())
+        ),
         widget=forms.FileInput(attrs={
             'class': 'form-control',
-            'accept': '.log,.txt,.sql'
+            'accept': ','.join(supported_extensions())
         })
     )
     
@@ -530,21 +533,31 @@ class LogImportForm(forms.Form):
         })
     )
     
+    deduplicate = forms.BooleanField(
+        label='Bỏ qua dòng đã import',
+        help_text='Nếu bật, các dòng đã import từ file có cùng dòng đầu tiên, kể cả khi tên file khác (cùng số dòng, thời gian và nội dung), sẽ không được ghi lại',
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        })
+    )
+    
     def clean_log_file(self):
         """Validate file upload"""
         file = self.cleaned_data.get('log_file')
         if not file:
             raise ValidationError('Vui lòng chọn file log.')
         
-        # Kiểm tra định dạng file
-        allowed_extensions = ['.log', '.txt', '.sql']
+        # Kiểm tra định dạng file (file nén: .log.gz, .txt.zst, ...)
+        allowed_extensions = supported_extensions()
         file_extension = file.name.lower().split('.')[-1]
         if f'.{file_extension}' not in allowed_extensions:
-            raise ValidationError('File phải có định dạng .log, .txt hoặc .sql')
+            if f'.{file_extension}' in COMPRESSED_EXTENSIONS:
+                raise ValidationError('Cần cài thư viện zstandard trên server để import file .zst')
+            raise ValidationError(f'File phải có định dạng {", ".join(allowed_extensions)}')
         
-        # Kiểm tra kích thước file (giới hạn 10MB)
-        if file.size > 10 * 1024 * 1024:
-            raise ValidationError('File quá lớn. Kích thước tối đa là 10MB.')
+        # Không giới hạn kích thước: file được đọc theo luồng khi import
         
         return file
     
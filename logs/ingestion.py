@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Các tiện ích dùng chung cho việc import SQL log: đọc file theo luồng và ghi theo batch
+(bulk_create hoặc COPY trên PostgreSQL)
+"""
+
+import codecs
+import hashlib
+import io
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .compression import detect_compression, open_decompressed, open_log_file
+from .fingerprint import fingerprint_sql
+from .models import IngestedLine, QueryFingerprint, SqlLog
+from .parsing import parse_log_line
+from .rollups import aggregate_rows, apply_rollups, bump_statistics_versions
+
+logger = logging.getLogger(__name__)
+
+# Số mẫu câu SQL tối đa được cache id trong một writer
+FINGERPRINT_CACHE_SIZE = 100000
+
+# Số hash mỗi câu INSERT ... ON CONFLICT DO NOTHING (2 tham số mỗi hash, giới hạn tham số của SQLite)
+CLAIM_CHUNK_SIZE = 400
+
+
+def row_hash(source, database_name, sql_query, exec_time_ms, exec_count, line_number, created_at=None):
+    """
+    Khóa chống trùng của một dòng log: SHA-1 của nguồn, số dòng, thời gian ghi
+    trong log (nếu có) và nội dung đã parse
+
+    Cùng một dòng chỉ bị coi là trùng khi được đọc lại từ cùng nguồn, cùng vị trí.
+    """
+    timestamp = '' if created_at is None else repr(created_at.timestamp())
+    key = (f'{source}\0{line_number}\0{timestamp}\0{database_name}\0{exec_time_ms}\0{exec_count}'
+           f'\0{sql_query}')
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def log_source(file_path, inode=None):
+    """
+    Định danh nguồn của file log cho row_hash: đường dẫn tuyệt đối và inode
+
+    File được rotate (tạo file mới cùng tên) có inode khác nên số dòng bắt đầu lại
+    từ 1 không bị nhầm với các dòng của file cũ.
+    """
+    if inode is None:
+        inode = os.stat(file_path).st_ino
+    return f'{os.path.abspath(file_path)}#{inode}'
+
+
+def upload_source(first_line):
+    """
+    Định danh nguồn của file upload từ web cho row_hash: SHA-256 của dòng đầu tiên
+
+    File upload không có đường dẫn hay inode; dòng đầu tiên (có thời gian ghi log) giữ
+    nguyên khi file được ghi thêm hoặc upload lại dưới tên khác, nên các dòng đã import
+    vẫn được nhận ra.
+    """
+    return f'upload:{hashlib.sha256(first_line.encode("utf-8")).hexdigest()}'
+
+
+def backfill_ingested_lines(log_file, file_path=None, using='default', batch_size=1000):
+    """
+    Ghi hash IngestedLine cho các SqlLog đã import từ log_file (import_logs,
+    tail_logs) khi chưa bật chống trùng, trả về số hash đã ghi
+
+    SqlLog không lưu file nguồn: dòng của log_file là các dòng tạo trong khoảng
+    processing_time trước hoặc sau processed_at (LogFile được tạo trước khi import,
+    bản cũ của import_logs lưu nó sau khi import xong). Hash chỉ được ghi khi dòng
+    cùng số dòng trong file_path (mặc định log_file.file_path) có đúng nội dung đó,
+    nên một dòng chưa từng import từ file không bao giờ bị bỏ qua.
+    """
+    file_path = file_path or log_file.file_path
+    rows = SqlLog.objects.using(using).filter(
+        created_at__gte=log_file.processed_at - log_file.processing_time,
+        created_at__lte=log_file.processed_at + log_file.processing_time,
+        line_number__isnull=False,
+    ).order_by('line_number').values_list(
+        'line_number', 'database_name', 'sql_query', 'exec_time_ms', 'exec_count'
+    )
+
+    ledger = IngestedLine.objects.using(using)
+    source = log_source(file_path)
+    written = 0
+    hashes = []
+    stream, raw_file, _ = open_log_file(file_path)
+    with raw_file, stream:
+        # Ghép các dòng của file với SqlLog theo số dòng (cả hai đều tăng dần)
+        lines = enumerate(stream, 1)
+        current_number, current = 0, None
+        for line_number, *content in rows.iterator(chunk_size=batch_size):
+            while current_number < line_number:
+                next_line = next(lines, None)
+                if next_line is None:
+                    break
+                current_number, raw_line = next_line
+                current = parse_log_line(raw_line.decode('utf-8', errors='replace'))
+            if current_number != line_number:
+                break
+            if current == tuple(content):
+                hashes.append(IngestedLine(
+                    row_hash=row_hash(source, *content, line_number), ingested_at=log_file.processed_at
+                ))
+            if len(hashes) >= batch_size:
+                ledger.bulk_create(hashes, ignore_conflicts=True)
+                written += len(hashes)
+                hashes = []
+    ledger.bulk_create(hashes, ignore_conflicts=True)
+    return written + len(hashes)
+
+
+def file_checksum(file, chunk_size=1024 * 1024):
+    """SHA-256 của một file đã mở ở chế độ nhị phân (hoặc UploadedFile), đọc theo chunk"""
+    digest = hashlib.sha256()
+    if hasattr(file, 'chunks'):
+        chunks = file.chunks(chunk_size)
+    else:
+        chunks = iter(lambda: file.read(chunk_size), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _DigestReader:
+    """Bọc file đã mở ở chế độ nhị phân: cập nhật digest với mọi byte được đọc"""
+
+    def __init__(self, file, digest):
+        self.file = file
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.digest.update(data)
+        return data
+
+
+def iter_uploaded_lines(uploaded_file, encoding='utf-8', errors='ignore', chunk_size=None, digest=None):
+    """
+    Đọc file upload theo từng chunk và trả về từng dòng (không gồm ký tự xuống dòng)
+
+    Bộ nhớ sử dụng chỉ phụ thuộc vào kích thước chunk và độ dài dòng dài nhất,
+    không phụ thuộc vào kích thước file. Ký tự nhiều byte bị cắt giữa hai chunk
+    được decoder tăng dần ghép lại đúng. File nén (gzip, bz2, xz, zstd) được nhận
+    dạng theo magic number và giải nén dần trong lúc đọc.
+
+    Args:
+        uploaded_file: UploadedFile của Django (hoặc object có phương thức chunks())
+        encoding: Bảng mã của file
+        errors: Cách xử lý byte không hợp lệ (giống bytes.decode)
+        chunk_size: Kích thước mỗi chunk (None = mặc định của Django)
+        digest: Object hashlib (tùy chọn) được cập nhật với toàn bộ byte của file
+            (trước khi giải nén) trong cùng lượt đọc, để không phải đọc lại file
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    pending = ''
+
+    uploaded_file.seek(0)
+    compression = detect_compression(uploaded_file.read(8))
+    uploaded_file.seek(0)
+    if compression:
+        raw = uploaded_file if digest is None else _DigestReader(uploaded_file, digest)
+        stream = open_decompressed(raw, compression)
+        chunk_size = chunk_size or uploaded_file.DEFAULT_CHUNK_SIZE
+        chunks = iter(lambda: stream.read(chunk_size), b'')
+    else:
+        chunks = uploaded_file.chunks(chunk_size)
+
+    for chunk in chunks:
+        if digest is not None and not compression:
+            digest.update(chunk)
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        # Phần sau ký tự xuống dòng cuối cùng có thể chưa hoàn chỉnh
+        pending = lines.pop()
+        yield from lines
+
+    if compression and digest is not None:
+        # Bộ giải nén có thể dừng trước các byte thừa ở cuối file
+        for _ in iter(lambda: raw.read(chunk_size), b''):
+            pass
+
+    # Giống str.split('\n'): luôn trả về phần cuối, kể cả khi rỗng
+    yield pending + decoder.decode(b'', final=True)
+
+
+class SqlLogBatchWriter:
+    """
+    Gom các dòng log đã parse thành batch và ghi bằng bulk_create
+
+    Mỗi batch được ghi trong một transaction riêng: nếu một batch lỗi thì chỉ
+    batch đó bị rollback và được tính là lỗi, các batch khác vẫn được ghi.
+
+    Nếu có checkpoint, hàm checkpoint(position, written_count, failed_count) được
+    gọi trong cùng transaction với batch, với position của dòng cuối cùng trong
+    batch, nên vị trí đã lưu luôn khớp với dữ liệu đã commit.
+
+    Mỗi dòng được gán QueryFingerprint (mẫu câu SQL) ngay khi ghi; các mẫu mới
+    được tạo theo batch và id được cache cho các batch sau. Bảng tổng hợp
+    SqlLogRollup và version thống kê của các database trong batch được cập nhật
+    trong cùng transaction với batch.
+
+    Chống trùng phải được bật (deduplicate) và cần source (xem log_source): dòng
+    có line_number chỉ được ghi khi row_hash của nó chưa có trong IngestedLine
+    (INSERT ... ON CONFLICT DO NOTHING RETURNING cho cả batch), nên import lại
+    cùng một file (kể cả khi file đã được ghi thêm) không tạo dòng trùng.
+    """
+
+    def __init__(self, batch_size=None, using='default', checkpoint=None, deduplicate=False, source=None):
+        if deduplicate and not source:
+            raise ValueError('Cần source (nguồn của các dòng log) để chống trùng')
+        self.batch_size = batch_size or getattr(settings, 'LOG_IMPORT_BATCH_SIZE', 1000)
+        self.using = using
+        self.checkpoint = checkpoint
+        self.deduplicate = deduplicate
+        self.source = source
+        self.duplicate_count = 0
+        self.pending = []
+        self.position = None
+        self.fingerprint_ids = {}
+        self.batch_time = None
+        self.written_count = 0
+        self.failed_count = 0
+        self.errors = []
+        self.write_time = 0.0
+
+    def add(self, database_name, sql_query, exec_time_ms, exec_count, line_number=None, created_at=None,
+            position=None):
+        """Thêm một dòng vào batch, trả về số dòng đã ghi nếu batch được flush"""
+        if created_at is not None and timezone.is_naive(created_at):
+            # Thời gian naive được hiểu theo múi giờ hiện tại (cùng giá trị cho SqlLog và bảng tổng hợp)
+            created_at = timezone.make_aware(created_at)
+        # Import từ web parse exec_time_ms thành float: cắt như cột số nguyên của SqlLog để
+        # bảng tổng hợp (PostgreSQL làm tròn khi ghi) và hash khớp với dòng đã lưu
+        self.pending.append((database_name, sql_query, int(exec_time_ms), int(exec_count), line_number, created_at))
+        if position is not None:
+            self.position = position
+        if len(self.pending) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Ghi batch hiện tại vào database, trả về số dòng đã ghi thành công"""
+        if not self.pending:
+            return 0
+
+        rows, self.pending = self.pending, []
+        position, self.position = self.position, None
+        # Thời gian tạo mặc định của cả batch, dùng chung cho SqlLog và bảng tổng hợp
+        self.batch_time = timezone.now()
+        start_time = time.perf_counter()
+        try:
+            with transaction.atomic(using=self.using):
+                new_rows = self.claim_rows(rows) if self.deduplicate else rows
+                if new_rows:
+                    self.write_batch(new_rows)
+                    self.update_rollups(new_rows)
+                if self.checkpoint is not None and position is not None:
+                    self.checkpoint(position, self.written_count + len(new_rows), self.failed_count)
+        except DatabaseError as e:
+            # Các mẫu câu SQL tạo trong batch này đã bị rollback cùng batch
+            self.fingerprint_ids.clear()
+            first_line, last_line = rows[0][4], rows[-1][4]
+            self.failed_count += len(rows)
+            self.errors.append(f"Batch dòng {first_line}-{last_line}: {str(e)}")
+            logger.error(f"Lỗi khi ghi batch {len(rows)} dòng ({first_line}-{last_line}): {e}")
+            return 0
+        finally:
+            self.write_time += time.perf_counter() - start_time
+
+        self.written_count += len(new_rows)
+        self.duplicate_count += len(rows) - len(new_rows)
+        return len(new_rows)
+
+    def claim_rows(self, rows):
+        """Ghi hash các dòng vào IngestedLine, trả về các dòng chưa từng được import (gọi trong transaction)"""
+        hashes = [
+            row_hash(self.source, *row) if row[4] is not None else None
+            for row in rows
+        ]
+        connection = connections[self.using]
+        table = connection.ops.quote_name(IngestedLine._meta.db_table)
+        column = connection.ops.quote_name('row_hash')
+        ingested_at = connection.ops.adapt_datetimefield_value(self.batch_time)
+        claimed = set()
+        unique_hashes = list(dict.fromkeys(digest for digest in hashes if digest is not None))
+        with connection.cursor() as cursor:
+            for start in range(0, len(unique_hashes), CLAIM_CHUNK_SIZE):
+                chunk = unique_hashes[start:start + CLAIM_CHUNK_SIZE]
+                cursor.execute(
+                    f"INSERT INTO {table} ({column}, {connection.ops.quote_name('ingested_at')}) "
+                    f"VALUES {', '.join(['(%s, %s)'] * len(chunk))} "
+                    f"ON CONFLICT DO NOTHING RETURNING {column}",
+                    [value for digest in chunk for value in (digest, ingested_at)]
+                )
+                claimed.update(row[0] for row in cursor.fetchall())
+
+        new_rows = []
+        for row, digest in zip(rows, hashes):
+            # Dòng không có số dòng không xác định được nên luôn được ghi
+            if digest is None:
+                new_rows.append(row)
+            elif digest in claimed:
+                claimed.discard(digest)
+                new_rows.append(row)
+        return new_rows
+
+    def resolve_fingerprints(self, rows):
+        """Trả về id QueryFingerprint của từng dòng, tạo các mẫu chưa có (gọi trong transaction)"""
+        if len(self.fingerprint_ids) > FINGERPRINT_CACHE_SIZE:
+            self.fingerprint_ids.clear()
+
+        digests = []
+        missing = {}
+        for row in rows:
+            normalized, digest = fingerprint_sql(row[1])
+            digests.append(digest)
+            if digest not in self.fingerprint_ids:
+                missing[digest] = normalized
+
+        if missing:
+            fingerprints = QueryFingerprint.objects.using(self.using)
+            fingerprints.bulk_create(
+                [QueryFingerprint(fingerprint=digest, normalized_sql=normalized)
+                 for digest, normalized in missing.items()],
+                ignore_conflicts=True
+            )
+            self.fingerprint_ids.update(
+                fingerprints.filter(fingerprint__in=list(missing)).values_list('fingerprint', 'id')
+            )
+
+        return [self.fingerprint_ids[digest] for digest in digests]
+
+    def update_rollups(self, rows):
+        """Cộng dồn batch vào SqlLogRollup (gọi sau write_batch, trong cùng transaction)"""
+        fingerprint_ids = self.fingerprint_ids
+        buckets = aggregate_rows(
+            (database_name, fingerprint_ids[fingerprint_sql(sql_query)[1]], exec_time_ms, exec_count,
+             created_at or self.batch_time)
+            for database_name, sql_query, exec_time_ms, exec_count, _, created_at in rows
+        )
+        apply_rollups(buckets, self.using)
+        # Cache thống kê của các database này hết hiệu lực khi batch được commit
+        bump_statistics_versions({database_name for database_name, _, _, _ in buckets}, self.using)
+
+    def write_batch(self, rows):
+        """Ghi danh sách dòng vào database (được gọi bên trong transaction)"""
+        now = self.batch_time or timezone.now()
+        fingerprint_ids = self.resolve_fingerprints(rows)
+        SqlLog.objects.using(self.using).bulk_create([
+            SqlLog(
+                database_name=database_name,
+                sql_query=sql_query,
+                exec_time_ms=exec_time_ms,
+                exec_count=exec_count,
+                line_number=line_number,
+                created_at=created_at or now,
+                fingerprint_id=fingerprint_id,
+            )
+            for (database_name, sql_query, exec_time_ms, exec_count, line_number, created_at), fingerprint_id
+            in zip(rows, fingerprint_ids)
+        ])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Chỉ ghi phần còn lại khi không có exception
+        if exc_type is None:
+            self.flush()
+        return False
+
+
+def _copy_value(value):
+    """Chuyển một giá trị sang định dạng text của lệnh COPY trên PostgreSQL"""
+    if value is None:
+        return '\\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+class SqlLogCopyWriter(SqlLogBatchWriter):
+    """
+    Ghi batch bằng COPY FROM STDIN (psycopg2 copy_expert), không tạo object ORM
+
+    Chỉ dùng được với PostgreSQL; dùng supports_copy() để kiểm tra trước.
+    """
+
+    columns = (
+        'database_name', 'sql_query', 'exec_time_ms', 'exec_count', 'line_number', 'created_at', 'fingerprint_id'
+    )
+
+    @staticmethod
+    def supports_copy(using='default'):
+        """Database có hỗ trợ COPY qua psycopg2 không"""
+        return connections[using].vendor == 'postgresql'
+
+    def write_batch(self, rows):
+        """Ghi danh sách dòng bằng một lệnh COPY (được gọi bên trong transaction)"""
+        now = self.batch_time or timezone.now()
+        fingerprint_ids = self.resolve_fingerprints(rows)
+        buffer = io.StringIO()
+        for (database_name, sql_query, exec_time_ms, exec_count, line_number, created_at), fingerprint_id \
+                in zip(rows, fingerprint_ids):
+            buffer.write('\t'.join((
+                _copy_value(database_name),
+                _copy_value(sql_query),
+                _copy_value(exec_time_ms),
+                _copy_value(exec_count),
+                _copy_value(line_number),
+                _copy_value((created_at or now).isoformat()),
+                _copy_value(fingerprint_id),
+            )))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        connection = connections[self.using]
+        quote_name = connection.ops.quote_name
+        sql = 'COPY {} ({}) FROM STDIN'.format(
+            quote_name(SqlLog._meta.db_table),
+            ', '.join(quote_name(column) for column in self.columns),
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
@@ -0,0 +1,70 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from logs.ingestion import backfill_ingested_lines
+from logs.models import LogFile
+
+
+class Command(BaseCommand):
+    help = 'Record deduplication hashes for SqlLog rows imported from files before --deduplicate was used'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            help='Only backfill imports of this log file path'
+        )
+        parser.add_argument(
+            '--base-dir',
+            type=str,
+            help='Directory that relative log file paths were imported from (default: skip them)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Hashes written per INSERT (default: 1000)'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database to use (default: default)'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        base_dir = options['base_dir']
+
+        # File upload từ web không còn để đối chiếu; LogFile chưa có processing_time
+        # (đang chạy hoặc bị dừng) thì không biết khoảng thời gian của các dòng
+        log_files = LogFile.objects.using(database).filter(
+            processed_by__isnull=True, processing_time__isnull=False
+        ).exclude(file_path='').order_by('processed_at', 'id')
+        if options['file']:
+            log_files = log_files.filter(file_path=options['file'])
+
+        start_time = time.time()
+        total = 0
+        for log_file in log_files:
+            file_path = log_file.file_path
+            if not os.path.isabs(file_path):
+                if base_dir is None:
+                    self.stdout.write(self.style.WARNING(
+                        f'Skipping {file_path}: relative path, use --base-dir to resolve it'
+                    ))
+                    continue
+                file_path = os.path.join(base_dir, file_path)
+            if not os.path.isfile(file_path):
+                self.stdout.write(self.style.WARNING(f'Skipping {file_path}: file not found'))
+                continue
+
+            written = backfill_ingested_lines(
+                log_file, file_path=file_path, using=database, batch_size=options['batch_size']
+            )
+            self.stdout.write(f'{file_path} (import #{log_file.id}): {written:,} hashes')
+            total += written
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Recorded {total:,} deduplication hashes in {time.time() - start_time:.2f}s')
+        )
@@ -0,0 +1,114 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from logs.compaction import compact_logs, compaction_cutoff, estimate, prune_ingested_lines
+from logs.models import IngestedLine, SqlLog
+
+
+def format_bytes(size):
+    """Hiển thị số byte dạng KB/MB/GB"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:,.0f} {unit}' if unit == 'B' else f'{size:,.1f} {unit}'
+        size /= 1024
+    return f'{size:,.1f} GB'
+
+
+class Command(BaseCommand):
+    help = 'Delete SqlLog rows older than N days after folding them into the daily rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            required=True,
+            help='Compact rows created before the start of the day N days ago'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database to use (default: default)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=int,
+            default=0,
+            help='Milliseconds to sleep between batches to leave room for imports (default: 0)'
+        )
+        parser.add_argument(
+            '--ledger-days',
+            type=int,
+            default=getattr(settings, 'INGESTED_LINE_RETENTION_DAYS', None),
+            help='Also delete import deduplication hashes older than N days '
+                 '(default: INGESTED_LINE_RETENTION_DAYS setting, 0 keeps them)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows and bytes would be compacted'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Run VACUUM ANALYZE on the SqlLog table afterwards (PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        batch_size = options['batch_size']
+
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['ledger_days'] is not None and options['ledger_days'] < 0:
+            raise CommandError('--ledger-days must not be negative')
+
+        cutoff = compaction_cutoff(options['days'])
+        rows, size = estimate(cutoff, database)
+        self.stdout.write(f'Rows created before {cutoff:%Y-%m-%d %H:%M %Z}: {rows:,} rows ({format_bytes(size)})')
+        ledger_cutoff = compaction_cutoff(options['ledger_days']) if options['ledger_days'] else None
+        if ledger_cutoff is not None:
+            hashes = IngestedLine.objects.using(database).filter(ingested_at__lt=ledger_cutoff).count()
+            self.stdout.write(f'Deduplication hashes recorded before {ledger_cutoff:%Y-%m-%d %H:%M %Z}: {hashes:,}')
+        if options['dry_run']:
+            return
+
+        if rows:
+            self.compact(cutoff, rows, database, batch_size, options['pause'] / 1000)
+        if ledger_cutoff is not None and hashes:
+            pruned = prune_ingested_lines(ledger_cutoff, batch_size=batch_size, using=database)
+            self.stdout.write(self.style.SUCCESS(f'Deleted {pruned:,} deduplication hashes'))
+
+        if rows and options['vacuum']:
+            connection = connections[database]
+            if connection.vendor != 'postgresql':
+                self.stdout.write(self.style.WARNING('--vacuum is only supported on PostgreSQL, skipped'))
+                return
+            # VACUUM không chạy được trong transaction: connection đang ở chế độ autocommit
+            with connection.cursor() as cursor:
+                cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(SqlLog._meta.db_table)}')
+            self.stdout.write('VACUUM ANALYZE done, freed space is reusable by new rows')
+
+    def compact(self, cutoff, rows, database, batch_size, pause):
+        """Compact các SqlLog tạo trước cutoff và hiển thị tiến độ"""
+        start_time = time.time()
+
+        def report(compaction):
+            self.stdout.write(
+                f'  deleted {compaction.deleted_rows:,}/{rows:,} rows, {format_bytes(compaction.reclaimed_bytes)}'
+            )
+
+        compaction = compact_logs(cutoff, batch_size=batch_size, using=database, pause=pause, progress=report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compaction.deleted_rows:,} rows, reclaimed {format_bytes(compaction.reclaimed_bytes)} '
+            f'in {time.time() - start_time:.2f}s'
+        ))
@@ -1,11 +1,23 @@
-import re
 import os
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat
 from django.utils import timezone
-from logs.models import SqlLog, LogFile
+from logs.models import IngestedLine, SqlLog, SqlLogRollup, LogFile
+from logs.ingestion import SqlLogBatchWriter, SqlLogCopyWriter, file_checksum, log_source
+from logs.parsing import parse_log_line, split_file_ranges, parse_file_range
+from logs.compression import detect_file_compression, open_log_file, skip_bytes
+from logs.rollups import bump_all_statistics_versions
+
+
+# Kích thước mỗi đoạn file (byte) được gửi cho một process khi parse song song
+RANGE_SIZE = 4 * 1024 * 1024
 
 
 class Command(BaseCommand):
@@ -29,22 +41,60 @@ class Command(BaseCommand):
             default=100,
             help='Number of records to process in each batch (default: 100)'
         )
+        parser.add_argument(
+            '--method',
+            choices=['bulk', 'copy'],
+            default='bulk',
+            help='Write method: bulk (bulk_create) or copy (COPY FROM STDIN, PostgreSQL only; '
+                 'falls back to bulk on other databases) (default: bulk)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes used to parse the file in parallel (default: 1)'
+        )
         parser.add_argument(
             '--clear-existing',
             action='store_true',
             help='Clear existing logs before importing'
         )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume the last unfinished import of this file from its last committed checkpoint'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Import even if a file with the same checksum was already imported'
+        )
+        parser.add_argument(
+            '--deduplicate',
+            action='store_true',
+            help='Skip lines already imported from this file (same path, inode and line number), '
+                 'e.g. when importing a log file again after it has grown'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file_path']
         database = options['database']
         batch_size = options['batch_size']
         clear_existing = options['clear_existing']
+        method = options['method']
+        workers = options['workers']
+        resume = options['resume']
 
         # Kiểm tra file tồn tại
         if not os.path.exists(file_path):
             raise CommandError(f'File "{file_path}" does not exist.')
 
+        if workers < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        if resume and clear_existing:
+            raise CommandError('--resume cannot be used together with --clear-existing.')
+
         # Lấy thông tin file
         file_size = os.path.getsize(file_path)
         file_name = os.path.basename(file_path)
@@ -54,39 +104,143 @@ class Command(BaseCommand):
         self.stdout.write(f'Database: {database}')
         self.stdout.write(f'Batch size: {batch_size}')
 
+        # COPY chỉ có trên PostgreSQL, các database khác dùng bulk_create
+        if method == 'copy' and not SqlLogCopyWriter.supports_copy(database):
+            self.stdout.write(
+                self.style.WARNING('COPY is only supported on PostgreSQL, falling back to bulk_create.')
+            )
+            method = 'bulk'
+        self.stdout.write(f'Method: {method}')
+
+        # File nén được giải nén theo luồng, không chia theo byte được nên chỉ parse tuần tự
+        compression = detect_file_compression(file_path)
+        if compression:
+            self.stdout.write(f'Compression: {compression}')
+            if workers > 1:
+                self.stdout.write(
+                    self.style.WARNING('Compressed input cannot be split into ranges, parsing with 1 worker.')
+                )
+                workers = 1
+        self.stdout.write(f'Workers: {workers}')
+
+        # File có cùng checksum đã import xong thì không cần đọc lại. Checksum chỉ được
+        # tính trước khi import khi có lần import xong với cùng kích thước file; các
+        # trường hợp khác tính song song trong lúc import (xem compute_checksum)
+        checksum = None
+        if not (options['force'] or resume or clear_existing):
+            same_size = LogFile.objects.using(database).filter(
+                file_size=file_size, status='completed', checksum__isnull=False
+            )
+            if same_size.exists():
+                checksum = self.compute_checksum(file_path)
+            imported = same_size.filter(checksum=checksum).first() if checksum else None
+            if imported is not None:
+                self.stdout.write(self.style.WARNING(
+                    f'File already imported (log file record ID: {imported.id}, checksum {checksum[:12]}), '
+                    f'use --force to import it again.'
+                ))
+                return
+
+        # Tìm lần import chưa hoàn thành để chạy tiếp từ checkpoint
+        log_file = None
+        if resume:
+            log_file = self.find_unfinished_import(file_path, database)
+            if log_file is None:
+                self.stdout.write('No unfinished import found for this file, starting from the beginning.')
+            elif not compression and log_file.last_offset > file_size:
+                raise CommandError(
+                    f'File "{file_path}" is smaller than the last checkpoint '
+                    f'({log_file.last_offset:,} bytes), it may have been replaced.'
+                )
+            else:
+                self.stdout.write(
+                    f'Resuming from line {log_file.last_line_number:,} '
+                    f'(byte {log_file.last_offset:,}, {log_file.processed_lines:,} rows already imported)'
+                )
+
+        # Checksum chưa tính thì được tính trong một thread, song song với import
+        checksum_pool = ThreadPoolExecutor(max_workers=1)
+        pending_checksum = checksum_pool.submit(self.compute_checksum, file_path) if checksum is None else None
+
         start_time = time.time()
+        phase_timings = {}
 
         try:
-            # Đếm tổng số dòng
-            total_lines = self.count_lines(file_path)
-            self.stdout.write(f'Total lines: {total_lines:,}')
-
             # Xóa dữ liệu cũ nếu được yêu cầu
             if clear_existing:
                 self.stdout.write('Clearing existing logs...')
-                SqlLog.objects.using(database).all().delete()
+                phase_start = time.perf_counter()
+                with transaction.atomic(using=database):
+                    bump_all_statistics_versions(using=database)
+                    SqlLog.objects.using(database).all().delete()
+                    SqlLogRollup.objects.using(database).all().delete()
+                    IngestedLine.objects.using(database).all().delete()
+                phase_timings['clear_existing'] = time.perf_counter() - phase_start
                 self.stdout.write('Existing logs cleared.')
 
+            # LogFile được tạo trước khi import để lưu checkpoint sau mỗi batch.
+            # Nó nằm cùng database với SqlLog để checkpoint được ghi trong cùng transaction.
+            if log_file is None:
+                log_file = LogFile.objects.using(database).create(
+                    file_name=file_name,
+                    file_path=file_path,
+                    file_size=file_size,
+                    checksum=checksum,
+                    status='running',
+                    import_method=method,
+                )
+            else:
+                log_file.file_size = file_size
+                log_file.checksum = checksum
+                log_file.status = 'running'
+                log_file.save(using=database, update_fields=['file_size', 'checksum', 'status'])
+
             # Xử lý file
-            processed_lines, failed_lines, error_details = self.process_file(
-                file_path, database, batch_size, total_lines
+            error_details = log_file.error_details.split('\n') if log_file.error_details else []
+            self.saved_errors = len(error_details)
+            writer_class = SqlLogCopyWriter if method == 'copy' else SqlLogBatchWriter
+            writer = writer_class(
+                batch_size=batch_size,
+                using=database,
+                checkpoint=partial(self.save_checkpoint, log_file, error_details),
+                deduplicate=options['deduplicate'],
+                source=log_source(file_path),
             )
+            writer.written_count = log_file.processed_lines
+            phase_start = time.perf_counter()
+            # Đọc file một lần duy nhất, tổng số dòng được đếm trong lúc xử lý
+            if workers > 1:
+                total_lines, processed_lines, failed_lines, error_details = self.process_file_parallel(
+                    file_path, writer, file_size, workers, log_file, error_details
+                )
+            else:
+                total_lines, processed_lines, failed_lines, error_details = self.process_file(
+                    file_path, writer, file_size, log_file, error_details
+                )
+            # Thời gian xử lý file gồm thời gian parse và thời gian ghi database
+            phase_timings['write'] = writer.write_time
+            phase_timings['parse'] = time.perf_counter() - phase_start - writer.write_time
 
             # Tính thời gian xử lý
             processing_time = time.time() - start_time
             processing_duration = timedelta(seconds=processing_time)
+            phase_timings['total'] = processing_time
+            rows_per_second = processed_lines / processing_time if processing_time > 0 else 0
 
             # Lưu thông tin file đã xử lý
-            log_file = LogFile.objects.create(
-                file_name=file_name,
-                file_path=file_path,
-                file_size=file_size,
-                total_lines=total_lines,
-                processed_lines=processed_lines,
-                failed_lines=failed_lines,
-                processing_time=processing_duration,
-                error_details='\n'.join(error_details) if error_details else None
-            )
+            if pending_checksum is not None:
+                log_file.checksum = pending_checksum.result()
+            log_file.total_lines = total_lines
+            log_file.processed_lines = processed_lines
+            log_file.failed_lines = failed_lines
+            log_file.duplicate_lines += writer.duplicate_count
+            log_file.processing_time = processing_duration
+            log_file.error_details = '\n'.join(error_details) if error_details else None
+            log_file.import_method = method
+            log_file.rows_per_second = rows_per_second
+            log_file.phase_timings = {phase: round(seconds, 3) for phase, seconds in phase_timings.items()}
+            log_file.status = 'completed'
+            log_file.save(using=database)
 
             # Hiển thị kết quả
             self.stdout.write(
@@ -94,91 +248,204 @@ class Command(BaseCommand):
                     f'\nImport completed successfully!'
                 )
             )
+            self.stdout.write(f'Total lines: {total_lines:,}')
             self.stdout.write(f'Processed: {processed_lines:,} lines')
             self.stdout.write(f'Failed: {failed_lines:,} lines')
-            self.stdout.write(f'Success rate: {(processed_lines/total_lines)*100:.2f}%')
+            self.stdout.write(f'Duplicates skipped: {log_file.duplicate_lines:,} lines')
+            if total_lines:
+                self.stdout.write(
+                    f'Success rate: {(processed_lines + log_file.duplicate_lines) / total_lines * 100:.2f}%'
+                )
             self.stdout.write(f'Processing time: {processing_duration}')
+            self.stdout.write(f'Throughput: {rows_per_second:,.0f} rows/sec')
+            self.stdout.write(
+                'Phase timings: ' + ', '.join(f'{phase}={seconds:.2f}s' for phase, seconds in phase_timings.items())
+            )
             self.stdout.write(f'Log file record ID: {log_file.id}')
 
         except Exception as e:
+            # Checkpoint cuối cùng vẫn được giữ để có thể chạy lại với --resume
+            if log_file is not None and log_file.pk is not None:
+                LogFile.objects.using(database).filter(pk=log_file.pk).update(status='failed')
             self.stdout.write(
                 self.style.ERROR(f'Error processing file: {str(e)}')
             )
             raise CommandError(f'Import failed: {str(e)}')
+        finally:
+            checksum_pool.shutdown(wait=False)
+
+    def compute_checksum(self, file_path):
+        """SHA-256 của file (file nén: của dữ liệu nén)"""
+        with open(file_path, 'rb') as f:
+            return file_checksum(f)
+
+    def find_unfinished_import(self, file_path, database):
+        """Lấy lần import gần nhất chưa hoàn thành của file"""
+        return (
+            LogFile.objects.using(database)
+            .filter(file_path=file_path, status__in=['running', 'failed'])
+            # Checkpoint của tail_logs chỉ dùng cho tail_logs
+            .exclude(import_method='tail')
+            .order_by('-id')
+            .first()
+        )
 
-    def count_lines(self, file_path):
-        """Đếm tổng số dòng trong file"""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return sum(1 for line in file if line.strip())
+    def save_checkpoint(self, log_file, error_details, position, processed_lines, writer_failed):
+        """
+        Lưu checkpoint sau một batch (được gọi trong transaction của batch)
+
+        position là (offset, dòng, tổng số dòng, số dòng lỗi, số lỗi đã ghi nhận) tại
+        dòng cuối cùng của batch.
+        """
+        offset, line_number, total_lines, failed_lines, error_count = position
+        fields = {
+            'last_offset': offset,
+            'last_line_number': line_number,
+            'total_lines': total_lines,
+            'processed_lines': processed_lines,
+            'failed_lines': failed_lines + writer_failed,
+        }
+        # Chỉ nối thêm các lỗi mới thay vì ghi lại toàn bộ error_details
+        new_errors = error_details[self.saved_errors:error_count]
+        if new_errors:
+            if self.saved_errors:
+                fields['error_details'] = Concat(
+                    'error_details', Value('\n' + '\n'.join(new_errors)), output_field=TextField()
+                )
+            else:
+                fields['error_details'] = '\n'.join(new_errors)
+        LogFile.objects.using(log_file._state.db).filter(pk=log_file.pk).update(**fields)
+        self.saved_errors = max(self.saved_errors, error_count)
 
     def parse_log_line(self, line):
-        """Parse một dòng log thành dictionary"""
-        try:
-            # Pattern để parse log line
-            # Format: DB:database_name,sql:SQL_query,exec_time_ms:time,exec_count:count
-            pattern = r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
-            match = re.match(pattern, line.strip())
-            
-            if match:
-                database_name, sql_query, exec_time_ms, exec_count = match.groups()
-                return {
-                    'database_name': database_name,
-                    'sql_query': sql_query,
-                    'exec_time_ms': int(exec_time_ms),
-                    'exec_count': int(exec_count)
-                }
-            return None
-        except Exception:
-            return None
-
-    def process_file(self, file_path, database, batch_size, total_lines):
-        """Xử lý file log và import vào database"""
-        processed_lines = 0
-        failed_lines = 0
-        batch_data = []
-        error_details = []
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_num, line in enumerate(file, 1):
+        """Parse một dòng log thành tuple (database_name, sql_query, exec_time_ms, exec_count)"""
+        return parse_log_line(line)
+
+    def process_file(self, file_path, writer, file_size, log_file, error_details):
+        """
+        Xử lý file log và import vào database thông qua writer (đọc file một lần)
+
+        Bắt đầu từ checkpoint của log_file (đầu file nếu là lần import mới).
+        """
+        total_lines = log_file.total_lines
+        failed_lines = log_file.failed_lines
+        bytes_read = log_file.last_offset
+        line_num = log_file.last_line_number
+
+        # Đọc ở chế độ binary để biết số byte đã xử lý, dùng cho checkpoint. Với file nén,
+        # offset tính trên dữ liệu đã giải nén, tiến trình tính trên số byte nén đã đọc.
+        file, raw_file, compression = open_log_file(file_path)
+        with raw_file, file:
+            if compression:
+                skip_bytes(file, bytes_read)
+            else:
+                file.seek(bytes_read)
+            for line_num, raw_line in enumerate(file, line_num + 1):
+                bytes_read += len(raw_line)
+                line = raw_line.decode('utf-8')
                 if line.strip():  # Bỏ qua dòng trống
-                    parsed_data = self.parse_log_line(line)
+                    total_lines += 1
+                    parsed = self.parse_log_line(line)
                     
-                    if parsed_data:
-                        parsed_data['line_number'] = line_num
-                        batch_data.append(SqlLog(**parsed_data))
-                        processed_lines += 1
+                    if parsed:
+                        written = writer.add(
+                            *parsed, line_number=line_num,
+                            position=(bytes_read, line_num, total_lines, failed_lines, len(error_details))
+                        )
+                        
+                        # Hiển thị tiến trình mỗi khi một batch được ghi
+                        if written:
+                            self.report_progress(raw_file.tell(), file_size, line_num)
                     else:
                         failed_lines += 1
-                        error_details.append(f"Dòng {line_num}: {line.strip()}")
-                        if failed_lines <= 10:  # Chỉ hiển thị 10 lỗi đầu tiên
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f'Failed to parse line {line_num}: {line.strip()[:100]}...'
-                                )
-                            )
-
-                    # Xử lý batch khi đủ số lượng
-                    if len(batch_data) >= batch_size:
-                        self.save_batch(batch_data, database)
-                        batch_data = []
-                        
-                        # Hiển thị tiến trình
-                        progress = (line_num / total_lines) * 100
-                        self.stdout.write(f'Progress: {progress:.1f}% ({line_num:,}/{total_lines:,})')
+                        self.report_failure(error_details, failed_lines, line_num, line.strip())
 
             # Xử lý batch cuối cùng
-            if batch_data:
-                self.save_batch(batch_data, database)
+            writer.flush()
 
-        return processed_lines, failed_lines, error_details
+        log_file.last_offset = bytes_read
+        log_file.last_line_number = line_num
+        return self.finish_writer(writer, total_lines, failed_lines, error_details)
 
-    def save_batch(self, batch_data, database):
-        """Lưu batch dữ liệu vào database"""
-        try:
-            with transaction.atomic(using=database):
-                SqlLog.objects.using(database).bulk_create(batch_data)
-        except Exception as e:
+    def process_file_parallel(self, file_path, writer, file_size, workers, log_file, error_details):
+        """
+        Parse file song song bằng nhiều process, ghi vào database tuần tự ở process chính
+
+        File được chia thành các đoạn byte kết thúc tại ký tự xuống dòng. Kết quả
+        được nhận theo đúng thứ tự các đoạn nên số dòng, thứ tự ghi và thống kê
+        giống hệt khi chạy tuần tự.
+        """
+        total_lines = log_file.total_lines
+        failed_lines = log_file.failed_lines
+        line_offset = log_file.last_line_number
+        end = log_file.last_offset
+
+        ranges = deque(split_file_ranges(file_path, RANGE_SIZE, start=log_file.last_offset))
+        pending = deque()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Giới hạn số đoạn đang xử lý để bộ nhớ không tăng theo kích thước file
+            while ranges or pending:
+                while ranges and len(pending) < workers * 2:
+                    start, end = ranges.popleft()
+                    pending.append((end, pool.submit(parse_file_range, file_path, start, end)))
+
+                end, future = pending.popleft()
+                line_count, rows, failures = future.result()
+
+                # Ghép lỗi và dòng hợp lệ theo đúng thứ tự dòng trong đoạn
+                failures = deque(failures)
+                for line_num, row_offset, database_name, sql_query, exec_time_ms, exec_count in rows:
+                    while failures and failures[0][0] < line_num:
+                        total_lines += 1
+                        failed_lines += 1
+                        failed_num, failed_line = failures.popleft()
+                        self.report_failure(error_details, failed_lines, line_offset + failed_num, failed_line)
+                    total_lines += 1
+                    written = writer.add(
+                        database_name, sql_query, exec_time_ms, exec_count,
+                        line_number=line_offset + line_num,
+                        position=(row_offset, line_offset + line_num, total_lines, failed_lines, len(error_details))
+                    )
+                    if written:
+                        self.report_progress(end, file_size, line_offset + line_num)
+                for failed_num, failed_line in failures:
+                    total_lines += 1
+                    failed_lines += 1
+                    self.report_failure(error_details, failed_lines, line_offset + failed_num, failed_line)
+
+                line_offset += line_count
+
+        # Xử lý batch cuối cùng
+        writer.flush()
+
+        log_file.last_offset = end
+        log_file.last_line_number = line_offset
+        return self.finish_writer(writer, total_lines, failed_lines, error_details)
+
+    def report_progress(self, bytes_read, file_size, line_num):
+        """Hiển thị tiến trình theo số byte đã xử lý"""
+        progress = (bytes_read / file_size) * 100
+        self.stdout.write(
+            f'Progress: {progress:.1f}% ({bytes_read:,}/{file_size:,} bytes, line {line_num:,})'
+        )
+
+    def report_failure(self, error_details, failed_lines, line_num, line):
+        """Ghi nhận một dòng không parse được"""
+        error_details.append(f"Dòng {line_num}: {line}")
+        if failed_lines <= 10:  # Chỉ hiển thị 10 lỗi đầu tiên
             self.stdout.write(
-                self.style.ERROR(f'Error saving batch: {str(e)}')
+                self.style.WARNING(
+                    f'Failed to parse line {line_num}: {line[:100]}...'
+                )
             )
-            raise
+
+    def finish_writer(self, writer, total_lines, failed_lines, error_details):
+        """Tổng hợp kết quả sau khi writer đã ghi xong"""
+        # Batch ghi lỗi chỉ rollback chính nó, các dòng trong đó được tính là lỗi
+        for error in writer.errors:
+            self.stdout.write(self.style.ERROR(f'Error saving batch: {error}'))
+        failed_lines += writer.failed_count
+        error_details.extend(writer.errors)
+
+        return total_lines, writer.written_count, failed_lines, error_details
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from logs.partitioning import (
+    add_months, convert_to_partitioned, drop_partitions_before, ensure_partitions, is_partitioned,
+    list_partitions, month_start,
+)
+
+
+class Command(BaseCommand):
+    help = 'Create future monthly SqlLog partitions and drop expired ones (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database to use (default: default)'
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the existing SqlLog table into a table partitioned by month of created_at'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.SQLLOG_PARTITION_MONTHS_AHEAD,
+            help='Number of future months to create partitions for '
+                 f'(default: SQLLOG_PARTITION_MONTHS_AHEAD = {settings.SQLLOG_PARTITION_MONTHS_AHEAD})'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.SQLLOG_RETENTION_MONTHS,
+            help='Drop partitions older than N months, including the current month '
+                 '(default: SQLLOG_RETENTION_MONTHS, none when unset)'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        months_ahead = options['months_ahead']
+        retention_months = options['retention_months']
+
+        if connections[database].vendor != 'postgresql':
+            raise CommandError('SqlLog partitioning requires PostgreSQL')
+        if retention_months is not None and retention_months < 1:
+            raise CommandError('--retention-months must be at least 1')
+
+        if not is_partitioned(database):
+            if not options['convert']:
+                raise CommandError('SqlLog is not partitioned yet, run with --convert first')
+            self.stdout.write('Converting SqlLog to a partitioned table...')
+            moved = convert_to_partitioned(months_ahead, database)
+            self.stdout.write(self.style.SUCCESS(f'Converted SqlLog, moved {moved:,} rows'))
+
+        for name in ensure_partitions(months_ahead, database):
+            self.stdout.write(f'Created partition {name}')
+
+        if retention_months is not None:
+            cutoff = add_months(month_start(timezone.now()), 1 - retention_months)
+            for name in drop_partitions_before(cutoff, database):
+                self.stdout.write(f'Dropped partition {name}')
+
+        partitions = list_partitions(database)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(partitions)} monthly partitions: '
+            f'{partitions[0][1]} .. {partitions[-1][1]}' if partitions else 'No monthly partitions'
+        ))
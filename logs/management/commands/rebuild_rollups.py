@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from logs.compaction import latest_cutoff
+from logs.rollups import bump_all_statistics_versions, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly/daily SqlLog rollup tables from all SqlLog rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database to use (default: default)'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+
+        self.stdout.write(f'Rebuilding rollups on database: {database}')
+        # Bucket trước mốc compact_logs chỉ còn trong bảng tổng hợp, không dựng lại được
+        since = latest_cutoff(database)
+        if since is not None:
+            self.stdout.write(f'Keeping buckets before {since:%Y-%m-%d} (compacted SqlLog rows)')
+        start_time = time.time()
+        # Dựng lại trong một transaction để trang thống kê không thấy bảng đang trống
+        with transaction.atomic(using=database):
+            created = rebuild_rollups(using=database, since=since)
+            bump_all_statistics_versions(using=database)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {created:,} rollup buckets in {time.time() - start_time:.2f}s')
+        )
@@ -0,0 +1,67 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from logs.report_jobs import claim_job, purge_expired_jobs, requeue_stale_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Process queued report jobs (ReportJob) in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently queued, then exit'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=int,
+            default=2000,
+            help='Milliseconds to wait before checking the queue again when it is empty (default: 2000)'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after processing N jobs (default: 0, no limit)'
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval'] / 1000
+        max_jobs = options['max_jobs']
+        if poll_interval < 0 or max_jobs < 0:
+            raise CommandError('--poll-interval and --max-jobs must not be negative.')
+
+        worker = worker_name()
+        self.stdout.write(f'Report worker {worker} started')
+        processed = 0
+        try:
+            while not max_jobs or processed < max_jobs:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+                expired = purge_expired_jobs()
+                if expired:
+                    self.stdout.write(f'Deleted files of {expired} expired job(s)')
+
+                job = claim_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                start_time = time.time()
+                self.stdout.write(f'Job #{job.id}: {job.report_type} report ({job.format_type}) for {job.user}')
+                job = run_job(job)
+                processed += 1
+                if job.status == 'completed':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Job #{job.id} completed: {job.file_name} ({job.file_size:,} bytes, '
+                        f'{job.processed_rows:,} rows) in {time.time() - start_time:.2f}s'
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f'Job #{job.id} {job.status}: {job.error_message or ""}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping...')
+
+        self.stdout.write(f'Processed {processed} job(s)')
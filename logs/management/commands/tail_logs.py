@@ -0,0 +1,285 @@
+import os
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from logs.models import LogFile
+from logs.ingestion import SqlLogBatchWriter, log_source
+from logs.parsing import parse_log_line
+
+
+# Số byte đọc mỗi lần khi file có dữ liệu mới
+READ_SIZE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Follow a SQL log file and continuously import new lines into database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file_path',
+            type=str,
+            help='Path to the log file to follow'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database to use (default: default)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Write as soon as this many rows are pending (default: 500)'
+        )
+        parser.add_argument(
+            '--flush-interval',
+            type=int,
+            default=1000,
+            help='Write pending rows at least every N milliseconds (default: 1000)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=int,
+            default=200,
+            help='Milliseconds to wait before checking the file again when no new data (default: 200)'
+        )
+        parser.add_argument(
+            '--from-beginning',
+            action='store_true',
+            help='Import the existing content of the file first instead of resuming from the last '
+                 'tail_logs checkpoint or starting at its end'
+        )
+        parser.add_argument(
+            '--deduplicate',
+            action='store_true',
+            help='Skip lines already imported from this file (requires --from-beginning or a checkpoint)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=0,
+            help='Stop after N seconds (default: 0, run until interrupted)'
+        )
+
+    def handle(self, *args, **options):
+        file_path = options['file_path']
+        database = options['database']
+        batch_size = options['batch_size']
+        poll_interval = options['poll_interval'] / 1000
+        duration = options['duration']
+
+        if not os.path.exists(file_path):
+            raise CommandError(f'File "{file_path}" does not exist.')
+
+        if batch_size < 1 or options['flush_interval'] < 0 or poll_interval < 0:
+            raise CommandError('--batch-size must be at least 1 and intervals must not be negative.')
+
+        checkpoint = None if options['from_beginning'] else self.find_checkpoint(file_path, database)
+        self.start(file_path, options['from_beginning'], options['flush_interval'] / 1000, checkpoint)
+
+        # Bắt đầu từ cuối file thì số dòng chỉ là số thứ tự tương đối, không dùng để chống trùng được
+        if options['deduplicate'] and not options['from_beginning'] and not self.resumed:
+            self.file.close()
+            raise CommandError(
+                '--deduplicate requires --from-beginning or a checkpoint of an earlier tail_logs run.'
+            )
+
+        self.stdout.write(f'Following file: {file_path} (inode {self.inode})')
+        if self.resumed:
+            self.stdout.write(f'Resuming from checkpoint of import #{checkpoint.id} (line {self.line_number:,})')
+        self.stdout.write(f'Starting at byte {self.offset:,}')
+        self.stdout.write(f'Database: {database}')
+
+        start_time = time.time()
+        log_file = LogFile.objects.using(database).create(
+            file_name=os.path.basename(file_path),
+            file_path=file_path,
+            file_size=self.offset,
+            status='running',
+            import_method='tail',
+            inode=self.inode,
+        )
+        writer = SqlLogBatchWriter(
+            batch_size=batch_size, using=database, checkpoint=self.make_checkpoint(log_file),
+            deduplicate=options['deduplicate'], source=log_source(file_path, self.inode),
+        )
+
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while True:
+                new_lines = self.poll(writer)
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if not new_lines:
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping...')
+        finally:
+            writer.flush()
+            self.file.close()
+
+            for error in writer.errors:
+                self.stdout.write(self.style.ERROR(f'Error saving batch: {error}'))
+            self.error_details.extend(writer.errors)
+            LogFile.objects.using(database).filter(pk=log_file.pk).update(
+                file_size=self.offset,
+                total_lines=self.total_lines,
+                processed_lines=writer.written_count,
+                failed_lines=self.failed_lines + writer.failed_count,
+                processing_time=timedelta(seconds=time.time() - start_time),
+                error_details='\n'.join(self.error_details) if self.error_details else None,
+                status='completed',
+                last_offset=self.offset - len(self.partial),
+                last_line_number=self.line_number,
+                inode=self.inode,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {writer.written_count:,} lines, failed {self.failed_lines + writer.failed_count:,} lines'
+            )
+        )
+
+    def find_checkpoint(self, file_path, database):
+        """Lấy LogFile của lần chạy tail_logs gần nhất trên file"""
+        return (
+            LogFile.objects.using(database)
+            .filter(file_path=file_path, import_method='tail')
+            .order_by('-id')
+            .first()
+        )
+
+    def start(self, file_path, from_beginning=False, flush_interval=1.0, checkpoint=None):
+        """
+        Khởi tạo trạng thái theo dõi file
+
+        Nếu có checkpoint (LogFile của lần chạy trước) và file chưa bị rotate (cùng inode)
+        hay truncate (không nhỏ hơn checkpoint), đọc tiếp từ vị trí đã lưu.
+        """
+        self.flush_interval = flush_interval
+        self.pending_since = None
+        self.total_lines = 0
+        self.failed_lines = 0
+        self.error_details = []
+        self.open_file(file_path, from_beginning)
+        self.resumed = (
+            checkpoint is not None and checkpoint.inode == self.inode
+            and checkpoint.last_offset <= os.fstat(self.file.fileno()).st_size
+        )
+        if self.resumed:
+            self.offset = self.file.seek(checkpoint.last_offset)
+            self.line_number = checkpoint.last_line_number
+
+    def open_file(self, file_path, from_beginning=True):
+        """Mở file và ghi nhớ inode để phát hiện khi file bị rotate"""
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.offset = 0 if from_beginning else self.file.seek(0, os.SEEK_END)
+        self.partial = b''
+        self.line_number = 0
+
+    def make_checkpoint(self, log_file):
+        """Cập nhật tiến độ trên LogFile trong transaction của mỗi batch"""
+        def checkpoint(position, written_count, writer_failed):
+            offset, line_number, total_lines, failed_lines, inode = position
+            LogFile.objects.using(log_file._state.db).filter(pk=log_file.pk).update(
+                file_size=offset,
+                total_lines=total_lines,
+                processed_lines=written_count,
+                failed_lines=failed_lines + writer_failed,
+                last_offset=offset,
+                last_line_number=line_number,
+                inode=inode,
+            )
+        return checkpoint
+
+    def poll(self, writer):
+        """
+        Đọc các dòng mới, kiểm tra rotate/truncate và ghi các dòng đang chờ
+        nếu đã quá flush interval. Trả về số dòng mới đọc được.
+        """
+        new_lines = self.read_new_lines(writer)
+        if not new_lines:
+            self.check_rotation(writer)
+
+        # Dòng chờ lâu nhất không được chờ quá flush interval
+        if writer.pending and time.monotonic() - self.pending_since >= self.flush_interval:
+            self.report_written(writer.flush(), writer)
+        return new_lines
+
+    def report_written(self, written, writer):
+        """Hiển thị số dòng vừa được ghi"""
+        if written:
+            self.stdout.write(f'Imported {written:,} rows (line {self.line_number:,}, total {writer.written_count:,})')
+
+    def read_new_lines(self, writer):
+        """Đọc đến cuối file; dòng cuối chưa có ký tự xuống dòng được giữ lại chờ phần còn lại"""
+        new_lines = 0
+        while True:
+            data = self.file.read(READ_SIZE)
+            if not data:
+                return new_lines
+            line_end = self.offset - len(self.partial)
+            self.offset += len(data)
+            lines = (self.partial + data).split(b'\n')
+            self.partial = lines.pop()
+            for raw_line in lines:
+                line_end += len(raw_line) + 1
+                self.handle_line(raw_line, line_end, writer)
+            new_lines += len(lines)
+
+    def handle_line(self, raw_line, line_end, writer):
+        """Parse một dòng và đưa vào writer"""
+        self.line_number += 1
+        line = raw_line.decode('utf-8', errors='replace').strip()
+        if not line:
+            return
+        self.total_lines += 1
+        parsed = parse_log_line(line)
+        if parsed:
+            if not writer.pending:
+                self.pending_since = time.monotonic()
+            written = writer.add(
+                *parsed, line_number=self.line_number,
+                position=(line_end, self.line_number, self.total_lines, self.failed_lines, self.inode)
+            )
+            self.report_written(written, writer)
+        else:
+            self.failed_lines += 1
+            self.error_details.append(f"Dòng {self.line_number}: {line}")
+            if self.failed_lines <= 10:  # Chỉ hiển thị 10 lỗi đầu tiên
+                self.stdout.write(self.style.WARNING(f'Failed to parse line {self.line_number}: {line[:100]}...'))
+
+    def check_rotation(self, writer):
+        """Phát hiện file bị rotate (inode khác) hoặc bị truncate (nhỏ hơn offset hiện tại)"""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            # File cũ đã bị đổi tên, file mới chưa được tạo
+            return
+
+        if stat.st_ino != self.inode:
+            # Đọc nốt phần còn lại của file cũ, dòng cuối không có \n vẫn là dòng hoàn chỉnh
+            self.read_new_lines(writer)
+            if self.partial:
+                self.handle_line(self.partial, self.offset, writer)
+            self.file.close()
+            # Các dòng đang chờ thuộc file cũ: ghi trước khi đổi nguồn chống trùng
+            self.report_written(writer.flush(), writer)
+            self.open_file(self.file_path, from_beginning=True)
+            writer.source = log_source(self.file_path, self.inode)
+            self.stdout.write(f'File rotated, following new file (inode {self.inode})')
+        elif stat.st_size < self.offset:
+            # copytruncate: file bị cắt về 0, đọc lại từ đầu
+            self.file.seek(0)
+            self.offset = 0
+            self.partial = b''
+            self.line_number = 0
+            self.stdout.write('File truncated, reading from the beginning')
+            if writer.deduplicate:
+                # Số dòng bắt đầu lại trên cùng inode nên không còn nhận ra dòng đã import
+                self.report_written(writer.flush(), writer)
+                writer.deduplicate = False
+                self.stdout.write(self.style.WARNING('Deduplication disabled for the rest of this run'))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0007_customuser_mfa_backup_codes_customuser_mfa_enabled_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='import_method',
+            field=models.CharField(blank=True, choices=[('bulk', 'bulk_create'), ('copy', 'COPY (PostgreSQL)')], help_text='Phương thức ghi dữ liệu vào database', max_length=20, null=True, verbose_name='Phương thức import'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='phase_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Thời gian (giây) của từng giai đoạn import: đếm dòng, parse, ghi database, ...', verbose_name='Thời gian từng giai đoạn'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='rows_per_second',
+            field=models.FloatField(blank=True, help_text='Số dòng được ghi vào database mỗi giây', null=True, verbose_name='Tốc độ import (dòng/giây)'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0008_logfile_import_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='last_line_number',
+            field=models.PositiveIntegerField(default=0, help_text='Số dòng cuối cùng đã được ghi vào database', verbose_name='Checkpoint (dòng)'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='last_offset',
+            field=models.BigIntegerField(default=0, help_text='Vị trí byte ngay sau dòng cuối cùng đã được ghi vào database', verbose_name='Checkpoint (byte)'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='status',
+            field=models.CharField(choices=[('running', 'Đang import'), ('failed', 'Lỗi'), ('completed', 'Hoàn thành')], default='completed', help_text='Trạng thái import; import chưa hoàn thành có thể chạy tiếp bằng --resume', max_length=20, verbose_name='Trạng thái'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from logs.fingerprint import fingerprint_sql
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """Gán fingerprint cho các SqlLog đã có, xử lý theo từng nhóm để không nạp hết vào bộ nhớ"""
+    SqlLog = apps.get_model('logs', 'SqlLog')
+    QueryFingerprint = apps.get_model('logs', 'QueryFingerprint')
+    db_alias = schema_editor.connection.alias
+    batch_size = 2000
+
+    last_id = 0
+    while True:
+        rows = list(
+            SqlLog.objects.using(db_alias)
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'sql_query')[:batch_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        fingerprints = {}
+        for _, sql_query in rows:
+            normalized, digest = fingerprint_sql(sql_query)
+            fingerprints[digest] = normalized
+        QueryFingerprint.objects.using(db_alias).bulk_create(
+            [QueryFingerprint(fingerprint=digest, normalized_sql=normalized)
+             for digest, normalized in fingerprints.items()],
+            ignore_conflicts=True
+        )
+        fingerprint_ids = dict(
+            QueryFingerprint.objects.using(db_alias)
+            .filter(fingerprint__in=list(fingerprints))
+            .values_list('fingerprint', 'id')
+        )
+        SqlLog.objects.using(db_alias).bulk_update(
+            [SqlLog(id=log_id, fingerprint_id=fingerprint_ids[fingerprint_sql(sql_query)[1]])
+             for log_id, sql_query in rows],
+            ['fingerprint'],
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0009_logfile_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(help_text='SHA-1 của câu SQL đã chuẩn hóa', max_length=40, unique=True, verbose_name='Mã hash')),
+                ('normalized_sql', models.TextField(help_text='Câu SQL đã thay literal bằng ?, gộp khoảng trắng và chuyển về chữ hoa', verbose_name='Mẫu câu SQL')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Lần đầu tiên mẫu câu SQL xuất hiện', verbose_name='Thời gian tạo')),
+            ],
+            options={
+                'verbose_name': 'Mẫu câu SQL',
+                'verbose_name_plural': 'Mẫu câu SQL',
+            },
+        ),
+        migrations.AddField(
+            model_name='sqllog',
+            name='fingerprint',
+            field=models.ForeignKey(blank=True, help_text='Mẫu câu SQL đã chuẩn hóa (gom các câu chỉ khác nhau ở giá trị literal)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to='logs.queryfingerprint', verbose_name='Mẫu câu SQL'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from logs.rollups import rebuild_rollups
+
+
+def build_rollups(apps, schema_editor):
+    """Tổng hợp các SqlLog đã có vào bảng SqlLogRollup"""
+    rebuild_rollups(
+        using=schema_editor.connection.alias,
+        sqllog_model=apps.get_model('logs', 'SqlLog'),
+        rollup_model=apps.get_model('logs', 'SqlLogRollup'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0010_query_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SqlLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_name', models.CharField(max_length=50, verbose_name='Tên Database')),
+                ('period', models.CharField(choices=[('hour', 'Giờ'), ('day', 'Ngày')], max_length=10, verbose_name='Chu kỳ')),
+                ('bucket_start', models.DateTimeField(help_text='Đầu giờ/ngày (theo TIME_ZONE) của các SqlLog được tổng hợp', verbose_name='Bắt đầu chu kỳ')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Số logs')),
+                ('sum_exec_time_ms', models.BigIntegerField(default=0, verbose_name='Tổng thời gian thực thi (ms)')),
+                ('min_exec_time_ms', models.PositiveIntegerField(verbose_name='Thời gian thực thi nhỏ nhất (ms)')),
+                ('max_exec_time_ms', models.PositiveIntegerField(verbose_name='Thời gian thực thi lớn nhất (ms)')),
+                ('sum_exec_count', models.BigIntegerField(default=0, verbose_name='Tổng số lần thực thi')),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='logs.queryfingerprint', verbose_name='Mẫu câu SQL')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp SQL Log',
+                'verbose_name_plural': 'Tổng hợp SQL Log',
+                'indexes': [models.Index(fields=['period', 'database_name', 'bucket_start'], name='logs_sqllog_period_16733f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('database_name', 'fingerprint', 'period', 'bucket_start'), name='unique_sqllog_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0011_sqllog_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_name', models.CharField(max_length=50, unique=True, verbose_name='Tên Database')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Version')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Cập nhật lúc')),
+            ],
+            options={
+                'verbose_name': 'Version thống kê',
+                'verbose_name_plural': 'Version thống kê',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0012_statistics_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sqllog',
+            index=models.Index(fields=['created_at', 'id'], name='logs_sqllog_created_5925ca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sqllog',
+            index=models.Index(fields=['database_name', 'created_at', 'id'], name='logs_sqllog_databas_c5f633_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0013_sqllog_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sqllog',
+            name='logs_sqllog_databas_5e5069_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sqllog',
+            name='logs_sqllog_created_5120a4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='sqllog',
+            index=models.Index(fields=['database_name', 'exec_time_ms'], name='logs_sqllog_databas_7722ef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sqllog',
+            index=models.Index(fields=['database_name', 'exec_count'], name='logs_sqllog_databas_4ad87d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sqllog',
+            index=models.Index(condition=models.Q(('exec_count__gt', 100), ('exec_time_ms__gt', 500)), fields=['database_name', 'created_at'], name='sqllog_abnormal_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sqllog',
+            index=models.Index(condition=models.Q(('exec_count__gt', 100), ('exec_time_ms__gt', 500)), fields=['exec_time_ms'], name='sqllog_abnormal_exec_time_idx'),
+        ),
+    ]
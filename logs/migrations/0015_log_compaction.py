@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0014_sqllog_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogCompaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField(help_text='Các SqlLog tạo trước thời điểm này đã được gộp vào bảng tổng hợp và xóa', verbose_name='Mốc thời gian')),
+                ('deleted_rows', models.BigIntegerField(default=0, verbose_name='Số dòng đã xóa')),
+                ('reclaimed_bytes', models.BigIntegerField(default=0, help_text='Tổng kích thước các dòng đã xóa (ước lượng nếu không phải PostgreSQL)', verbose_name='Dung lượng giải phóng (byte)')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Bắt đầu')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc')),
+            ],
+            options={
+                'verbose_name': 'Lần compact SQL Log',
+                'verbose_name_plural': 'Các lần compact SQL Log',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
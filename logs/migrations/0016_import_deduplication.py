@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0015_log_compaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedLine',
+            fields=[
+                ('row_hash', models.CharField(help_text='SHA-1 của (số dòng, database, câu SQL, thời gian, số lần thực thi)', max_length=40, primary_key=True, serialize=False, verbose_name='Hash dòng log')),
+            ],
+            options={
+                'verbose_name': 'Dòng log đã import',
+                'verbose_name_plural': 'Dòng log đã import',
+            },
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 nội dung file (file nén: của dữ liệu nén)', max_length=64, null=True, verbose_name='Checksum'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='duplicate_lines',
+            field=models.PositiveIntegerField(default=0, help_text='Số dòng đã được import trước đó nên bị bỏ qua', verbose_name='Số dòng trùng'),
+        ),
+    ]
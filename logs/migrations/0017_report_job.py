@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0016_import_deduplication'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('summary', 'Báo cáo tổng hợp'), ('detailed', 'Báo cáo chi tiết'), ('abnormal', 'Truy vấn bất thường')], max_length=20, verbose_name='Loại báo cáo')),
+                ('format_type', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF'), ('json', 'JSON')], max_length=10, verbose_name='Định dạng')),
+                ('database_filter', models.CharField(blank=True, default='', help_text='Chỉ lấy logs của database này (để trống: tất cả database được phép)', max_length=50, verbose_name='Lọc database')),
+                ('database_names', models.JSONField(default=list, help_text='Các database user có quyền truy cập tại thời điểm tạo job', verbose_name='Database được phép')),
+                ('status', models.CharField(choices=[('pending', 'Đang chờ'), ('running', 'Đang tạo'), ('completed', 'Hoàn thành'), ('failed', 'Lỗi'), ('expired', 'Hết hạn')], default='pending', max_length=20, verbose_name='Trạng thái')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Số dòng đã xử lý')),
+                ('total_rows', models.PositiveIntegerField(blank=True, help_text='Số dòng báo cáo sẽ đọc (không có với báo cáo tổng hợp)', null=True, verbose_name='Tổng số dòng')),
+                ('artifact', models.FileField(blank=True, upload_to='reports/%Y/%m/%d/', verbose_name='File báo cáo')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='Tên file tải về')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Content-Type')),
+                ('file_size', models.BigIntegerField(blank=True, null=True, verbose_name='Kích thước file (bytes)')),
+                ('error_message', models.TextField(blank=True, null=True, verbose_name='Lỗi')),
+                ('worker', models.CharField(blank=True, help_text='Tiến trình worker đang/đã xử lý job (host:pid)', max_length=100, verbose_name='Worker')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Thời gian tạo')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Cập nhật tiến độ lần cuối')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc')),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Sau thời điểm này file báo cáo bị xóa', null=True, verbose_name='Hết hạn')),
+                ('user', models.ForeignKey(help_text='Người yêu cầu báo cáo', on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Người dùng')),
+            ],
+            options={
+                'verbose_name': 'Báo cáo tạo nền',
+                'verbose_name_plural': 'Báo cáo tạo nền',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+def clear_old_hashes(apps, schema_editor):
+    """Hash theo khóa cũ (không có nguồn) không còn khớp với row_hash mới"""
+    apps.get_model('logs', 'IngestedLine').objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0017_report_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingestedline',
+            name='row_hash',
+            field=models.CharField(help_text='SHA-1 của (nguồn, số dòng, thời gian, database, câu SQL, thời gian thực thi, số lần thực thi)', max_length=40, primary_key=True, serialize=False, verbose_name='Hash dòng log'),
+        ),
+        migrations.RunPython(clear_old_hashes, migrations.RunPython.noop),
+    ]
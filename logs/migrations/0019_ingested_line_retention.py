@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0018_ingested_line_source_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestedline',
+            name='ingested_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Hash cũ hơn INGESTED_LINE_RETENTION_DAYS ngày bị xóa khi chạy compact_logs', verbose_name='Thời gian import'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0019_ingested_line_retention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sqllogrollup',
+            name='fingerprint',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='rollups', to='logs.queryfingerprint', verbose_name='Mẫu câu SQL'),
+        ),
+    ]
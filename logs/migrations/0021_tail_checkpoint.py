@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0020_protect_rollup_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='inode',
+            field=models.BigIntegerField(blank=True, help_text='Inode của file tại checkpoint (tail_logs), để chạy tiếp khi file chưa bị rotate', null=True, verbose_name='Inode'),
+        ),
+        migrations.AlterField(
+            model_name='logfile',
+            name='import_method',
+            field=models.CharField(blank=True, choices=[('bulk', 'bulk_create'), ('copy', 'COPY (PostgreSQL)'), ('tail', 'tail_logs')], help_text='Phương thức ghi dữ liệu vào database', max_length=20, null=True, verbose_name='Phương thức import'),
+        ),
+    ]
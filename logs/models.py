@@ -349,6 +349,35 @@ class DatabasePermission(models.Model):
         return self.is_active and not self.is_expired()
 
 
+class QueryFingerprint(models.Model):
+    """Mẫu câu SQL đã chuẩn hóa (literal thay bằng ?), dùng chung cho các SqlLog cùng mẫu"""
+    
+    fingerprint = models.CharField(
+        max_length=40,
+        unique=True,
+        verbose_name="Mã hash",
+        help_text="SHA-1 của câu SQL đã chuẩn hóa"
+    )
+    
+    normalized_sql = models.TextField(
+        verbose_name="Mẫu câu SQL",
+        help_text="Câu SQL đã thay literal bằng ?, gộp khoảng trắng và chuyển về chữ hoa"
+    )
+    
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Thời gian tạo",
+        help_text="Lần đầu tiên mẫu câu SQL xuất hiện"
+    )
+    
+    class Meta:
+        verbose_name = "Mẫu câu SQL"
+        verbose_name_plural = "Mẫu câu SQL"
+    
+    def __str__(self):
+        return self.normalized_sql[:80]
+
+
 class SqlLog(models.Model):
     """Model để lưu trữ dữ liệu SQL log"""
     
@@ -393,15 +422,43 @@ class SqlLog(models.Model):
         help_text="Gợi ý tối ưu hóa dựa trên phân tích SQL"
     )
     
+    fingerprint = models.ForeignKey(
+        QueryFingerprint,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='logs',
+        verbose_name="Mẫu câu SQL",
+        help_text="Mẫu câu SQL đã chuẩn hóa (gom các câu chỉ khác nhau ở giá trị literal)"
+    )
+    
     class Meta:
         verbose_name = "SQL Log"
         verbose_name_plural = "SQL Logs"
         ordering = ['-created_at']
+        # Index theo đúng mẫu truy vấn của các view: lọc database_name rồi sắp xếp
+        # theo exec_time_ms / exec_count / created_at. Index (database_name, ...) thay
+        # cho index đơn trên database_name, (created_at, id) thay cho created_at.
         indexes = [
-            models.Index(fields=['database_name']),
             models.Index(fields=['exec_time_ms']),
             models.Index(fields=['exec_count']),
-            models.Index(fields=['created_at']),
+            # Phân trang keyset theo (created_at, id), có và không lọc database
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['database_name', 'created_at', 'id']),
+            # Top truy vấn chậm nhất / thực thi nhiều nhất của một database
+            models.Index(fields=['database_name', 'exec_time_ms']),
+            models.Index(fields=['database_name', 'exec_count']),
+            # Partial index cho điều kiện truy vấn bất thường (abnormal_queries, báo cáo)
+            models.Index(
+                fields=['database_name', 'created_at'],
+                condition=models.Q(exec_time_ms__gt=500, exec_count__gt=100),
+                name='sqllog_abnormal_created_idx',
+            ),
+            models.Index(
+                fields=['exec_time_ms'],
+                condition=models.Q(exec_time_ms__gt=500, exec_count__gt=100),
+                name='sqllog_abnormal_exec_time_idx',
+            ),
         ]
     
     def __str__(self):
@@ -420,6 +477,198 @@ class SqlLog(models.Model):
         return 0
 
 
+class SqlLogRollup(models.Model):
+    """
+    Số liệu SqlLog đã tổng hợp sẵn theo (database, mẫu câu SQL, giờ/ngày)
+
+    Được cộng dồn trong cùng transaction với mỗi batch import nên các trang thống
+    kê chỉ cần đọc số bucket thay vì quét toàn bộ SqlLog.
+    """
+    
+    database_name = models.CharField(
+        max_length=50,
+        verbose_name="Tên Database"
+    )
+    
+    # PROTECT: bucket đã compact là số liệu duy nhất còn lại, không được mất theo mẫu câu SQL
+    fingerprint = models.ForeignKey(
+        QueryFingerprint,
+        on_delete=models.PROTECT,
+        related_name='rollups',
+        verbose_name="Mẫu câu SQL"
+    )
+    
+    period = models.CharField(
+        max_length=10,
+        choices=[
+            ('hour', 'Giờ'),
+            ('day', 'Ngày'),
+        ],
+        verbose_name="Chu kỳ"
+    )
+    
+    bucket_start = models.DateTimeField(
+        verbose_name="Bắt đầu chu kỳ",
+        help_text="Đầu giờ/ngày (theo TIME_ZONE) của các SqlLog được tổng hợp"
+    )
+    
+    count = models.BigIntegerField(
+        default=0,
+        verbose_name="Số logs"
+    )
+    
+    sum_exec_time_ms = models.BigIntegerField(
+        default=0,
+        verbose_name="Tổng thời gian thực thi (ms)"
+    )
+    
+    min_exec_time_ms = models.PositiveIntegerField(
+        verbose_name="Thời gian thực thi nhỏ nhất (ms)"
+    )
+    
+    max_exec_time_ms = models.PositiveIntegerField(
+        verbose_name="Thời gian thực thi lớn nhất (ms)"
+    )
+    
+    sum_exec_count = models.BigIntegerField(
+        default=0,
+        verbose_name="Tổng số lần thực thi"
+    )
+    
+    class Meta:
+        verbose_name = "Tổng hợp SQL Log"
+        verbose_name_plural = "Tổng hợp SQL Log"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['database_name', 'fingerprint', 'period', 'bucket_start'],
+                name='unique_sqllog_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'database_name', 'bucket_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.database_name} - {self.period} {self.bucket_start:%Y-%m-%d %H:%M} ({self.count})"
+    
+    @property
+    def avg_exec_time_ms(self):
+        """Thời gian thực thi trung bình của bucket"""
+        if self.count > 0:
+            return self.sum_exec_time_ms / self.count
+        return 0
+
+
+class StatisticsVersion(models.Model):
+    """
+    Version dữ liệu thống kê của từng database
+
+    Tăng trong cùng transaction với mỗi batch import, dùng làm một phần khóa cache
+    của trang thống kê: cache tự hết hiệu lực khi có dữ liệu mới được commit.
+    """
+    
+    database_name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name="Tên Database"
+    )
+    
+    version = models.BigIntegerField(
+        default=0,
+        verbose_name="Version"
+    )
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Cập nhật lúc"
+    )
+    
+    class Meta:
+        verbose_name = "Version thống kê"
+        verbose_name_plural = "Version thống kê"
+    
+    def __str__(self):
+        return f"{self.database_name} v{self.version}"
+
+
+class IngestedLine(models.Model):
+    """
+    Hash của các dòng log đã import khi bật chống trùng, để import lại cùng một file
+    (kể cả khi file đã được ghi thêm) không tạo SqlLog trùng
+
+    Khóa gồm nguồn (file), số dòng, thời gian trong log và nội dung đã parse (xem
+    ingestion.row_hash). Bảng riêng (không phải cột unique trên SqlLog) để dùng được
+    với SqlLog phân vùng và vẫn nhớ các dòng đã bị compact; hash được giữ
+    INGESTED_LINE_RETENTION_DAYS ngày. Các dòng import trước khi bật chống trùng chỉ
+    có hash sau khi chạy lệnh backfill_ingested_lines.
+    """
+    
+    row_hash = models.CharField(
+        max_length=40,
+        primary_key=True,
+        verbose_name="Hash dòng log",
+        help_text="SHA-1 của (nguồn, số dòng, thời gian, database, câu SQL, thời gian thực thi, số lần thực thi)"
+    )
+    
+    ingested_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name="Thời gian import",
+        help_text="Hash cũ hơn INGESTED_LINE_RETENTION_DAYS ngày bị xóa khi chạy compact_logs"
+    )
+    
+    class Meta:
+        verbose_name = "Dòng log đã import"
+        verbose_name_plural = "Dòng log đã import"
+    
+    def __str__(self):
+        return self.row_hash
+
+
+class LogCompaction(models.Model):
+    """
+    Một lần chạy compact_logs: SqlLog tạo trước cutoff đã được xóa
+
+    Số liệu của các dòng đã xóa chỉ còn trong bucket ngày của SqlLogRollup nên
+    rebuild_rollups không xóa/dựng lại các bucket trước cutoff mới nhất.
+    """
+    
+    cutoff = models.DateTimeField(
+        verbose_name="Mốc thời gian",
+        help_text="Các SqlLog tạo trước thời điểm này đã được gộp vào bảng tổng hợp và xóa"
+    )
+    
+    deleted_rows = models.BigIntegerField(
+        default=0,
+        verbose_name="Số dòng đã xóa"
+    )
+    
+    reclaimed_bytes = models.BigIntegerField(
+        default=0,
+        verbose_name="Dung lượng giải phóng (byte)",
+        help_text="Tổng kích thước các dòng đã xóa (ước lượng nếu không phải PostgreSQL)"
+    )
+    
+    started_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Bắt đầu"
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Kết thúc"
+    )
+    
+    class Meta:
+        verbose_name = "Lần compact SQL Log"
+        verbose_name_plural = "Các lần compact SQL Log"
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Compact trước {self.cutoff:%d/%m/%Y}: {self.deleted_rows} dòng"
+
+
 class LogFile(models.Model):
     """Model để lưu thông tin về file log đã được xử lý"""
     
@@ -442,6 +691,21 @@ class LogFile(models.Model):
         help_text="Kích thước file tính bằng bytes"
     )
     
+    checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name="Checksum",
+        help_text="SHA-256 nội dung file (file nén: của dữ liệu nén)"
+    )
+    
+    duplicate_lines = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Số dòng trùng",
+        help_text="Số dòng đã được import trước đó nên bị bỏ qua"
+    )
+    
     total_lines = models.PositiveIntegerField(
         verbose_name="Tổng số dòng",
         help_text="Tổng số dòng trong file",
@@ -507,6 +771,64 @@ class LogFile(models.Model):
         help_text="Chi tiết các dòng lỗi không thể xử lý"
     )
     
+    import_method = models.CharField(
+        max_length=20,
+        choices=[
+            ('bulk', 'bulk_create'),
+            ('copy', 'COPY (PostgreSQL)'),
+            ('tail', 'tail_logs'),
+        ],
+        blank=True,
+        null=True,
+        verbose_name="Phương thức import",
+        help_text="Phương thức ghi dữ liệu vào database"
+    )
+    
+    rows_per_second = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Tốc độ import (dòng/giây)",
+        help_text="Số dòng được ghi vào database mỗi giây"
+    )
+    
+    phase_timings = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Thời gian từng giai đoạn",
+        help_text="Thời gian (giây) của từng giai đoạn import: đếm dòng, parse, ghi database, ..."
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('running', 'Đang import'),
+            ('failed', 'Lỗi'),
+            ('completed', 'Hoàn thành'),
+        ],
+        default='completed',
+        verbose_name="Trạng thái",
+        help_text="Trạng thái import; import chưa hoàn thành có thể chạy tiếp bằng --resume"
+    )
+    
+    last_offset = models.BigIntegerField(
+        default=0,
+        verbose_name="Checkpoint (byte)",
+        help_text="Vị trí byte ngay sau dòng cuối cùng đã được ghi vào database"
+    )
+    
+    last_line_number = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Checkpoint (dòng)",
+        help_text="Số dòng cuối cùng đã được ghi vào database"
+    )
+    
+    inode = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Inode",
+        help_text="Inode của file tại checkpoint (tail_logs), để chạy tiếp khi file chưa bị rotate"
+    )
+    
     class Meta:
         verbose_name = "Log File"
         verbose_name_plural = "Log Files"
@@ -520,4 +842,168 @@ class LogFile(models.Model):
         """Tỷ lệ thành công"""
         if self.total_lines > 0:
             return (self.processed_lines / self.total_lines) * 100
-        return 0
\ No newline at end of file
+        return 0
+
+
+class ReportJob(models.Model):
+    """
+    Báo cáo được tạo nền bởi lệnh run_report_worker; bảng này cũng là hàng đợi
+
+    Danh sách database user được xem được chốt khi tạo job. File kết quả bị xóa
+    sau expires_at.
+    """
+    
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='report_jobs',
+        verbose_name="Người dùng",
+        help_text="Người yêu cầu báo cáo"
+    )
+    
+    report_type = models.CharField(
+        max_length=20,
+        choices=[
+            ('summary', 'Báo cáo tổng hợp'),
+            ('detailed', 'Báo cáo chi tiết'),
+            ('abnormal', 'Truy vấn bất thường'),
+        ],
+        verbose_name="Loại báo cáo"
+    )
+    
+    format_type = models.CharField(
+        max_length=10,
+        choices=[
+            ('csv', 'CSV'),
+            ('pdf', 'PDF'),
+            ('json', 'JSON'),
+        ],
+        verbose_name="Định dạng"
+    )
+    
+    database_filter = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        verbose_name="Lọc database",
+        help_text="Chỉ lấy logs của database này (để trống: tất cả database được phép)"
+    )
+    
+    database_names = models.JSONField(
+        default=list,
+        verbose_name="Database được phép",
+        help_text="Các database user có quyền truy cập tại thời điểm tạo job"
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('pending', 'Đang chờ'),
+            ('running', 'Đang tạo'),
+            ('completed', 'Hoàn thành'),
+            ('failed', 'Lỗi'),
+            ('expired', 'Hết hạn'),
+        ],
+        default='pending',
+        verbose_name="Trạng thái"
+    )
+    
+    processed_rows = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Số dòng đã xử lý"
+    )
+    
+    total_rows = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Tổng số dòng",
+        help_text="Số dòng báo cáo sẽ đọc (không có với báo cáo tổng hợp)"
+    )
+    
+    artifact = models.FileField(
+        upload_to='reports/%Y/%m/%d/',
+        blank=True,
+        verbose_name="File báo cáo"
+    )
+    
+    file_name = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Tên file tải về"
+    )
+    
+    content_type = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Content-Type"
+    )
+    
+    file_size = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Kích thước file (bytes)"
+    )
+    
+    error_message = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Lỗi"
+    )
+    
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Worker",
+        help_text="Tiến trình worker đang/đã xử lý job (host:pid)"
+    )
+    
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Thời gian tạo"
+    )
+    
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Bắt đầu"
+    )
+    
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Cập nhật tiến độ lần cuối"
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Kết thúc"
+    )
+    
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Hết hạn",
+        help_text="Sau thời điểm này file báo cáo bị xóa"
+    )
+    
+    class Meta:
+        verbose_name = "Báo cáo tạo nền"
+        verbose_name_plural = "Báo cáo tạo nền"
+        ordering = ['-created_at']
+        indexes = [
+            # Worker lấy job pending cũ nhất; dọn job hết hạn / bị treo
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} ({self.format_type}) - {self.get_status_display()}"
+    
+    @property
+    def progress(self):
+        """Phần trăm hoàn thành (None nếu chưa biết tổng số dòng)"""
+        if self.status == 'completed':
+            return 100
+        if self.total_rows:
+            return min(99, self.processed_rows * 100 // self.total_rows)
+        return None
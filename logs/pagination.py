@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Phân trang keyset (seek) cho SqlLog theo (created_at, id) giảm dần
+
+Thay cho Paginator (COUNT(*) + OFFSET): mỗi trang chỉ đọc per_page + 1 dòng tiếp
+theo trên index (created_at, id) nên trang thứ 10.000 tốn như trang đầu. Vị trí
+được truyền qua cursor mờ (base64 của khóa dòng đầu/cuối trang và chiều đi).
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+ORDERING = ('-created_at', '-id')
+
+
+def encode_cursor(log, direction):
+    """Cursor cho trang liền sau (direction='next') hoặc liền trước ('prev') dòng log"""
+    data = json.dumps([direction, log.created_at.isoformat(), log.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Trả về (direction, created_at, id); ValueError nếu cursor không hợp lệ"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, created_at, log_id = json.loads(data.decode('utf-8'))
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Cursor không hợp lệ: {cursor!r}') from e
+    if direction not in ('next', 'prev') or not isinstance(log_id, int) or created_at.tzinfo is None:
+        raise ValueError(f'Cursor không hợp lệ: {cursor!r}')
+    return direction, created_at, log_id
+
+
+def seek_filter(created_at, log_id, direction='next'):
+    """
+    Điều kiện lấy các dòng đứng sau ('next') hoặc trước ('prev') khóa (created_at, id)
+
+    Có thêm created_at <= / >= để database dùng được khoảng quét trên index.
+    """
+    if direction == 'next':
+        return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=log_id))
+    return Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=log_id))
+
+
+class KeysetPage:
+    """Một trang kết quả: lặp được như list, kèm cursor sang trang trước/sau"""
+
+    def __init__(self, items, has_next, has_previous):
+        self.items = items
+        # Trang rỗng không có khóa để tạo cursor
+        self.has_next = has_next and bool(items)
+        self.has_previous = has_previous and bool(items)
+        self.next_cursor = encode_cursor(items[-1], 'next') if self.has_next else None
+        self.prev_cursor = encode_cursor(items[0], 'prev') if self.has_previous else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def keyset_paginate(queryset, cursor=None, per_page=20):
+    """
+    Lấy một trang của queryset SqlLog theo thứ tự created_at, id giảm dần
+
+    Raises:
+        ValueError: cursor không hợp lệ
+    """
+    if not cursor:
+        items = list(queryset.order_by(*ORDERING)[:per_page + 1])
+        return KeysetPage(items[:per_page], len(items) > per_page, False)
+
+    direction, created_at, log_id = decode_cursor(cursor)
+    if direction == 'next':
+        items = list(queryset.filter(
+            seek_filter(created_at, log_id, 'next')
+        ).order_by(*ORDERING)[:per_page + 1])
+        return KeysetPage(items[:per_page], len(items) > per_page, True)
+
+    # Trang trước: đọc ngược từ khóa rồi đảo lại thứ tự hiển thị
+    items = list(queryset.filter(
+        seek_filter(created_at, log_id, 'prev')
+    ).order_by('created_at', 'id')[:per_page + 1])
+    has_previous = len(items) > per_page
+    return KeysetPage(items[:per_page][::-1], True, has_previous)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Parser dùng chung cho các dòng SQL log dạng
+DB:database_name,sql:SQL_query,exec_time_ms:time,exec_count:count
+
+Module này không phụ thuộc Django để các script độc lập (log_reader.py,
+log_processor.py, simple_test.py) và các process con khi parse song song
+đều dùng được.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+# Thứ tự các trường trong tuple trả về bởi parse_log_line
+LOG_FIELDS = ('database_name', 'sql_query', 'exec_time_ms', 'exec_count')
+
+# Các pattern được compile một lần khi import module. Phần đuôi
+# ",exec_time_ms:<số>,exec_count:<số>" được neo ở cuối dòng nên câu SQL có thể
+# chứa dấu phẩy (VD: SELECT a, b FROM ...).
+#
+# Đa số câu SQL không có dấu phẩy: pattern nhanh ([^,]+) được thử trước, chỉ khi
+# không khớp mới dùng pattern tổng quát (.+ phải quay lui từ cuối dòng). Với dòng
+# không có dấu phẩy trong SQL, hai pattern cho cùng kết quả.
+_match_simple_line = re.compile(
+    r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
+).fullmatch
+_match_any_line = re.compile(
+    r'DB:([^,]+),sql:(.+),exec_time_ms:(\d+),exec_count:(\d+)'
+).fullmatch
+
+
+def parse_log_line(line: str) -> Optional[Tuple[str, str, int, int]]:
+    """
+    Parse một dòng log thành tuple (database_name, sql_query, exec_time_ms, exec_count)
+
+    Trả về None nếu dòng không đúng định dạng.
+    """
+    line = line.strip()
+    match = _match_simple_line(line) or _match_any_line(line)
+    if match is None:
+        return None
+    database_name, sql_query, exec_time_ms, exec_count = match.groups()
+    return database_name, sql_query, int(exec_time_ms), int(exec_count)
+
+
+def split_file_ranges(file_path: str, range_size: int, start: int = 0) -> List[Tuple[int, int]]:
+    """Chia file (từ byte start) thành các đoạn byte [start, end) kết thúc tại ký tự xuống dòng"""
+    ranges = []
+    with open(file_path, 'rb') as file:
+        file_size = file.seek(0, 2)
+        while start < file_size:
+            file.seek(min(start + range_size, file_size))
+            # Đọc tiếp đến hết dòng hiện tại để không cắt đôi một dòng
+            file.readline()
+            end = min(file.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_file_range(file_path: str, start: int, end: int):
+    """
+    Parse một đoạn file (dùng trong process con khi parse song song)
+
+    Số dòng trả về là số thứ tự tương đối trong đoạn (bắt đầu từ 1), process cha
+    cộng thêm số dòng của các đoạn trước để ra số dòng thật trong file.
+
+    Returns:
+        (line_count, rows, failures): rows là list (dòng, offset, database, sql, exec_time_ms, exec_count)
+        với offset là vị trí byte ngay sau dòng đó trong file, failures là list
+        (dòng, nội dung) của các dòng không parse được
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    lines = data.split(b'\n')
+    if data.endswith(b'\n'):
+        lines.pop()
+
+    rows = []
+    failures = []
+    offset = start
+    for line_num, raw_line in enumerate(lines, 1):
+        offset = min(offset + len(raw_line) + 1, end)
+        line = raw_line.decode('utf-8')
+        if line.strip():
+            parsed = parse_log_line(line)
+            if parsed:
+                rows.append((line_num, offset) + parsed)
+            else:
+                failures.append((line_num, line.strip()))
+    return len(lines), rows, failures
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Phân vùng (declarative range partitioning) bảng SqlLog theo tháng của created_at trên PostgreSQL
+
+Tùy chọn: bảng thường vẫn chạy bình thường. convert_to_partitioned() chuyển bảng
+hiện có sang bảng phân vùng (một transaction, sao chép dữ liệu); sau đó lệnh
+manage_partitions tạo trước phân vùng cho các tháng tới và xóa phân vùng hết hạn
+bằng DETACH + DROP (O(1), không DELETE từng dòng).
+
+Tháng được tính theo múi giờ hiện tại (TIME_ZONE), giống bucket ngày của rollups.
+Khóa chính trong database là (id, created_at) vì PostgreSQL yêu cầu khóa chính chứa
+cột phân vùng; Django vẫn dùng id làm khóa chính.
+"""
+
+import re
+from datetime import datetime
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import SqlLog, SqlLogRollup
+from .rollups import bump_statistics_versions
+
+TABLE = SqlLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+_PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(value):
+    """Đầu tháng (giờ địa phương) chứa thời điểm value"""
+    local_time = timezone.localtime(value)
+    return timezone.make_aware(datetime(local_time.year, local_time.month, 1))
+
+
+def add_months(month, count):
+    """Đầu tháng cách month count tháng"""
+    index = month.year * 12 + month.month - 1 + count
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned(using='default'):
+    """Bảng SqlLog đã là bảng phân vùng chưa (luôn False nếu không phải PostgreSQL)"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(using='default'):
+    """Các phân vùng theo tháng đang gắn vào SqlLog: list (đầu tháng, tên bảng) tăng dần"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)", [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((timezone.make_aware(datetime(int(match[1]), int(match[2]), 1)), name))
+    return sorted(partitions)
+
+
+def _bound(value):
+    return f"'{value.isoformat()}'"
+
+
+def create_partition(month, using='default'):
+    """
+    Tạo phân vùng cho tháng chứa month nếu chưa có, trả về True nếu vừa tạo
+
+    Dòng của tháng này đang nằm trong phân vùng default (nếu có) được chuyển sang
+    phân vùng mới trước khi ATTACH.
+    """
+    month = month_start(month)
+    name = partition_name(month)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    start, end = month, add_months(month, 1)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f"CREATE TABLE {quote_name(name)} (LIKE {quote_name(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute("SELECT to_regclass(%s)", [DEFAULT_PARTITION])
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {quote_name(DEFAULT_PARTITION)} "
+                f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                f"INSERT INTO {quote_name(name)} SELECT * FROM moved", [start, end]
+            )
+        cursor.execute(
+            f"ALTER TABLE {quote_name(TABLE)} ATTACH PARTITION {quote_name(name)} "
+            f"FOR VALUES FROM ({_bound(start)}) TO ({_bound(end)})"
+        )
+    return True
+
+
+def ensure_partitions(months_ahead=3, using='default'):
+    """Tạo phân vùng từ tháng hiện tại đến months_ahead tháng tới, trả về tên các phân vùng mới"""
+    current = month_start(timezone.now())
+    return [
+        partition_name(add_months(current, offset)) for offset in range(months_ahead + 1)
+        if create_partition(add_months(current, offset), using)
+    ]
+
+
+def drop_partitions_before(cutoff, using='default'):
+    """
+    DETACH + DROP các phân vùng tháng kết thúc trước cutoff, trả về tên đã xóa
+
+    Bucket tổng hợp trước cutoff cũng được xóa để thống kê khớp với dữ liệu còn lại.
+    """
+    cutoff = month_start(cutoff)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    dropped = []
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            for month, name in list_partitions(using):
+                if add_months(month, 1) > cutoff:
+                    break
+                cursor.execute(f"ALTER TABLE {quote_name(TABLE)} DETACH PARTITION {quote_name(name)}")
+                cursor.execute(f"DROP TABLE {quote_name(name)}")
+                dropped.append(name)
+        if dropped:
+            expired = SqlLogRollup.objects.using(using).filter(bucket_start__lt=cutoff)
+            database_names = set(expired.order_by().values_list('database_name', flat=True).distinct())
+            expired.delete()
+            bump_statistics_versions(database_names, using)
+    return dropped
+
+
+def convert_to_partitioned(months_ahead=3, using='default'):
+    """
+    Chuyển bảng SqlLog thường thành bảng phân vùng theo tháng (một transaction)
+
+    Giữ nguyên index, khóa ngoại, CHECK và giá trị id tiếp theo; tạo phân vùng cho
+    mọi tháng đã có dữ liệu đến months_ahead tháng tới cùng phân vùng default.
+    Trả về số dòng đã chuyển.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    old_table = f'{TABLE}_unpartitioned'
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        # Kiểm tra ngay các khóa ngoại DEFERRED đang chờ để DROP được bảng cũ
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        # Định nghĩa index (trừ khóa chính) và khóa ngoại để tạo lại trên bảng mới
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = to_regclass(%s) AND NOT indisprimary", [TABLE]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT min(created_at), max(id) FROM {quote_name(TABLE)}")
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {quote_name(TABLE)} RENAME TO {quote_name(old_table)}")
+        cursor.execute(
+            f"CREATE TABLE {quote_name(TABLE)} (LIKE {quote_name(old_table)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote_name(DEFAULT_PARTITION)} PARTITION OF {quote_name(TABLE)} DEFAULT"
+        )
+        month = month_start(oldest or timezone.now())
+        last = add_months(month_start(timezone.now()), months_ahead)
+        while month <= last:
+            create_partition(month, using)
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {quote_name(TABLE)} SELECT * FROM {quote_name(old_table)}")
+        moved = cursor.rowcount
+        cursor.execute(f"DROP TABLE {quote_name(old_table)}")
+
+        # Sequence identity mới bắt đầu từ 1: đặt lại sau id lớn nhất
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute("SELECT setval(%s, %s, %s)", [sequence, max_id or 1, max_id is not None])
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {quote_name(TABLE + '_id_seq')}")
+
+        cursor.execute(
+            f"ALTER TABLE {quote_name(TABLE)} ADD CONSTRAINT {quote_name(TABLE + '_pkey')} "
+            f"PRIMARY KEY (id, created_at)"
+        )
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote_name(TABLE)} ADD CONSTRAINT {quote_name(name)} {definition}")
+    return moved
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Font và style dùng chung cho các báo cáo PDF (ReportLab)
+
+Font Unicode được tìm và đăng ký một lần cho mỗi process, theo thứ tự:
+settings.PDF_FONT_PATH, file .ttf đặt trong logs/fonts/, rồi font hệ thống
+(Linux, macOS, Windows). Chỉ nhận font có đủ ký tự tiếng Việt; không có font nào
+thì dùng Helvetica (mất dấu). Các ParagraphStyle / TableStyle cũng chỉ tạo một
+lần và được dùng lại cho mọi báo cáo.
+
+Bảng lớn được chia thành các Table PDF_TABLE_CHUNK_ROWS dòng (lặp lại dòng tiêu
+đề khi sang trang) và được tạo dần trong lúc dựng trang (StreamingDocTemplate), nên
+chi phí layout tăng tuyến tính và chỉ vài bảng nằm trong bộ nhớ cùng lúc; nội dung
+mỗi trang được nén ngay khi vẽ xong. File PDF lớn hơn
+settings.REPORT_PDF_SPOOL_BYTES được ghi ra file tạm thay vì giữ trong RAM.
+"""
+
+import glob
+import itertools
+import logging
+import os
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFName, PDFStream, PDFZCompress
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+logger = logging.getLogger(__name__)
+
+FONT_NAME = 'VietnameseFont'
+FALLBACK_FONT_NAME = 'Helvetica'
+
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+
+SYSTEM_FONT_PATHS = [
+    # Linux
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
+    # macOS
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    '/Library/Fonts/Arial.ttf',
+    # Windows
+    'C:/Windows/Fonts/arial.ttf',
+    'C:/Windows/Fonts/arialuni.ttf',
+    'C:/Windows/Fonts/tahoma.ttf',
+    'C:/Windows/Fonts/calibri.ttf',
+    'C:/Windows/Fonts/segoeui.ttf',
+]
+
+# Số dòng dữ liệu của mỗi Table con (khoảng một trang A4 với cỡ chữ 6)
+PDF_TABLE_CHUNK_ROWS = 36
+
+# Ký tự phải có trong font để hiển thị được tiếng Việt
+VIETNAMESE_SAMPLE = 'ăâđêôơưạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹĐƯƠ'
+
+
+def font_candidates():
+    """Các file font sẽ thử, theo thứ tự ưu tiên"""
+    candidates = []
+    configured = getattr(settings, 'PDF_FONT_PATH', None)
+    if configured:
+        candidates.append(str(configured))
+    candidates.extend(sorted(glob.glob(os.path.join(BUNDLED_FONT_DIR, '*.ttf'))))
+    candidates.extend(SYSTEM_FONT_PATHS)
+    return candidates
+
+
+def supports_vietnamese(font):
+    char_to_glyph = font.face.charToGlyph
+    return all(ord(char) in char_to_glyph for char in VIETNAMESE_SAMPLE)
+
+
+@lru_cache(maxsize=None)
+def pdf_font():
+    """Tên font đã đăng ký với ReportLab (tìm một lần cho mỗi process)"""
+    for path in font_candidates():
+        if not os.path.isfile(path):
+            continue
+        try:
+            font = TTFont(FONT_NAME, path)
+        except (TTFError, OSError) as e:
+            logger.warning('Không đọc được font %s: %s', path, e)
+            continue
+        if not supports_vietnamese(font):
+            logger.info('Font %s thiếu ký tự tiếng Việt, bỏ qua', path)
+            continue
+        pdfmetrics.registerFont(font)
+        logger.info('Font PDF: %s', path)
+        return FONT_NAME
+
+    logger.warning('Không tìm thấy font Unicode cho PDF (đặt PDF_FONT_PATH), dùng %s', FALLBACK_FONT_NAME)
+    return FALLBACK_FONT_NAME
+
+
+@lru_cache(maxsize=None)
+def paragraph_styles():
+    """Style tiêu đề / đề mục / văn bản của báo cáo: {'title', 'heading', 'normal'}"""
+    font_name = pdf_font()
+    sample = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=sample['Heading1'],
+            fontName=font_name,
+            fontSize=18,
+            spaceAfter=30,
+            alignment=1
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=sample['Heading2'],
+            fontName=font_name,
+            fontSize=14,
+            spaceAfter=12
+        ),
+        'normal': ParagraphStyle(
+            'CustomNormal',
+            parent=sample['Normal'],
+            fontName=font_name,
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def info_table_style():
+    """Style bảng thông tin báo cáo (thời gian tạo, bộ lọc...)"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), pdf_font()),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ])
+
+
+@lru_cache(maxsize=None)
+def data_table_style(header_font_size, body_font_size):
+    """Style bảng dữ liệu có dòng tiêu đề"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), pdf_font()),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('FONTSIZE', (0, 1), (-1, -1), body_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+
+
+def iter_table_chunks(headers, rows, col_widths, style, chunk_rows=None):
+    """Chia rows thành các Table chunk_rows dòng, mỗi bảng có dòng tiêu đề (lặp lại khi bảng bị tách trang)"""
+    chunk_rows = chunk_rows or PDF_TABLE_CHUNK_ROWS
+    rows = iter(rows)
+    while True:
+        chunk = [[str(value) for value in row] for row in itertools.islice(rows, chunk_rows)]
+        if not chunk:
+            return
+        table = Table([headers] + chunk, colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+
+class CompressingCanvas(Canvas):
+    """
+    Canvas nén nội dung mỗi trang ngay khi vẽ xong (ReportLab giữ mọi trang trong bộ nhớ đến khi save)
+
+    ReportLab không có API công khai cho việc này (pageCompression chỉ nén khi save):
+    dùng cấu trúc nội bộ PDFPage.stream / Contents của reportlab 4.0 (xem
+    requirements.txt). Nếu phiên bản khác đổi cấu trúc này, trang được giữ nguyên
+    và vẫn được nén khi save; PdfRenderingTests báo lỗi khi trang không còn được
+    nén sớm.
+    """
+
+    def showPage(self):
+        super().showPage()
+        pages = getattr(getattr(self._doc, 'Pages', None), 'pages', None)
+        if not pages:
+            return
+        page = pages[-1]
+        if getattr(page, 'compression', 0) and getattr(page, 'stream', None) and getattr(page, 'Contents', 0) is None:
+            contents = PDFStream(content=PDFZCompress.encode(page.stream))
+            contents.dictionary['Filter'] = PDFArray([PDFName(PDFZCompress.pdfname)])
+            contents.__Comment__ = 'page stream'
+            page.Contents = contents
+            page.stream = None
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """
+    SimpleDocTemplate nhận story là iterator: flowable được lấy dần khi dựng trang
+
+    ReportLab xử lý story như một list (xóa phần tử đầu sau khi vẽ); list chỉ được
+    nạp thêm vài flowable mỗi lần nên không giữ cả báo cáo trong bộ nhớ.
+    """
+
+    lookahead = 3
+
+    def build(self, story, **kwargs):
+        self._pending = iter(story)
+        self._story = list(itertools.islice(self._pending, self.lookahead))
+        kwargs.setdefault('canvasmaker', CompressingCanvas)
+        super().build(self._story, **kwargs)
+
+    def filterFlowables(self, flowables):
+        # Hàm này cũng được gọi với list nội bộ (_hanging) của ReportLab: chỉ nạp cho story
+        if flowables is self._story and len(flowables) < self.lookahead:
+            flowables.extend(itertools.islice(self._pending, self.lookahead - len(flowables)))
+
+
+def render_pdf(story):
+    """Dựng PDF khổ A4 từ story (list hoặc iterator), trả về file đã seek(0)"""
+    output = tempfile.SpooledTemporaryFile(
+        max_size=getattr(settings, 'REPORT_PDF_SPOOL_BYTES', 8 * 1024 * 1024)
+    )
+    try:
+        StreamingDocTemplate(output, pagesize=A4, pageCompression=1).build(story)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def reset():
+    """Bỏ font / style đã cache (khi đổi PDF_FONT_PATH, dùng trong test)"""
+    for cached in (pdf_font, paragraph_styles, info_table_style, data_table_style):
+        cached.cache_clear()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Cache file báo cáo đã tạo (CSV/PDF/JSON) trên đĩa, địa chỉ theo nội dung
+
+Khóa là SHA-256 của (loại báo cáo, định dạng, lọc database, version thống kê
+của từng database được đọc). Version tăng trong cùng transaction với mọi lần ghi
+SqlLog (import, compact, xóa phân vùng, admin) nên báo cáo cũ không bao giờ được
+trả lại sau khi dữ liệu thay đổi: khóa mới đơn giản là chưa có trong cache.
+
+Mỗi báo cáo là một file <khóa>.bin cùng <khóa>.json (Content-Type,
+Content-Disposition). Khi tổng dung lượng vượt REPORT_CACHE_MAX_BYTES, các file
+lâu chưa dùng nhất (theo mtime, được cập nhật mỗi lần đọc) bị xóa. Báo cáo lớn hơn
+1/4 giới hạn không được cache.
+
+Nội dung báo cáo trả từ cache giữ nguyên "Thời gian tạo" của lần tạo đầu tiên:
+header X-Report-Generated-At (có cả khi báo cáo vừa được tạo) cho biết thời điểm
+đó, còn tên file tải về được đặt lại theo thời gian hiện tại như báo cáo mới.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils import timezone
+
+from .rollups import statistics_versions
+
+# Tăng khi nội dung/định dạng báo cáo thay đổi để bỏ qua các file cache cũ
+REPORT_CACHE_FORMAT = 3
+
+# Thời gian trong tên file báo cáo (bao_cao_..._YYYYmmdd_HHMMSS.csv)
+_FILENAME_TIME = re.compile(r'\d{8}_\d{6}')
+
+
+def cache_dir():
+    return str(getattr(settings, 'REPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'report_cache')))
+
+
+def max_bytes():
+    """Dung lượng tối đa của cache (0: tắt cache)"""
+    return getattr(settings, 'REPORT_CACHE_MAX_BYTES', 0)
+
+
+def report_key(report_type, format_type, database_names, database_filter=''):
+    """Khóa cache của báo cáo trên dữ liệu hiện tại"""
+    names = [database_filter] if database_filter else database_names
+    key_data = json.dumps([
+        REPORT_CACHE_FORMAT, report_type, format_type, database_filter, statistics_versions(names)
+    ])
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+def _paths(key):
+    directory = cache_dir()
+    return os.path.join(directory, f'{key}.bin'), os.path.join(directory, f'{key}.json')
+
+
+def get(key):
+    """FileResponse của báo cáo đã cache, None nếu chưa có"""
+    if not max_bytes():
+        return None
+    data_path, meta_path = _paths(key)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        data = open(data_path, 'rb')
+    except (OSError, ValueError):
+        return None
+    # Đánh dấu vừa dùng cho LRU
+    try:
+        os.utime(data_path)
+    except OSError:
+        pass
+    response = FileResponse(data, content_type=meta['content_type'])
+    if meta['content_disposition']:
+        response['Content-Disposition'] = _FILENAME_TIME.sub(
+            timezone.localtime().strftime('%Y%m%d_%H%M%S'), meta['content_disposition'], count=1
+        )
+    response['X-Report-Cache'] = 'hit'
+    response['X-Report-Generated-At'] = meta['generated_at']
+    return response
+
+
+def _commit(key, temp_path, response):
+    """Đưa file tạm vào cache (ghi metadata trước file dữ liệu) rồi dọn cache"""
+    data_path, meta_path = _paths(key)
+    meta = {
+        'content_type': response['Content-Type'],
+        'content_disposition': response.get('Content-Disposition', ''),
+        'generated_at': response.get('X-Report-Generated-At') or timezone.localtime().isoformat(timespec='seconds'),
+    }
+    with tempfile.NamedTemporaryFile('w', dir=cache_dir(), suffix='.tmp', delete=False, encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(f.name, meta_path)
+    os.replace(temp_path, data_path)
+    evict()
+
+
+def _tee(key, response, chunks):
+    """Trả lại từng khối của response stream, đồng thời ghi vào cache nếu stream chạy hết"""
+    limit = max_bytes() // 4
+    handle, temp_path = tempfile.mkstemp(dir=cache_dir(), suffix='.tmp')
+    output = os.fdopen(handle, 'wb')
+    size = 0
+    complete = False
+    try:
+        for chunk in chunks:
+            if output is not None:
+                size += len(chunk)
+                if size > limit:
+                    output.close()
+                    output = None
+                else:
+                    output.write(chunk)
+            yield chunk
+        complete = output is not None
+    finally:
+        if output is not None:
+            output.close()
+        if complete:
+            _commit(key, temp_path, response)
+        else:
+            os.remove(temp_path)
+
+
+def store(key, response):
+    """
+    Ghi response báo cáo vào cache, trả về response để gửi cho client
+
+    Response stream chỉ được lưu khi client đọc hết (file tạm bị bỏ nếu ngắt giữa chừng).
+    """
+    if not max_bytes() or response.status_code != 200:
+        return response
+    response['X-Report-Generated-At'] = timezone.localtime().isoformat(timespec='seconds')
+    os.makedirs(cache_dir(), exist_ok=True)
+    if response.streaming:
+        response.streaming_content = _tee(key, response, response.streaming_content)
+        return response
+    if len(response.content) <= max_bytes() // 4:
+        with tempfile.NamedTemporaryFile(dir=cache_dir(), suffix='.tmp', delete=False) as f:
+            f.write(response.content)
+        _commit(key, f.name, response)
+    return response
+
+
+def evict(limit=None):
+    """Xóa các báo cáo lâu chưa dùng nhất cho đến khi cache không vượt limit byte, trả về số file đã xóa"""
+    limit = max_bytes() if limit is None else limit
+    directory = cache_dir()
+    entries = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if not name.endswith('.bin'):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name[:-len('.bin')]))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, key in sorted(entries):
+        if total <= limit:
+            break
+        for path in _paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    return removed
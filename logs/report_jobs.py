@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Hàng đợi báo cáo tạo nền: ReportJob trong database là hàng đợi, lệnh
+run_report_worker lấy job và tạo file
+
+Nhiều worker chạy song song được: job được nhận bằng SELECT ... FOR UPDATE SKIP
+LOCKED (PostgreSQL) nên mỗi job chỉ do một worker xử lý. Job đang chạy mà lâu
+không cập nhật tiến độ (worker bị dừng) được đưa lại vào hàng đợi; file của job
+hết hạn bị xóa.
+"""
+
+import logging
+import os
+import re
+import socket
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ReportJob
+from .reports import build_report, report_row_count
+
+logger = logging.getLogger(__name__)
+
+_FILENAME = re.compile(r'filename="([^"]+)"')
+
+
+def worker_name():
+    """Tên worker: host:pid"""
+    return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+
+def claim_job(worker):
+    """Nhận job pending cũ nhất (chuyển sang running), None nếu hàng đợi trống"""
+    while True:
+        with transaction.atomic():
+            job = (
+                ReportJob.objects.select_for_update(skip_locked=True)
+                .filter(status='pending').order_by('created_at', 'id').first()
+            )
+            if job is None:
+                return None
+            # UPDATE có điều kiện: an toàn cả khi database không hỗ trợ FOR UPDATE (SQLite)
+            now = timezone.now()
+            claimed = ReportJob.objects.filter(pk=job.pk, status='pending').update(
+                status='running', worker=worker, started_at=now, heartbeat_at=now, processed_rows=0
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def count_report_rows(job):
+    """Số dòng SqlLog báo cáo sẽ đọc (None với báo cáo tổng hợp)"""
+    return report_row_count(job.report_type, job.format_type, job.database_names, job.database_filter)
+
+
+def run_job(job):
+    """
+    Tạo file báo cáo của job đã nhận bằng claim_job và lưu vào job.artifact
+
+    Lỗi khi tạo báo cáo được ghi vào job (status failed), không raise. Trả về job.
+    """
+    running = ReportJob.objects.filter(pk=job.pk, status='running', worker=job.worker)
+
+    def progress(rows):
+        running.update(processed_rows=rows, heartbeat_at=timezone.now())
+
+    try:
+        job.total_rows = count_report_rows(job)
+        running.update(total_rows=job.total_rows)
+        response = build_report(
+            job.report_type, job.format_type, job.database_names, job.database_filter, progress
+        )
+        match = _FILENAME.search(response.get('Content-Disposition', ''))
+        file_name = match.group(1) if match else f'bao_cao_{job.id}.{job.format_type}'
+
+        # Ghi ra file tạm theo từng khối (response CSV là stream) rồi chuyển vào storage
+        with tempfile.TemporaryFile() as output:
+            for chunk in (response.streaming_content if response.streaming else [response.content]):
+                output.write(chunk)
+            file_size = output.tell()
+            output.seek(0)
+            job.artifact.save(file_name, File(output), save=False)
+    except Exception as e:
+        logger.exception('Tạo báo cáo #%s thất bại', job.id)
+        running.update(status='failed', error_message=str(e), finished_at=timezone.now())
+        job.status = 'failed'
+        job.error_message = str(e)
+        return job
+
+    finished_at = timezone.now()
+    if response.get('X-Report-Cache') == 'hit':
+        # Báo cáo lấy từ cache: không đọc dòng nào, coi như đã xử lý hết
+        running.update(processed_rows=job.total_rows or 0)
+    updated = running.update(
+        status='completed',
+        artifact=job.artifact.name,
+        file_name=file_name,
+        content_type=response['Content-Type'],
+        file_size=file_size,
+        finished_at=finished_at,
+        expires_at=finished_at + timedelta(hours=getattr(settings, 'REPORT_JOB_TTL_HOURS', 24)),
+    )
+    if not updated:
+        # Job đã bị đưa lại vào hàng đợi (coi là treo) trong lúc đang tạo: bỏ file
+        job.artifact.delete(save=False)
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(now=None):
+    """Đưa các job running lâu không cập nhật tiến độ về pending, trả về số job"""
+    now = now or timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'REPORT_JOB_STALE_SECONDS', 1800))
+    return ReportJob.objects.filter(status='running', heartbeat_at__lt=stale_before).update(
+        status='pending', worker=''
+    )
+
+
+def purge_expired_jobs(now=None):
+    """Xóa file của các job đã hết hạn (status expired), trả về số job"""
+    now = now or timezone.now()
+    expired = 0
+    for job in ReportJob.objects.filter(status='completed', expires_at__lt=now):
+        job.artifact.delete(save=False)
+        job.status = 'expired'
+        job.save(update_fields=['artifact', 'status'])
+        expired += 1
+    return expired
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Tạo báo cáo SQL log (tổng hợp, chi tiết, truy vấn bất thường) ở dạng CSV, PDF, JSON
+
+Dùng chung cho view generate_report và worker tạo báo cáo nền (report_jobs), nên
+không phụ thuộc vào request hay module views. Báo cáo chi tiết / bất thường đọc
+SqlLog theo từng chunk và được ghi dần (CSV stream, PDF dựng theo trang).
+"""
+
+import csv
+from datetime import datetime
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, Spacer, Table
+
+from . import pdf_rendering, report_cache
+from .models import SqlLog, SqlLogRollup
+from .rollups import summarize_rollups
+
+
+# Cột được đọc cho báo cáo chi tiết / bất thường (values_list, không tạo object SqlLog)
+REPORT_FIELDS = ('id', 'database_name', 'sql_query', 'exec_time_ms', 'exec_count', 'line_number', 'created_at')
+
+DETAILED_REPORT_HEADERS = [
+    'ID', 'Database', 'SQL Query', 'Thời gian (ms)', 'Số lần thực thi', 'Thời gian TB (ms)', 'Dòng số', 'Thời gian tạo'
+]
+
+ABNORMAL_REPORT_HEADERS = [
+    'ID', 'Database', 'SQL Query', 'Thời gian (ms)', 'Số lần thực thi', 'Thời gian TB (ms)',
+    'Mức độ nghiêm trọng', 'Dòng số', 'Thời gian tạo'
+]
+
+
+def pdf_detailed_row_limit():
+    """Số dòng đầu tiên được đưa vào PDF báo cáo chi tiết (None: không giới hạn)"""
+    return getattr(settings, 'REPORT_PDF_MAX_ROWS', 100000) or None
+
+
+def pdf_sync_row_limit():
+    """PDF chi tiết / bất thường nhiều dòng hơn được tạo nền thay vì trong request (None: không giới hạn)"""
+    return getattr(settings, 'REPORT_PDF_SYNC_MAX_ROWS', 2000) or None
+
+
+def truncate_sql(sql_query, length=100):
+    return sql_query[:length] + '...' if len(sql_query) > length else sql_query
+
+
+def avg_time_per_execution(exec_time_ms, exec_count):
+    """Giống SqlLog.avg_time_per_execution nhưng trên giá trị đã đọc bằng values_list"""
+    return float(exec_time_ms / exec_count) if exec_count > 0 else 0.0
+
+
+def severity(exec_time_ms, exec_count):
+    """Mức độ nghiêm trọng của một truy vấn bất thường"""
+    if exec_time_ms > 2000 and exec_count > 500:
+        return 'Rất cao'
+    if exec_time_ms > 1000 and exec_count > 200:
+        return 'Cao'
+    return 'Trung bình'
+
+
+def iter_report_logs(queryset, progress=None):
+    """
+    Đọc queryset theo từng chunk qua server-side cursor (PostgreSQL) thay vì nạp
+    toàn bộ kết quả: bộ nhớ không phụ thuộc số dòng của báo cáo
+
+    progress(số dòng đã đọc) được gọi sau mỗi chunk và khi đọc xong.
+    """
+    chunk_size = getattr(settings, 'REPORT_CHUNK_SIZE', 2000)
+    rows = queryset.values_list(*REPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if progress is None:
+        yield from rows
+        return
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % chunk_size == 0:
+            progress(count)
+    progress(count)
+
+
+def iter_detailed_rows(logs_query, progress=None):
+    """Từng dòng của báo cáo chi tiết, theo thứ tự DETAILED_REPORT_HEADERS"""
+    for log_id, database_name, sql_query, exec_time_ms, exec_count, line_number, created_at in iter_report_logs(logs_query, progress):
+        yield [
+            log_id,
+            database_name,
+            sql_query,
+            exec_time_ms,
+            exec_count,
+            round(avg_time_per_execution(exec_time_ms, exec_count), 2),
+            line_number or '',
+            created_at.strftime('%d/%m/%Y %H:%M:%S'),
+        ]
+
+
+def iter_abnormal_rows(abnormal_query, progress=None):
+    """Từng dòng của báo cáo truy vấn bất thường, theo thứ tự ABNORMAL_REPORT_HEADERS"""
+    for log_id, database_name, sql_query, exec_time_ms, exec_count, line_number, created_at in iter_report_logs(abnormal_query, progress):
+        yield [
+            log_id,
+            database_name,
+            truncate_sql(sql_query),
+            exec_time_ms,
+            exec_count,
+            round(avg_time_per_execution(exec_time_ms, exec_count), 2),
+            severity(exec_time_ms, exec_count),
+            line_number or '',
+            created_at.strftime('%d/%m/%Y %H:%M:%S'),
+        ]
+
+
+REPORT_TYPES = ('summary', 'detailed', 'abnormal')
+
+
+def report_querysets(report_type, database_names, database_filter=''):
+    """(logs_query, rollups) của báo cáo: SqlLog mà báo cáo đọc (đã lọc bất thường) và bảng tổng hợp"""
+    logs_query = SqlLog.objects.filter(database_name__in=database_names)
+    rollups = SqlLogRollup.objects.filter(database_name__in=database_names)
+    if database_filter:
+        logs_query = logs_query.filter(database_name=database_filter)
+        rollups = rollups.filter(database_name=database_filter)
+    if report_type == 'abnormal':
+        logs_query = logs_query.filter(exec_time_ms__gt=500, exec_count__gt=100)
+    return logs_query, rollups
+
+
+def report_row_count(report_type, format_type, database_names, database_filter=''):
+    """Số dòng SqlLog báo cáo sẽ đọc (None với báo cáo tổng hợp)"""
+    if report_type == 'summary':
+        return None
+    logs_query, _ = report_querysets(report_type, database_names, database_filter)
+    total = logs_query.count()
+    limit = pdf_detailed_row_limit()
+    if report_type == 'detailed' and format_type == 'pdf' and limit:
+        return min(total, limit)
+    return total
+
+
+def build_report(report_type, format_type, database_names, database_filter='', progress=None):
+    """
+    Response của báo cáo trên các database database_names (quyền đã được kiểm tra)
+
+    progress(số dòng đã đọc) được gọi sau mỗi REPORT_CHUNK_SIZE dòng của báo cáo
+    chi tiết / bất thường (dùng cho ReportJob). Báo cáo đã tạo trên cùng dữ liệu
+    được trả lại từ report_cache.
+    """
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f'Loại báo cáo không hợp lệ: {report_type}')
+    cache_key = report_cache.report_key(report_type, format_type, database_names, database_filter)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    logs_query, rollups = report_querysets(report_type, database_names, database_filter)
+    if report_type == 'summary':
+        response = generate_summary_report(logs_query, format_type, database_filter, rollups)
+    elif report_type == 'detailed':
+        response = generate_detailed_report(logs_query, format_type, database_filter, progress)
+    else:
+        response = generate_abnormal_report(logs_query, format_type, database_filter, progress)
+    return report_cache.store(cache_key, response)
+
+
+def generate_summary_report(logs_query, format_type, database_filter, rollups):
+    """Tạo báo cáo tổng hợp"""
+    # Thống kê tổng quan và theo database từ bảng tổng hợp
+    summary, db_stats = summarize_rollups(rollups)
+    total_logs = summary['total_logs']
+    total_exec_time = summary['total_exec_time']
+    total_exec_count = summary['total_exec_count']
+    avg_exec_time = summary['avg_exec_time']
+    
+    # Top queries chậm nhất / được thực thi nhiều nhất (chỉ lấy các cột cần)
+    top_fields = ('database_name', 'sql_query', 'exec_time_ms', 'exec_count')
+    slowest_queries = logs_query.order_by('-exec_time_ms').values_list(*top_fields)[:10]
+    most_executed = logs_query.order_by('-exec_count').values_list(*top_fields)[:10]
+    
+    data = {
+        'summary': {
+            'total_logs': total_logs,
+            'total_exec_time': total_exec_time,
+            'total_exec_count': total_exec_count,
+            'avg_exec_time': round(avg_exec_time, 2) if avg_exec_time else 0,
+            'database_filter': database_filter,
+            'generated_at': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+        },
+        'db_stats': db_stats,
+        'slowest_queries': [
+            {
+                'database_name': database_name,
+                'sql_query': truncate_sql(sql_query),
+                'exec_time_ms': exec_time_ms,
+                'exec_count': exec_count,
+                'avg_time_per_execution': avg_time_per_execution(exec_time_ms, exec_count)
+            } for database_name, sql_query, exec_time_ms, exec_count in slowest_queries
+        ],
+        'most_executed': [
+            {
+                'database_name': database_name,
+                'sql_query': truncate_sql(sql_query),
+                'exec_time_ms': exec_time_ms,
+                'exec_count': exec_count,
+                'avg_time_per_execution': avg_time_per_execution(exec_time_ms, exec_count)
+            } for database_name, sql_query, exec_time_ms, exec_count in most_executed
+        ]
+    }
+    
+    if format_type == 'csv':
+        return export_summary_csv(data)
+    elif format_type == 'pdf':
+        return export_summary_pdf(data)
+    else:
+        return JsonResponse(data)
+
+
+def generate_detailed_report(logs_query, format_type, database_filter, progress=None):
+    """Tạo báo cáo chi tiết"""
+    logs_data = logs_query.order_by('-created_at')
+    
+    if format_type == 'csv':
+        return export_detailed_csv(iter_detailed_rows(logs_data, progress), database_filter)
+    elif format_type == 'pdf':
+        # PDF chỉ hiển thị REPORT_PDF_MAX_ROWS dòng đầu: không đọc cả bảng
+        limit = pdf_detailed_row_limit()
+        return export_detailed_pdf(
+            iter_detailed_rows(logs_data[:limit] if limit else logs_data, progress),
+            logs_query.count(), database_filter
+        )
+    else:
+        return JsonResponse({
+            'logs': [dict(zip(DETAILED_REPORT_HEADERS, row)) for row in iter_detailed_rows(logs_data, progress)]
+        })
+
+
+def generate_abnormal_report(abnormal_query, format_type, database_filter, progress=None):
+    """Tạo báo cáo truy vấn bất thường"""
+    abnormal_data = abnormal_query.order_by('-exec_time_ms')
+    rows = iter_abnormal_rows(abnormal_data, progress)
+    
+    if format_type == 'csv':
+        return export_abnormal_csv(rows, database_filter)
+    elif format_type == 'pdf':
+        return export_abnormal_pdf(rows, abnormal_query.count(), database_filter)
+    else:
+        return JsonResponse({'abnormal_logs': [dict(zip(ABNORMAL_REPORT_HEADERS, row)) for row in rows]})
+
+
+class Echo:
+    """File giả cho csv.writer: write() trả lại chính dòng CSV thay vì ghi vào đâu"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(preamble, rows, buffer_size=64 * 1024):
+    """
+    Sinh nội dung CSV theo từng khối khoảng buffer_size ký tự
+
+    BOM UTF-8 (để Excel đọc đúng tiếng Việt) và các dòng đầu được trả về ngay,
+    trước khi truy vấn dữ liệu chạy.
+    """
+    writer = csv.writer(Echo())
+    yield '\ufeff' + ''.join(writer.writerow(row) for row in preamble)
+    chunk = []
+    size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        chunk.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def streaming_csv_response(filename, preamble, rows):
+    """StreamingHttpResponse tải về file CSV: rows chỉ được đọc khi gửi response"""
+    response = StreamingHttpResponse(iter_csv(preamble, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_summary_csv(data):
+    """Xuất báo cáo tổng hợp ra CSV"""
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="bao_cao_tong_hop_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    
+    writer = csv.writer(response)
+    
+    # Header
+    writer.writerow(['BÁO CÁO TỔNG HỢP SQL LOGS'])
+    writer.writerow(['Thời gian tạo:', data['summary']['generated_at']])
+    writer.writerow(['Database filter:', data['summary']['database_filter'] or 'Tất cả'])
+    writer.writerow([])
+    
+    # Thống kê tổng quan
+    writer.writerow(['THỐNG KÊ TỔNG QUAN'])
+    writer.writerow(['Tổng số logs:', data['summary']['total_logs']])
+    writer.writerow(['Tổng thời gian (ms):', data['summary']['total_exec_time']])
+    writer.writerow(['Tổng số lần thực thi:', data['summary']['total_exec_count']])
+    writer.writerow(['Thời gian TB (ms):', data['summary']['avg_exec_time']])
+    writer.writerow([])
+    
+    # Thống kê theo database
+    writer.writerow(['THỐNG KÊ THEO DATABASE'])
+    writer.writerow(['Database', 'Số logs', 'Tổng thời gian (ms)', 'Tổng số lần thực thi', 'Thời gian TB (ms)'])
+    for stat in data['db_stats']:
+        writer.writerow([
+            stat['database_name'],
+            stat['count'],
+            stat['total_exec_time'],
+            stat['total_exec_count'],
+            round(stat['avg_exec_time'], 2) if stat['avg_exec_time'] else 0
+        ])
+    writer.writerow([])
+    
+    # Top queries chậm nhất
+    writer.writerow(['TOP 10 QUERIES CHẬM NHẤT'])
+    writer.writerow(['Database', 'SQL Query', 'Thời gian (ms)', 'Số lần thực thi', 'Thời gian TB (ms)'])
+    for query in data['slowest_queries']:
+        writer.writerow([
+            query['database_name'],
+            query['sql_query'],
+            query['exec_time_ms'],
+            query['exec_count'],
+            query['avg_time_per_execution']
+        ])
+    writer.writerow([])
+    
+    # Top queries được thực thi nhiều nhất
+    writer.writerow(['TOP 10 QUERIES ĐƯỢC THỰC THI NHIỀU NHẤT'])
+    writer.writerow(['Database', 'SQL Query', 'Thời gian (ms)', 'Số lần thực thi', 'Thời gian TB (ms)'])
+    for query in data['most_executed']:
+        writer.writerow([
+            query['database_name'],
+            query['sql_query'],
+            query['exec_time_ms'],
+            query['exec_count'],
+            query['avg_time_per_execution']
+        ])
+    
+    return response
+
+
+def pdf_response(filename, story):
+    """
+    Dựng PDF từ story (list hoặc generator flowable) và trả về dạng file đính kèm
+
+    PDF lớn được ghi ra file tạm (pdf_rendering.render_pdf) và gửi theo từng khối.
+    """
+    return FileResponse(
+        pdf_rendering.render_pdf(story), as_attachment=True, filename=filename, content_type='application/pdf'
+    )
+
+
+def export_summary_pdf(data):
+    """Xuất báo cáo tổng hợp ra PDF"""
+    styles = pdf_rendering.paragraph_styles()
+    story = []
+    
+    story.append(Paragraph("BÁO CÁO TỔNG HỢP SQL LOGS", styles['title']))
+    story.append(Spacer(1, 12))
+    
+    # Thông tin báo cáo
+    info_data = [
+        ['Thời gian tạo:', data['summary']['generated_at']],
+        ['Database filter:', data['summary']['database_filter'] or 'Tất cả'],
+    ]
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(pdf_rendering.info_table_style())
+    story.append(info_table)
+    story.append(Spacer(1, 20))
+    
+    # Thống kê tổng quan
+    story.append(Paragraph("THỐNG KÊ TỔNG QUAN", styles['heading']))
+    summary_data = [
+        ['Chỉ số', 'Giá trị'],
+        ['Tổng số logs', str(data['summary']['total_logs'])],
+        ['Tổng thời gian (ms)', str(data['summary']['total_exec_time'])],
+        ['Tổng số lần thực thi', str(data['summary']['total_exec_count'])],
+        ['Thời gian TB (ms)', str(data['summary']['avg_exec_time'])],
+    ]
+    summary_table = Table(summary_data, colWidths=[2*inch, 2*inch])
+    summary_table.setStyle(pdf_rendering.data_table_style(12, 10))
+    story.append(summary_table)
+    story.append(Spacer(1, 20))
+    
+    # Thống kê theo database
+    story.append(Paragraph("THỐNG KÊ THEO DATABASE", styles['heading']))
+    db_data = [['Database', 'Số logs', 'Tổng thời gian (ms)', 'Tổng số lần thực thi', 'Thời gian TB (ms)']]
+    for stat in data['db_stats']:
+        db_data.append([
+            stat['database_name'],
+            str(stat['count']),
+            str(stat['total_exec_time']),
+            str(stat['total_exec_count']),
+            str(round(stat['avg_exec_time'], 2)) if stat['avg_exec_time'] else '0'
+        ])
+    
+    db_table = Table(db_data, colWidths=[1.2*inch, 0.8*inch, 1.2*inch, 1.2*inch, 1.2*inch])
+    db_table.setStyle(pdf_rendering.data_table_style(10, 8))
+    story.append(db_table)
+    
+    return pdf_response(f'bao_cao_tong_hop_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf', story)
+
+
+def export_detailed_csv(rows, database_filter):
+    """Xuất báo cáo chi tiết ra CSV (stream)"""
+    preamble = [
+        ['BÁO CÁO CHI TIẾT SQL LOGS'],
+        ['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
+        ['Database filter:', database_filter or 'Tất cả'],
+        [],
+        DETAILED_REPORT_HEADERS,
+    ]
+    return streaming_csv_response(
+        f'bao_cao_chi_tiet_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv', preamble, rows
+    )
+
+
+def export_detailed_pdf(rows, total, database_filter):
+    """Xuất báo cáo chi tiết ra PDF (bảng được dựng dần theo từng trang khi đọc rows)"""
+    return pdf_response(
+        f'bao_cao_chi_tiet_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+        iter_detailed_pdf_story(rows, total, database_filter)
+    )
+
+
+def iter_detailed_pdf_story(rows, total, database_filter):
+    styles = pdf_rendering.paragraph_styles()
+    
+    # Title
+    yield Paragraph("BÁO CÁO CHI TIẾT SQL LOGS", styles['title'])
+    yield Spacer(1, 12)
+    
+    # Thông tin báo cáo
+    info_data = [
+        ['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
+        ['Database filter:', database_filter or 'Tất cả'],
+        ['Tổng số records:', str(total)],
+    ]
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(pdf_rendering.info_table_style())
+    yield info_table
+    yield Spacer(1, 20)
+    
+    # Data table (chỉ REPORT_PDF_MAX_ROWS dòng đầu), chia theo trang
+    if total:
+        headers = DETAILED_REPORT_HEADERS
+        yield from pdf_rendering.iter_table_chunks(
+            headers, rows, [0.8*inch] * len(headers), pdf_rendering.data_table_style(8, 6)
+        )
+        
+        limit = pdf_detailed_row_limit()
+        if limit and total > limit:
+            yield Spacer(1, 12)
+            yield Paragraph(f"* Chỉ hiển thị {limit} records đầu tiên trong tổng số {total} records", styles['normal'])
+
+
+def export_abnormal_csv(rows, database_filter):
+    """Xuất báo cáo truy vấn bất thường ra CSV (stream)"""
+    preamble = [
+        ['BÁO CÁO TRUY VẤN BẤT THƯỜNG'],
+        ['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
+        ['Database filter:', database_filter or 'Tất cả'],
+        ['Quy tắc: exec_time_ms > 500 VÀ exec_count > 100'],
+        [],
+        ABNORMAL_REPORT_HEADERS,
+    ]
+    return streaming_csv_response(
+        f'bao_cao_bat_thuong_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv', preamble, rows
+    )
+
+
+def export_abnormal_pdf(rows, total, database_filter):
+    """Xuất báo cáo truy vấn bất thường ra PDF (bảng được dựng dần theo từng trang khi đọc rows)"""
+    return pdf_response(
+        f'bao_cao_bat_thuong_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+        iter_abnormal_pdf_story(rows, total, database_filter)
+    )
+
+
+def iter_abnormal_pdf_story(rows, total, database_filter):
+    styles = pdf_rendering.paragraph_styles()
+    
+    # Title
+    yield Paragraph("BÁO CÁO TRUY VẤN BẤT THƯỜNG", styles['title'])
+    yield Spacer(1, 12)
+    
+    # Thông tin báo cáo
+    info_data = [
+        ['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
+        ['Database filter:', database_filter or 'Tất cả'],
+        ['Quy tắc:', 'exec_time_ms > 500 VÀ exec_count > 100'],
+        ['Tổng số records:', str(total)],
+    ]
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(pdf_rendering.info_table_style())
+    yield info_table
+    yield Spacer(1, 20)
+    
+    # Data table, chia theo trang
+    if total:
+        headers = ABNORMAL_REPORT_HEADERS
+        yield from pdf_rendering.iter_table_chunks(
+            headers, rows, [0.7*inch] * len(headers), pdf_rendering.data_table_style(8, 6)
+        )
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Bảng tổng hợp SqlLog theo (database, mẫu câu SQL, giờ/ngày)
+
+Bucket được cộng dồn bằng INSERT ... ON CONFLICT DO UPDATE trong transaction của
+mỗi batch import (PostgreSQL và SQLite). rebuild_rollups() dựng lại toàn bộ từ
+SqlLog, dùng khi migrate hoặc sau khi xóa SqlLog bằng tay; refresh_rollups() chỉ
+cập nhật các bucket bị ảnh hưởng khi sửa/xóa vài dòng (admin).
+
+Thống kê cho dashboard được cache theo (tập database, version của từng database);
+version tăng trong cùng transaction với batch import nên cache không bao giờ cũ
+hơn dữ liệu đã commit, kể cả khi import chạy ở process khác.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import LogCompaction, QueryFingerprint, SqlLog, SqlLogRollup, StatisticsVersion
+
+ROLLUP_PERIODS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+}
+
+ROLLUP_COLUMNS = (
+    'database_name', 'fingerprint_id', 'period', 'bucket_start',
+    'count', 'sum_exec_time_ms', 'min_exec_time_ms', 'max_exec_time_ms', 'sum_exec_count',
+)
+
+
+def bucket_start(created_at, period):
+    """Đầu giờ/ngày chứa created_at, theo múi giờ hiện tại (giống TruncHour/TruncDay)"""
+    if timezone.is_naive(created_at):
+        # Giống khi Django lưu datetime naive: coi là giờ của múi giờ hiện tại
+        created_at = timezone.make_aware(created_at)
+    local_time = timezone.localtime(created_at)
+    if period == 'hour':
+        return local_time.replace(minute=0, second=0, microsecond=0)
+    return local_time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_rows(rows):
+    """
+    Gom các dòng (database_name, fingerprint_id, exec_time_ms, exec_count, created_at)
+    thành dict (database_name, fingerprint_id, period, bucket_start) -> [count, sum, min, max, sum_exec_count]
+    """
+    buckets = {}
+    starts = {}
+    for database_name, fingerprint_id, exec_time_ms, exec_count, created_at in rows:
+        # Các dòng trong một batch thường có cùng created_at
+        if created_at not in starts:
+            starts[created_at] = [(period, bucket_start(created_at, period)) for period in ROLLUP_PERIODS]
+        for period, start in starts[created_at]:
+            key = (database_name, fingerprint_id, period, start)
+            values = buckets.get(key)
+            if values is None:
+                buckets[key] = [1, exec_time_ms, exec_time_ms, exec_time_ms, exec_count]
+            else:
+                values[0] += 1
+                values[1] += exec_time_ms
+                values[2] = min(values[2], exec_time_ms)
+                values[3] = max(values[3], exec_time_ms)
+                values[4] += exec_count
+    return buckets
+
+
+def apply_rollups(buckets, using='default'):
+    """Cộng dồn các bucket vào bảng tổng hợp (nên gọi trong transaction của batch)"""
+    if not buckets:
+        return
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(SqlLogRollup._meta.db_table)
+    least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+
+    count, sum_time, min_time, max_time, sum_count = (quote_name(column) for column in ROLLUP_COLUMNS[4:])
+    sql = (
+        f"INSERT INTO {table} ({', '.join(quote_name(column) for column in ROLLUP_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(ROLLUP_COLUMNS))}) "
+        f"ON CONFLICT ({', '.join(quote_name(column) for column in ROLLUP_COLUMNS[:4])}) DO UPDATE SET "
+        f"{count} = {table}.{count} + EXCLUDED.{count}, "
+        f"{sum_time} = {table}.{sum_time} + EXCLUDED.{sum_time}, "
+        f"{min_time} = {least}({table}.{min_time}, EXCLUDED.{min_time}), "
+        f"{max_time} = {greatest}({table}.{max_time}, EXCLUDED.{max_time}), "
+        f"{sum_count} = {table}.{sum_count} + EXCLUDED.{sum_count}"
+    )
+    params = [
+        (database_name, fingerprint_id, period, connection.ops.adapt_datetimefield_value(start), *values)
+        for (database_name, fingerprint_id, period, start), values in buckets.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def bump_statistics_versions(database_names, using='default'):
+    """Tăng version thống kê của các database (gọi trong transaction ghi dữ liệu)"""
+    if not database_names:
+        return
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(StatisticsVersion._meta.db_table)
+    version = quote_name('version')
+    sql = (
+        f"INSERT INTO {table} ({quote_name('database_name')}, {version}, {quote_name('updated_at')}) "
+        f"VALUES (%s, 1, %s) "
+        f"ON CONFLICT ({quote_name('database_name')}) DO UPDATE SET "
+        f"{version} = {table}.{version} + 1, {quote_name('updated_at')} = EXCLUDED.{quote_name('updated_at')}"
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(database_name, now) for database_name in sorted(database_names)])
+
+
+def bump_all_statistics_versions(using='default'):
+    """Tăng version của mọi database đã có thống kê (khi xóa hoặc dựng lại dữ liệu hàng loạt)"""
+    database_names = set(StatisticsVersion.objects.using(using).values_list('database_name', flat=True))
+    database_names.update(
+        SqlLogRollup.objects.using(using).order_by().values_list('database_name', flat=True).distinct()
+    )
+    bump_statistics_versions(database_names, using)
+
+
+def rebuild_rollups(using='default', sqllog_model=SqlLog, rollup_model=SqlLogRollup, batch_size=1000,
+                    since=None):
+    """
+    Xóa và dựng lại bảng tổng hợp từ SqlLog, trả về số bucket đã tạo
+
+    sqllog_model/rollup_model cho phép migration truyền vào model lịch sử. Nếu có
+    since (mốc compact_logs), các bucket trước since được giữ nguyên vì SqlLog của
+    chúng đã bị xóa.
+    """
+    rollups = rollup_model.objects.using(using)
+    logs = sqllog_model.objects.using(using).exclude(fingerprint=None)
+    if since is not None:
+        rollups = rollups.filter(bucket_start__gte=since)
+        logs = logs.filter(created_at__gte=since)
+    rollups.delete()
+    created = 0
+    for period, trunc in ROLLUP_PERIODS.items():
+        buckets = (
+            logs
+            .values('database_name', 'fingerprint_id', bucket=trunc('created_at'))
+            .annotate(
+                count=Count('id'),
+                sum_exec_time_ms=Sum('exec_time_ms'),
+                min_exec_time_ms=Min('exec_time_ms'),
+                max_exec_time_ms=Max('exec_time_ms'),
+                sum_exec_count=Sum('exec_count'),
+            )
+            .order_by()
+        )
+        batch = []
+        for bucket in buckets.iterator(chunk_size=batch_size):
+            batch.append(rollup_model(
+                database_name=bucket['database_name'],
+                fingerprint_id=bucket['fingerprint_id'],
+                period=period,
+                bucket_start=bucket['bucket'],
+                count=bucket['count'],
+                sum_exec_time_ms=bucket['sum_exec_time_ms'],
+                min_exec_time_ms=bucket['min_exec_time_ms'],
+                max_exec_time_ms=bucket['max_exec_time_ms'],
+                sum_exec_count=bucket['sum_exec_count'],
+            ))
+            if len(batch) >= batch_size:
+                rollup_model.objects.using(using).bulk_create(batch)
+                created += len(batch)
+                batch = []
+        rollup_model.objects.using(using).bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def bucket_end(start, period):
+    """Đầu bucket kế tiếp"""
+    if period == 'hour':
+        return start + timedelta(hours=1)
+    # Ngày có thể dài 23-25 giờ khi đổi giờ mùa hè
+    return bucket_start(start + timedelta(hours=36), 'day')
+
+
+def refresh_rollups(removed=(), added=(), using='default'):
+    """
+    Cập nhật các bucket chứa những dòng SqlLog vừa bị xóa / được ghi ngoài import
+    (gọi sau khi ghi, trong cùng transaction)
+
+    removed/added là các dòng (database_name, fingerprint_id, exec_time_ms,
+    exec_count, created_at) trước và sau khi sửa. Bucket từ mốc compact mới nhất
+    được tính lại từ SqlLog. Bucket trước mốc còn chứa số liệu của các dòng đã bị
+    compact nên chỉ được cộng / trừ (min, max không giảm lại được).
+    """
+    # Dòng chưa có mẫu câu SQL không nằm trong bảng tổng hợp
+    removed = aggregate_rows(row for row in removed if row[1] is not None)
+    added = aggregate_rows(row for row in added if row[1] is not None)
+    cutoff = LogCompaction.objects.using(using).aggregate(cutoff=Max('cutoff'))['cutoff']
+    rollups = SqlLogRollup.objects.using(using)
+
+    def compacted(start):
+        return cutoff is not None and start < cutoff
+
+    apply_rollups({key: values for key, values in added.items() if compacted(key[3])}, using)
+    for (database_name, fingerprint_id, period, start), values in removed.items():
+        if compacted(start):
+            bucket = rollups.filter(
+                database_name=database_name, fingerprint_id=fingerprint_id, period=period, bucket_start=start
+            )
+            bucket.update(
+                count=F('count') - values[0],
+                sum_exec_time_ms=F('sum_exec_time_ms') - values[1],
+                sum_exec_count=F('sum_exec_count') - values[4],
+            )
+            bucket.filter(count__lte=0).delete()
+
+    for database_name, fingerprint_id, period, start in set(removed) | set(added):
+        if compacted(start):
+            continue
+        bucket = rollups.filter(
+            database_name=database_name, fingerprint_id=fingerprint_id, period=period, bucket_start=start
+        )
+        totals = SqlLog.objects.using(using).filter(
+            database_name=database_name, fingerprint_id=fingerprint_id,
+            created_at__gte=start, created_at__lt=bucket_end(start, period),
+        ).aggregate(
+            count=Count('id'),
+            sum_exec_time_ms=Sum('exec_time_ms'),
+            min_exec_time_ms=Min('exec_time_ms'),
+            max_exec_time_ms=Max('exec_time_ms'),
+            sum_exec_count=Sum('exec_count'),
+        )
+        bucket.delete()
+        if totals['count']:
+            rollups.create(
+                database_name=database_name, fingerprint_id=fingerprint_id, period=period, bucket_start=start,
+                **totals
+            )
+
+
+def _with_average(stat):
+    """Thêm avg_exec_time (ms) = tổng thời gian / số logs"""
+    stat['avg_exec_time'] = stat['total_exec_time'] / stat['count'] if stat['count'] else 0
+    return stat
+
+
+def summarize_rollups(rollups, recent_days=7):
+    """
+    Thống kê tổng quan và theo database từ queryset SqlLogRollup (đã lọc theo database)
+
+    Mọi số liệu được tính trong một truy vấn: tổng theo database trên bucket ngày,
+    số logs gần đây trên bucket giờ (sai số tối đa một giờ); tổng toàn bộ được cộng
+    từ kết quả theo database.
+
+    Returns:
+        (summary, db_stats): summary gồm total_logs, total_exec_time, total_exec_count,
+        avg_exec_time, recent_logs; db_stats là list theo database (count, total_exec_time,
+        total_exec_count, avg_exec_time, recent_logs), sắp xếp theo số logs giảm dần
+    """
+    since = bucket_start(timezone.now() - timedelta(days=recent_days), 'hour')
+    daily = Q(period='day')
+    db_stats = [
+        _with_average(stat) for stat in rollups.filter(
+            daily | Q(period='hour', bucket_start__gte=since)
+        ).values('database_name').annotate(
+            # recent_logs đứng trước vì annotation count che mất cột count
+            recent_logs=Sum('count', filter=Q(period='hour'), default=0),
+            count=Sum('count', filter=daily, default=0),
+            total_exec_time=Sum('sum_exec_time_ms', filter=daily, default=0),
+            total_exec_count=Sum('sum_exec_count', filter=daily, default=0),
+        ).order_by('-count', 'database_name')
+    ]
+
+    summary = _with_average({
+        'count': sum(stat['count'] for stat in db_stats),
+        'total_exec_time': sum(stat['total_exec_time'] for stat in db_stats),
+        'total_exec_count': sum(stat['total_exec_count'] for stat in db_stats),
+        'recent_logs': sum(stat['recent_logs'] for stat in db_stats),
+    })
+    summary['total_logs'] = summary.pop('count')
+    return summary, db_stats
+
+
+def top_templates(rollups, limit=10):
+    """Các mẫu câu SQL có tổng thời gian thực thi lớn nhất (kèm nội dung mẫu)"""
+    stats = [
+        _with_average(stat) for stat in rollups.filter(period='day').values('fingerprint_id').annotate(
+            count=Sum('count'),
+            total_exec_time=Sum('sum_exec_time_ms'),
+            total_exec_count=Sum('sum_exec_count'),
+        ).order_by('-total_exec_time')[:limit]
+    ]
+    templates = QueryFingerprint.objects.in_bulk([stat['fingerprint_id'] for stat in stats])
+    for stat in stats:
+        stat['normalized_sql'] = templates[stat['fingerprint_id']].normalized_sql
+    return stats
+
+
+def count_logs(database_names, start=None, end=None):
+    """Số logs của các database trong khoảng ngày [start, end) từ bucket ngày"""
+    rollups = SqlLogRollup.objects.filter(period='day', database_name__in=database_names)
+    if start is not None:
+        rollups = rollups.filter(bucket_start__gte=start)
+    if end is not None:
+        rollups = rollups.filter(bucket_start__lt=end)
+    return rollups.aggregate(total=Sum('count', default=0))['total']
+
+
+def statistics_versions(database_names):
+    """
+    [[database, version, thời điểm tăng version], ...] sắp theo tên
+
+    Thay đổi mỗi khi dữ liệu của một database thay đổi; thời điểm giúp khóa không
+    trùng với khóa cũ khi database được tạo lại từ đầu (version bắt đầu lại từ 1).
+    """
+    database_names = sorted(set(database_names))
+    versions = {
+        name: [version, updated_at.isoformat()]
+        for name, version, updated_at in StatisticsVersion.objects.filter(
+            database_name__in=database_names
+        ).values_list('database_name', 'version', 'updated_at')
+    }
+    return [[name, *versions.get(name, [0, None])] for name in database_names]
+
+
+def cached_statistics(database_names):
+    """
+    Thống kê dashboard (summary, db_stats, top_templates) của một tập database, có cache
+
+    Khóa cache gồm tập database và version thống kê của từng database nên dùng
+    chung được giữa các user có cùng quyền; version được đọc bằng một truy vấn nhỏ.
+    """
+    database_names = sorted(set(database_names))
+    key_data = json.dumps(statistics_versions(database_names))
+    cache_key = 'logs:statistics:' + hashlib.sha1(key_data.encode('utf-8')).hexdigest()
+
+    statistics = cache.get(cache_key)
+    if statistics is None:
+        rollups = SqlLogRollup.objects.filter(database_name__in=database_names)
+        summary, db_stats = summarize_rollups(rollups)
+        statistics = {
+            'summary': summary,
+            'db_stats': db_stats,
+            'top_templates': top_templates(rollups),
+        }
+        cache.set(cache_key, statistics, getattr(settings, 'STATISTICS_CACHE_TIMEOUT', 300))
+    return statistics
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Xuất SqlLog ra file dạng cột (snapshot) để phân tích offline bằng pandas
+
+Dữ liệu được đọc theo luồng qua server-side cursor (QuerySet.iterator) và ghi
+từng batch, bộ nhớ chỉ phụ thuộc chunk_size. database_name được mã hóa từ điển
+(mã số nguyên + danh sách tên). Định dạng:
+
+- parquet / arrow (Arrow IPC): cần pyarrow, nén zstd
+- npz: chỉ cần NumPy; mỗi cột là một mảng .npy trong file zip nén deflate.
+  sql_query lưu thành byte UTF-8 nối liền (sql_query_data) + vị trí kết thúc
+  của từng câu (sql_query_ends); NULL của line_number/fingerprint_id là -1.
+
+load_snapshot() đọc lại cả ba định dạng thành pandas.DataFrame.
+"""
+
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow là tùy chọn, không có thì dùng npz
+    pyarrow = None
+
+FIELDS = ('id', 'created_at', 'database_name', 'sql_query', 'exec_time_ms', 'exec_count',
+          'line_number', 'fingerprint_id')
+
+# Cột số nguyên có thể NULL: đọc lại thành pandas Int64
+NULLABLE_COLUMNS = ('line_number', 'fingerprint_id')
+
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'npz': '.npz',
+}
+
+# Kiểu của các cột số trong file npz
+NPZ_DTYPES = {
+    'id': np.int64,
+    'created_at': np.dtype('datetime64[us]'),
+    'database_name_codes': np.int32,
+    'exec_time_ms': np.int64,
+    'exec_count': np.int64,
+    'line_number': np.int64,
+    'fingerprint_id': np.int64,
+    'sql_query_ends': np.int64,
+    'sql_query_data': np.uint8,
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def available_formats():
+    """Các định dạng ghi được (parquet/arrow chỉ có khi đã cài pyarrow)"""
+    return list(FORMATS) if pyarrow is not None else ['npz']
+
+
+def default_format():
+    return 'parquet' if pyarrow is not None else 'npz'
+
+
+def format_for_path(path):
+    """Định dạng theo phần mở rộng của path, None nếu không nhận ra"""
+    extension = os.path.splitext(path)[1].lower()
+    for name, format_extension in FORMATS.items():
+        if extension == format_extension or (name == 'arrow' and extension in ('.feather', '.ipc')):
+            return name
+    return None
+
+
+def iter_batches(queryset, categories, chunk_size=100000):
+    """
+    Đọc queryset SqlLog theo luồng, trả về từng batch dạng dict tên cột -> mảng
+
+    categories là list tên database (mã = vị trí trong list), được nối thêm khi
+    gặp database mới nên mã của các batch trước vẫn đúng.
+    """
+    codes = {name: code for code, name in enumerate(categories)}
+    # Bỏ ORDER BY mặc định: đọc theo thứ tự lưu trữ, không cần sắp xếp cả bảng
+    rows = queryset.order_by().values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        ids, created_at, names, sql_queries, exec_times, exec_counts, line_numbers, fingerprint_ids = zip(*chunk)
+        for name in names:
+            if name not in codes:
+                codes[name] = len(categories)
+                categories.append(name)
+        yield {
+            'id': np.array(ids, dtype=np.int64),
+            'created_at': np.array([(value - _EPOCH) // _MICROSECOND for value in created_at],
+                                   dtype='datetime64[us]'),
+            'database_name_codes': np.array([codes[name] for name in names], dtype=np.int32),
+            'sql_query': sql_queries,
+            'exec_time_ms': np.array(exec_times, dtype=np.int64),
+            'exec_count': np.array(exec_counts, dtype=np.int64),
+            'line_number': np.array([-1 if value is None else value for value in line_numbers], dtype=np.int64),
+            'fingerprint_id': np.array([-1 if value is None else value for value in fingerprint_ids],
+                                       dtype=np.int64),
+        }
+
+
+class NpzSnapshotWriter:
+    """
+    Ghi file .npz theo luồng
+
+    np.savez cần toàn bộ mảng trong bộ nhớ: ở đây mỗi cột được ghi nối vào một
+    file tạm, đến close() mới chép lần lượt vào file zip kèm header .npy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = tempfile.TemporaryDirectory()
+        self.spools = {
+            name: open(os.path.join(self.directory.name, name), 'wb') for name in NPZ_DTYPES
+        }
+        self.data_size = 0
+
+    def write(self, batch, categories):
+        encoded = [value.encode('utf-8') for value in batch['sql_query']]
+        ends = self.data_size + np.cumsum([len(value) for value in encoded], dtype=np.int64)
+        self.data_size = int(ends[-1])
+        self.spools['sql_query_ends'].write(ends.tobytes())
+        self.spools['sql_query_data'].write(b''.join(encoded))
+        for name, dtype in NPZ_DTYPES.items():
+            if name in batch:
+                self.spools[name].write(batch[name].astype(dtype, copy=False).tobytes())
+
+    def close(self, categories):
+        try:
+            with zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                for name, dtype in NPZ_DTYPES.items():
+                    spool = self.spools[name]
+                    spool.close()
+                    dtype = np.dtype(dtype)
+                    header = {
+                        'descr': np.lib.format.dtype_to_descr(dtype),
+                        'fortran_order': False,
+                        'shape': (os.path.getsize(spool.name) // dtype.itemsize,),
+                    }
+                    with archive.open(f'{name}.npy', 'w', force_zip64=True) as member, \
+                            open(spool.name, 'rb') as source:
+                        np.lib.format.write_array_header_2_0(member, header)
+                        shutil.copyfileobj(source, member, 1024 * 1024)
+                with archive.open('database_name_categories.npy', 'w') as member:
+                    np.lib.format.write_array(member, np.array(categories, dtype=str))
+        finally:
+            self.directory.cleanup()
+
+
+class ArrowSnapshotWriter:
+    """Ghi Parquet (mỗi batch một row group) hoặc Arrow IPC bằng pyarrow"""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.file_format = file_format
+        self.schema = pyarrow.schema([
+            ('id', pyarrow.int64()),
+            ('created_at', pyarrow.timestamp('us', tz='UTC')),
+            ('database_name', pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ('sql_query', pyarrow.string()),
+            ('exec_time_ms', pyarrow.int64()),
+            ('exec_count', pyarrow.int64()),
+            ('line_number', pyarrow.int64()),
+            ('fingerprint_id', pyarrow.int64()),
+        ])
+        if file_format == 'parquet':
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            # Từ điển database_name lớn dần qua các batch: IPC file chỉ cho phép ghi phần bổ sung (delta)
+            options = pyarrow.ipc.IpcWriteOptions(compression='zstd', emit_dictionary_deltas=True)
+            self.writer = pyarrow.ipc.new_file(path, self.schema, options=options)
+
+    def write(self, batch, categories):
+        database_names = pyarrow.DictionaryArray.from_arrays(
+            batch['database_name_codes'], pyarrow.array(categories, type=pyarrow.string())
+        )
+        columns = [
+            pyarrow.array(batch['id']),
+            pyarrow.array(batch['created_at'].view(np.int64), type=pyarrow.timestamp('us', tz='UTC')),
+            database_names,
+            pyarrow.array(batch['sql_query'], type=pyarrow.string()),
+            pyarrow.array(batch['exec_time_ms']),
+            pyarrow.array(batch['exec_count']),
+            pyarrow.array(batch['line_number'], mask=batch['line_number'] < 0),
+            pyarrow.array(batch['fingerprint_id'], mask=batch['fingerprint_id'] < 0),
+        ]
+        record_batch = pyarrow.record_batch(columns, schema=self.schema)
+        if self.file_format == 'parquet':
+            self.writer.write_batch(record_batch)
+        else:
+            self.writer.write(record_batch)
+
+    def close(self, categories):
+        self.writer.close()
+
+
+def export_snapshot(queryset, path, file_format=None, chunk_size=100000, progress=None):
+    """
+    Ghi queryset SqlLog ra path, trả về số dòng đã xuất
+
+    Nên gọi trong transaction.atomic(): trên PostgreSQL cursor khi đó không cần
+    WITH HOLD (không phải sao chép toàn bộ kết quả ở server khi transaction kết thúc).
+    progress(rows) được gọi sau mỗi batch.
+
+    Raises:
+        ValueError: định dạng không hỗ trợ hoặc chưa cài pyarrow
+    """
+    file_format = file_format or format_for_path(path) or default_format()
+    if file_format not in available_formats():
+        raise ValueError(f'Định dạng {file_format} không được hỗ trợ (có: {", ".join(available_formats())})')
+
+    writer = NpzSnapshotWriter(path) if file_format == 'npz' else ArrowSnapshotWriter(path, file_format)
+    categories = []
+    rows = 0
+    try:
+        for batch in iter_batches(queryset, categories, chunk_size):
+            writer.write(batch, categories)
+            rows += len(batch['id'])
+            if progress is not None:
+                progress(rows)
+    finally:
+        writer.close(categories)
+    return rows
+
+
+def load_snapshot(path, columns=None):
+    """Đọc file snapshot (parquet, arrow hoặc npz) thành pandas.DataFrame"""
+    import pandas as pd
+
+    file_format = format_for_path(path)
+    if file_format in ('parquet', 'arrow'):
+        if file_format == 'parquet':
+            table = pyarrow.parquet.read_table(path, columns=columns)
+        else:
+            with pyarrow.memory_map(path) as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+            if columns:
+                table = table.select(columns)
+        df = table.to_pandas()
+        # Giữ NULL của cột số nguyên (to_pandas mặc định đổi sang float + NaN) giống npz
+        for name in NULLABLE_COLUMNS:
+            if name in df:
+                df[name] = table.column(name).to_pandas(types_mapper={pyarrow.int64(): pd.Int64Dtype()}.get)
+        return df
+    if file_format != 'npz':
+        raise ValueError(f'Không nhận ra định dạng của {path}')
+
+    columns = columns or list(FIELDS)
+    data = {}
+    with np.load(path) as archive:
+        for name in columns:
+            if name == 'database_name':
+                data[name] = pd.Categorical.from_codes(
+                    archive['database_name_codes'], archive['database_name_categories']
+                )
+            elif name == 'sql_query':
+                ends = archive['sql_query_ends']
+                raw = archive['sql_query_data'].tobytes()
+                starts = np.concatenate(([0], ends[:-1]))
+                data[name] = [raw[start:end].decode('utf-8') for start, end in zip(starts, ends)]
+            elif name == 'created_at':
+                data[name] = pd.to_datetime(archive[name]).tz_localize('UTC')
+            elif name in NULLABLE_COLUMNS:
+                values = archive[name]
+                data[name] = pd.arrays.IntegerArray(values, mask=values < 0)
+            else:
+                data[name] = archive[name]
+    return pd.DataFrame(data, columns=columns)
@@ -1,3 +1,1379 @@
-from django.test import TestCase
+import bz2
+import csv
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import lzma
+import os
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Count, Max, Min, ProtectedError, QuerySet, Sum
+from django.db.models.functions import TruncHour
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+import reportlab
+
+from .management.commands.import_logs import Command as ImportLogsCommand
+from .management.commands.tail_logs import Command as TailLogsCommand
+from .compression import zstandard
+from .fingerprint import fingerprint_sql, normalize_sql
+from .forms import LogImportForm
+from .ingestion import (
+    iter_uploaded_lines, SqlLogBatchWriter, SqlLogCopyWriter, _copy_value
+)
+from .models import (
+    CustomUser, IngestedLine, SqlLog, LogFile, LogCompaction, QueryFingerprint, ReportJob, SqlLogRollup
+)
+from .pagination import decode_cursor, keyset_paginate
+from . import pdf_rendering
+from . import snapshot
+from .snapshot import load_snapshot
+from .partitioning import create_partition, drop_partitions_before, is_partitioned, list_partitions
+from .parsing import parse_log_line, split_file_ranges
+from . import report_cache
+from .report_jobs import claim_job, purge_expired_jobs, requeue_stale_jobs, run_job
+from .admin import QueryFingerprintAdmin, SqlLogAdmin
+from .rollups import cached_statistics, rebuild_rollups
+from .views import process_log_file
+
+
+class ParseLogLineTests(SimpleTestCase):
+    """Test parser dòng SQL log dùng chung"""
+
+    def test_parses_valid_line_into_tuple(self):
+        self.assertEqual(
+            parse_log_line('DB:WAY4,sql:SELECT * FROM customers WHERE cust_id = 203,exec_time_ms:5005,exec_count:150\n'),
+            ('WAY4', 'SELECT * FROM customers WHERE cust_id = 203', 5005, 150)
+        )
+
+    def test_sql_may_contain_commas(self):
+        self.assertEqual(
+            parse_log_line('DB:T24VN,sql:SELECT id, name FROM users WHERE id IN (1, 2),exec_time_ms:12,exec_count:3'),
+            ('T24VN', 'SELECT id, name FROM users WHERE id IN (1, 2)', 12, 3)
+        )
+        # Phần đuôi được neo ở cuối dòng, kể cả khi SQL chứa chính chuỗi đó
+        self.assertEqual(
+            parse_log_line("DB:WAY4,sql:SELECT 'exec_time_ms:1,exec_count:2',exec_time_ms:7,exec_count:8"),
+            ('WAY4', "SELECT 'exec_time_ms:1,exec_count:2'", 7, 8)
+        )
+
+    def test_rejects_invalid_lines(self):
+        for line in ['', 'dòng không hợp lệ', 'DB:WAY4,sql:SELECT 1,exec_time_ms:abc,exec_count:1',
+                     'DB:,sql:SELECT 1,exec_time_ms:1,exec_count:1',
+                     'DB:WAY4,sql:,exec_time_ms:1,exec_count:1',
+                     'DB:WAY4,sql:SELECT 1,exec_time_ms:1,exec_count:1,extra']:
+            self.assertIsNone(parse_log_line(line), line)
+
+    def test_split_file_ranges_end_on_newlines(self):
+        handle, file_path = tempfile.mkstemp()
+        self.addCleanup(os.remove, file_path)
+        content = b''.join(f'line {i}\n'.encode() for i in range(100))
+        with os.fdopen(handle, 'wb') as f:
+            f.write(content)
+
+        ranges = split_file_ranges(file_path, 64)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(content))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(content[end - 1:end], b'\n')
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test chuẩn hóa câu SQL thành mẫu"""
+
+    def test_replaces_literals_and_normalizes_case_and_whitespace(self):
+        self.assertEqual(
+            normalize_sql("select a, b  from t1\n where name = 'O''Brien' and id in (1, 2,3) and x = -1.5"),
+            'SELECT A, B FROM T1 WHERE NAME = ? AND ID IN (?) AND X = ?'
+        )
+
+    def test_same_template_has_same_hash(self):
+        first = fingerprint_sql('SELECT * FROM accounts WHERE account_id = 555')
+        second = fingerprint_sql('select * from accounts where account_id =   42')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first[1], fingerprint_sql('SELECT * FROM accounts WHERE user_id = 555')[1])
+
+
+class IterUploadedLinesTests(SimpleTestCase):
+    """Test đọc file upload theo luồng"""
+
+    def test_matches_split_on_newline(self):
+        content = 'dòng 1\r\ndòng 2\n\nDB:WAY4 câu cuối\n'
+        upload = SimpleUploadedFile('test.log', content.encode('utf-8'))
+        lines = list(iter_uploaded_lines(upload, chunk_size=3))
+        self.assertEqual(lines, content.split('\n'))
+
+    def test_multibyte_character_split_across_chunks(self):
+        content = 'ĐẶNG VĂN Ấ\nTIẾNG VIỆT'
+        upload = SimpleUploadedFile('test.log', content.encode('utf-8'))
+        for chunk_size in (1, 2, 5, 7):
+            lines = list(iter_uploaded_lines(upload, chunk_size=chunk_size))
+            self.assertEqual(lines, ['ĐẶNG VĂN Ấ', 'TIẾNG VIỆT'])
+
+    def test_compressed_uploads_are_decompressed(self):
+        content = 'ĐẶNG VĂN Ấ\nDB:WAY4 câu cuối\n' * 50
+        compressors = {'gz': gzip.compress, 'bz2': bz2.compress, 'xz': lzma.compress}
+        if zstandard is not None:
+            compressors['zst'] = zstandard.ZstdCompressor().compress
+        for extension, compress in compressors.items():
+            upload = SimpleUploadedFile(f'test.log.{extension}', compress(content.encode('utf-8')))
+            lines = list(iter_uploaded_lines(upload, chunk_size=7))
+            self.assertEqual(lines, content.split('\n'), extension)
+
+    def test_digest_covers_raw_bytes_in_same_pass(self):
+        data = 'DB:WAY4 câu 1\nDB:WAY4 câu 2\n'.encode('utf-8')
+        for raw in (data, gzip.compress(data) + b'\0' * 10):
+            digest = hashlib.sha256()
+            lines = list(iter_uploaded_lines(SimpleUploadedFile('test.log', raw), chunk_size=5, digest=digest))
+            self.assertEqual(lines, ['DB:WAY4 câu 1', 'DB:WAY4 câu 2', ''])
+            self.assertEqual(digest.hexdigest(), hashlib.sha256(raw).hexdigest())
+
+    def test_form_accepts_compressed_files(self):
+        for name, valid in (('logsql.log.gz', True), ('logsql.xz', True), ('logsql.zip', False)):
+            form = LogImportForm(
+                data={'database_name': 'WAY4'},
+                files={'log_file': SimpleUploadedFile(name, b'data')}
+            )
+            self.assertEqual(form.is_valid(), valid, name)
+
+
+class SqlLogBatchWriterTests(TestCase):
+    """Test ghi SqlLog theo batch"""
+
+    def test_flushes_when_batch_is_full(self):
+        writer = SqlLogBatchWriter(batch_size=2)
+        self.assertEqual(writer.add('WAY4', 'SELECT 1', 10, 1, line_number=1), 0)
+        self.assertEqual(writer.add('WAY4', 'SELECT 2', 20, 2, line_number=2), 2)
+        writer.add('T24VN', 'SELECT 3', 30, 3, line_number=3)
+        self.assertEqual(SqlLog.objects.count(), 2)
+
+        writer.flush()
+        self.assertEqual(writer.written_count, 3)
+        self.assertEqual(
+            list(SqlLog.objects.order_by('line_number').values_list('database_name', 'line_number')),
+            [('WAY4', 1), ('WAY4', 2), ('T24VN', 3)]
+        )
+
+    def test_failed_batch_does_not_affect_other_batches(self):
+        with SqlLogBatchWriter(batch_size=2) as writer:
+            writer.add('WAY4', 'SELECT 1', 10, 1, line_number=1)
+            writer.add('WAY4', 'SELECT 2', 20, 2, line_number=2)
+            # exec_time_ms âm vi phạm ràng buộc PositiveIntegerField
+            writer.add('WAY4', 'SELECT 3', -1, 1, line_number=3)
+            writer.add('WAY4', 'SELECT 4', 40, 4, line_number=4)
+            writer.add('WAY4', 'SELECT 5', 50, 5, line_number=5)
+
+        self.assertEqual(writer.written_count, 3)
+        self.assertEqual(writer.failed_count, 2)
+        self.assertEqual(len(writer.errors), 1)
+        self.assertEqual(
+            list(SqlLog.objects.order_by('line_number').values_list('line_number', flat=True)),
+            [1, 2, 5]
+        )
+
+    def test_naive_created_at_uses_current_time_zone(self):
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('WAY4', 'SELECT 1', 10, 1, line_number=1, created_at=datetime(2026, 10, 1, 10, 30))
+        log = SqlLog.objects.get()
+        self.assertEqual(timezone.localtime(log.created_at).replace(tzinfo=None), datetime(2026, 10, 1, 10, 30))
+        rollup = SqlLogRollup.objects.get(period='hour')
+        self.assertEqual(timezone.localtime(rollup.bucket_start).replace(tzinfo=None), datetime(2026, 10, 1, 10))
+
+
+class ProcessLogFileTests(TestCase):
+    """Test import file log upload từ web (process_log_file)"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'mat-khau-123')
+        # Superuser chỉ import được vào database đã có log
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('DB0', 'SELECT 0', 1, 1)
+
+    def upload(self, content, name='web.log', **kwargs):
+        return process_log_file(SimpleUploadedFile(name, content.encode('utf-8')), 'DB0', self.user, **kwargs)
+
+    def test_upload_imports_lines_with_local_timestamps(self):
+        with self.settings(LOG_IMPORT_BATCH_SIZE=2):
+            result = self.upload(
+                '2020-01-01 10:00:00|DB0|SELECT 1|12|3\n'
+                '2020-01-01 10:30:00|DB0|SELECT 2|20|1\n'
+                '2020-01-01 11:15:00|db0|SELECT 1|8|2\n'
+                'dòng không hợp lệ\n'
+                '2020-01-01 11:20:00|KHAC|SELECT 3|1|1\n'
+            )
+        self.assertTrue(result['success'], result)
+        self.assertEqual(
+            (result['imported_count'], result['error_count'], result['skipped_count']), (3, 1, 1)
+        )
+
+        logs = SqlLog.objects.exclude(sql_query='SELECT 0').order_by('line_number')
+        self.assertEqual(
+            [(timezone.localtime(log.created_at).strftime('%Y-%m-%d %H:%M'), log.exec_time_ms) for log in logs],
+            [('2020-01-01 10:00', 12), ('2020-01-01 10:30', 20), ('2020-01-01 11:15', 8)]
+        )
+        hours = SqlLogRollup.objects.filter(period='hour', bucket_start__lt=timezone.make_aware(datetime(2020, 1, 2)))
+        self.assertEqual(
+            sorted((timezone.localtime(rollup.bucket_start).hour, rollup.count) for rollup in hours), [(10, 2), (11, 1)]
+        )
+        log_file = LogFile.objects.get(file_name='web.log')
+        self.assertEqual((log_file.imported_count, log_file.error_count), (3, 1))
+
+    def test_failed_batches_are_reported(self):
+        content = '2020-01-01 10:00:00|DB0|SELECT 1|12|3\n2020-01-01 10:30:00|DB0|SELECT 2|20|1\n'
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=DatabaseError('đĩa đầy')):
+            result = self.upload(content)
+        self.assertFalse(result['success'])
+        self.assertIn('Không ghi được 2 dòng', result['error'])
+        self.assertIn('đĩa đầy', result['error'])
+        self.assertEqual(LogFile.objects.get(file_name='web.log').error_count, 2)
+
+        # Ghi được một phần: vẫn thành công nếu cho phép bỏ qua lỗi, thất bại nếu không
+        calls = []
+
+        def fail_second_batch(queryset, objs, *args, **kwargs):
+            calls.append(queryset.model)
+            if calls.count(SqlLog) == 2:
+                raise DatabaseError('đĩa đầy')
+            return real_bulk_create(queryset, objs, *args, **kwargs)
+
+        real_bulk_create = QuerySet.bulk_create
+        with self.settings(LOG_IMPORT_BATCH_SIZE=1), mock.patch.object(QuerySet, 'bulk_create', fail_second_batch):
+            result = self.upload(content)
+            self.assertTrue(result['success'], result)
+            self.assertEqual((result['imported_count'], len(result['errors'])), (1, 1))
+
+            calls.clear()
+            result = self.upload(content, skip_unauthorized=False)
+            self.assertFalse(result['success'])
+            self.assertIn('Không ghi được 1 dòng', result['error'])
+
+    def test_same_content_under_another_name_is_deduplicated(self):
+        content = '2020-01-01 10:00:00|DB0|SELECT 1|12|3\n2020-01-01 10:30:00|DB0|SELECT 2|20|1\n'
+        self.assertEqual(self.upload(content, name='a.log', deduplicate=True)['imported_count'], 2)
+
+        # File đã được ghi thêm, upload lại dưới tên khác: chỉ dòng mới được import
+        content += '2020-01-01 11:00:00|DB0|SELECT 3|5|1\n'
+        result = self.upload(content, name='b.log', deduplicate=True)
+        self.assertEqual((result['imported_count'], result['duplicate_count']), (1, 2))
+        self.assertEqual(
+            LogFile.objects.get(file_name='b.log').checksum, hashlib.sha256(content.encode('utf-8')).hexdigest()
+        )
+
+    def test_fractional_exec_time_matches_rollups(self):
+        self.upload('2020-01-01 10:00:00|DB0|SELECT 1|12.7|3\n2020-01-01 10:10:00|DB0|SELECT 1|8.5|1\n')
+
+        logs = SqlLog.objects.filter(sql_query='SELECT 1')
+        self.assertEqual(sorted(logs.values_list('exec_time_ms', flat=True)), [8, 12])
+        totals = logs.aggregate(
+            count=Count('id'), sum_exec_time_ms=Sum('exec_time_ms'), min_exec_time_ms=Min('exec_time_ms'),
+            max_exec_time_ms=Max('exec_time_ms'), sum_exec_count=Sum('exec_count')
+        )
+        # SELECT 0 của setUp cùng mẫu câu nhưng ở bucket hiện tại
+        rollups = SqlLogRollup.objects.filter(bucket_start__lt=timezone.make_aware(datetime(2020, 1, 2)))
+        for period in ('hour', 'day'):
+            rollup = rollups.get(period=period)
+            self.assertEqual({field: getattr(rollup, field) for field in totals}, totals)
+
+
+class QueryFingerprintStorageTests(TestCase):
+    """Test gán QueryFingerprint khi import và backfill dữ liệu cũ"""
+
+    def test_writer_links_rows_to_shared_fingerprint(self):
+        with SqlLogBatchWriter(batch_size=2) as writer:
+            writer.add('WAY4', 'SELECT * FROM accounts WHERE account_id = 555', 10, 1)
+            writer.add('WAY4', 'SELECT * FROM accounts WHERE account_id = 42', 20, 1)
+            writer.add('WAY4', 'SELECT * FROM users', 30, 1)
+
+        self.assertEqual(QueryFingerprint.objects.count(), 2)
+        templates = dict(SqlLog.objects.values_list('exec_time_ms', 'fingerprint__normalized_sql'))
+        self.assertEqual(templates, {
+            10: 'SELECT * FROM ACCOUNTS WHERE ACCOUNT_ID = ?',
+            20: 'SELECT * FROM ACCOUNTS WHERE ACCOUNT_ID = ?',
+            30: 'SELECT * FROM USERS',
+        })
+
+    def test_migration_backfills_existing_rows(self):
+        SqlLog.objects.bulk_create([
+            SqlLog(database_name='WAY4', sql_query=f'SELECT * FROM t WHERE id = {i}', exec_time_ms=i, exec_count=1)
+            for i in range(5)
+        ])
+        migration = importlib.import_module('logs.migrations.0010_query_fingerprint')
+        migration.backfill_fingerprints(apps, mock.Mock(connection=connection))
+
+        self.assertEqual(QueryFingerprint.objects.get().normalized_sql, 'SELECT * FROM T WHERE ID = ?')
+        self.assertFalse(SqlLog.objects.filter(fingerprint=None).exists())
+
+
+class SqlLogRollupTests(TestCase):
+    """Test bảng tổng hợp SqlLogRollup được cập nhật khi import"""
+
+    def setUp(self):
+        cache.clear()
+        base = timezone.make_aware(datetime(2025, 9, 6, 10, 15))
+        self.created_at = [base, base + timedelta(minutes=30), base + timedelta(hours=1), base + timedelta(days=1)]
+        with SqlLogBatchWriter(batch_size=3) as writer:
+            for i in range(20):
+                writer.add(
+                    'WAY4' if i % 3 else 'T24VN', f'SELECT * FROM t{i % 2} WHERE id = {i}', 100 + i * 7 % 50, i,
+                    created_at=self.created_at[i % 4]
+                )
+
+    def rollup_rows(self, period):
+        return sorted(
+            SqlLogRollup.objects.filter(period=period).values_list(
+                'database_name', 'fingerprint_id', 'bucket_start', 'count', 'sum_exec_time_ms',
+                'min_exec_time_ms', 'max_exec_time_ms', 'sum_exec_count'
+            )
+        )
+
+    def test_incremental_rollups_match_raw_aggregates(self):
+        expected = sorted(
+            SqlLog.objects.values('database_name', 'fingerprint_id', bucket=TruncHour('created_at')).annotate(
+                count=Count('id'), total=Sum('exec_time_ms'), low=Min('exec_time_ms'), high=Max('exec_time_ms'),
+                executions=Sum('exec_count')
+            ).values_list('database_name', 'fingerprint_id', 'bucket', 'count', 'total', 'low', 'high', 'executions')
+        )
+        self.assertEqual(self.rollup_rows('hour'), expected)
+        self.assertEqual(
+            sum(row[3] for row in self.rollup_rows('day')), SqlLog.objects.count()
+        )
+
+    def test_rebuild_matches_incremental_rollups(self):
+        incremental = (self.rollup_rows('hour'), self.rollup_rows('day'))
+        rebuild_rollups()
+        self.assertEqual((self.rollup_rows('hour'), self.rollup_rows('day')), incremental)
+
+    def test_admin_changes_update_affected_buckets(self):
+        model_admin = SqlLogAdmin(SqlLog, admin.site)
+        logs = list(SqlLog.objects.order_by('id'))
+        logs[0].exec_time_ms = 5000
+        logs[0].created_at = self.created_at[2]
+        model_admin.save_model(None, logs[0], None, change=True)
+        model_admin.delete_model(None, logs[1])
+        model_admin.delete_queryset(None, SqlLog.objects.filter(id__in=[logs[2].id, logs[3].id, logs[7].id]))
+
+        incremental = (self.rollup_rows('hour'), self.rollup_rows('day'))
+        rebuild_rollups()
+        self.assertEqual((self.rollup_rows('hour'), self.rollup_rows('day')), incremental)
+
+    def test_admin_delete_before_compaction_cutoff_subtracts_from_bucket(self):
+        # Bucket trước mốc compact còn chứa số liệu của dòng đã xóa: chỉ trừ phần của dòng bị xóa
+        LogCompaction.objects.create(cutoff=self.created_at[3].replace(hour=0, minute=0))
+        log = SqlLog.objects.filter(created_at=self.created_at[0]).first()
+        bucket = SqlLogRollup.objects.filter(
+            period='day', database_name=log.database_name, fingerprint=log.fingerprint_id
+        ).exclude(bucket_start__gte=self.created_at[3].replace(hour=0, minute=0)).get()
+        SqlLogAdmin(SqlLog, admin.site).delete_model(None, log)
+
+        bucket_after = SqlLogRollup.objects.get(pk=bucket.pk)
+        self.assertEqual(
+            (bucket_after.count, bucket_after.sum_exec_time_ms, bucket_after.sum_exec_count),
+            (bucket.count - 1, bucket.sum_exec_time_ms - log.exec_time_ms, bucket.sum_exec_count - log.exec_count)
+        )
+
+    def test_fingerprint_with_rollups_cannot_be_deleted(self):
+        fingerprint = SqlLogRollup.objects.first().fingerprint
+        self.assertFalse(QueryFingerprintAdmin(QueryFingerprint, admin.site).has_delete_permission(None, fingerprint))
+        with self.assertRaises(ProtectedError):
+            fingerprint.delete()
+        self.assertEqual(sum(row[3] for row in self.rollup_rows('day')), SqlLog.objects.count())
+
+    def test_statistics_view_reads_rollups(self):
+        user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'mat-khau-123')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('logs:statistics'), {'database': 'WAY4'})
+
+        logs = SqlLog.objects.filter(database_name='WAY4')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_logs'], logs.count())
+        self.assertEqual(response.context['total_exec_time'], logs.aggregate(total=Sum('exec_time_ms'))['total'])
+        self.assertEqual([stat['database_name'] for stat in response.context['db_stats']], ['WAY4'])
+        self.assertEqual(sum(stat['count'] for stat in response.context['top_templates']), logs.count())
+
+    def test_cached_statistics_invalidated_by_new_batch(self):
+        stats = cached_statistics(['WAY4', 'T24VN'])
+        self.assertEqual(stats['summary']['total_logs'], 20)
+        self.assertEqual(stats['db_stats'][0]['count'], SqlLog.objects.filter(database_name='WAY4').count())
+
+        # Lần sau chỉ đọc version, không truy vấn bảng tổng hợp
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_statistics(['T24VN', 'WAY4']), stats)
+
+        way4_stats = cached_statistics(['WAY4'])
+        with SqlLogBatchWriter() as writer:
+            writer.add('T24VN', 'SELECT 1', 5, 1, created_at=self.created_at[0])
+        self.assertEqual(cached_statistics(['WAY4', 'T24VN'])['summary']['total_logs'], 21)
+        # Database không có batch mới vẫn dùng cache cũ
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_statistics(['WAY4']), way4_stats)
+
+
+class KeysetPaginationTests(TestCase):
+    """Test phân trang keyset cho index và api_logs"""
+
+    def setUp(self):
+        cache.clear()
+        base = timezone.make_aware(datetime(2025, 9, 6, 10, 15))
+        # Nhiều dòng cùng created_at (như trong một batch import) để kiểm tra khóa phụ id
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            for i in range(25):
+                writer.add('WAY4' if i % 2 else 'T24VN', f'SELECT {i}', i, 1,
+                           created_at=base + timedelta(minutes=i // 4))
+        self.expected = list(SqlLog.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'mat-khau-123')
+        self.client.force_login(user)
+
+    def test_walk_forward_and_back(self):
+        pages = [keyset_paginate(SqlLog.objects.all(), None, 7)]
+        while pages[-1].has_next:
+            pages.append(keyset_paginate(SqlLog.objects.all(), pages[-1].next_cursor, 7))
+
+        self.assertEqual([log.id for page in pages for log in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertFalse(pages[0].has_previous)
+
+        previous = keyset_paginate(SqlLog.objects.all(), pages[-1].prev_cursor, 7)
+        self.assertEqual([log.id for log in previous], [log.id for log in pages[2]])
+        self.assertTrue(previous.has_next)
+        first = keyset_paginate(SqlLog.objects.all(), pages[1].prev_cursor, 7)
+        self.assertEqual([log.id for log in first], [log.id for log in pages[0]])
+        self.assertFalse(first.has_previous)
+
+    def test_invalid_cursor(self):
+        for cursor in ('abc', 'W10', 'WyJ4IiwiMjAyNS0wOS0wNiIsMV0'):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+        response = self.client.get(reverse('logs:api_logs'), {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_logs_cursors(self):
+        url = reverse('logs:api_logs')
+        data = self.client.get(url, {'database': 'WAY4', 'per_page': 5, 'include_total': 1}).json()
+        ids = [log['id'] for log in data['logs']]
+        self.assertIsNone(data['pagination']['prev'])
+        self.assertEqual(data['pagination']['approximate_total'], 12)
+
+        while data['pagination']['next']:
+            data = self.client.get(url, {'database': 'WAY4', 'per_page': 5, 'cursor': data['pagination']['next']}).json()
+            ids.extend(log['id'] for log in data['logs'])
+            self.assertIsNone(data['pagination']['approximate_total'])
+
+        self.assertEqual(ids, list(SqlLog.objects.filter(database_name='WAY4').order_by('-created_at', '-id')
+                                   .values_list('id', flat=True)))
+
+    def test_date_filters(self):
+        url = reverse('logs:api_logs')
+        data = self.client.get(url, {'date_from': '2025-09-06', 'date_to': '2025-09-06', 'include_total': 1}).json()
+        self.assertEqual(len(data['logs']), 20)
+        self.assertEqual(data['pagination']['approximate_total'], 25)
+
+        data = self.client.get(url, {'date_from': '2025-09-07', 'include_total': 1}).json()
+        self.assertEqual((data['logs'], data['pagination']['approximate_total']), ([], 0))
+
+        # Giá trị ngày không hợp lệ được bỏ qua
+        response = self.client.get(reverse('logs:index'), {'date_to': 'hôm qua'})
+        self.assertEqual(len(response.context['page_obj']), 20)
+        self.assertNotIn('date_to', response.context)
+
+    def test_index_page(self):
+        response = self.client.get(reverse('logs:index'), {'per_page': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([log.id for log in response.context['page_obj']], self.expected[:10])
+        self.assertEqual(response.context['total_count'], 25)
+
+        response = self.client.get(reverse('logs:index'), {
+            'per_page': 10, 'cursor': response.context['page_obj'].next_cursor
+        })
+        self.assertEqual([log.id for log in response.context['page_obj']], self.expected[10:20])
+
+
+class ImportLogsCommandTests(TestCase):
+    """Test lệnh import_logs"""
+
+    def setUp(self):
+        handle, self.file_path = tempfile.mkstemp(suffix='.log')
+        with os.fdopen(handle, 'w', encoding='utf-8') as f:
+            f.write(
+                'DB:T24VN,sql:SELECT * FROM users WHERE user_id = 32,exec_time_ms:50,exec_count:35\n'
+                '\n'
+                'dòng không hợp lệ\n'
+                'DB:WAY4,sql:SELECT * FROM customers WHERE cust_id = 203,exec_time_ms:5005,exec_count:150\n'
+            )
+        self.addCleanup(os.remove, self.file_path)
+
+    def test_copy_method_records_method_and_timings(self):
+        call_command('import_logs', self.file_path, method='copy', stdout=io.StringIO())
+
+        log_file = LogFile.objects.get()
+        expected_method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        self.assertEqual(log_file.import_method, expected_method)
+        self.assertEqual((log_file.total_lines, log_file.processed_lines, log_file.failed_lines), (3, 2, 1))
+        self.assertIn('write', log_file.phase_timings)
+        self.assertIn('parse', log_file.phase_timings)
+        self.assertIsNotNone(log_file.rows_per_second)
+        self.assertEqual(
+            list(SqlLog.objects.order_by('line_number').values_list('database_name', 'line_number')),
+            [('T24VN', 1), ('WAY4', 4)]
+        )
+
+    def test_copy_value_escaping(self):
+        self.assertEqual(_copy_value(None), '\\N')
+        self.assertEqual(_copy_value('a\tb\nc\\d\re'), 'a\\tb\\nc\\\\d\\re')
+        self.assertEqual(_copy_value(42), '42')
+
+    def test_parallel_import_matches_serial_import(self):
+        with open(self.file_path, 'a', encoding='utf-8') as f:
+            for i in range(200):
+                if i % 7 == 0:
+                    f.write(f'dòng lỗi {i}\n')
+                elif i % 11 == 0:
+                    f.write('\n')
+                else:
+                    f.write(f'DB:WAY4,sql:SELECT * FROM t WHERE id = {i},exec_time_ms:{i},exec_count:{i}\n')
+            f.write('DB:T24VN,sql:SELECT 1,exec_time_ms:1,exec_count:1')  # dòng cuối không có \n
+
+        def run_import(**options):
+            SqlLog.objects.all().delete()
+            IngestedLine.objects.all().delete()
+            LogFile.objects.all().delete()
+            call_command('import_logs', self.file_path, batch_size=7, stdout=io.StringIO(), **options)
+            log_file = LogFile.objects.latest('id')
+            rows = list(SqlLog.objects.order_by('line_number').values_list(
+                'line_number', 'database_name', 'sql_query', 'exec_time_ms', 'exec_count'
+            ))
+            return (log_file.total_lines, log_file.processed_lines, log_file.failed_lines,
+                    log_file.error_details, rows)
+
+        serial = run_import()
+        with mock.patch('logs.management.commands.import_logs.RANGE_SIZE', 256):
+            parallel = run_import(workers=3)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial[4][-1][0], 205)
+
+    def test_checkpoint_saved_after_each_batch(self):
+        positions = []
+
+        def save_checkpoint(command, log_file, error_details, position, *args):
+            positions.append(position[:2])
+            original_save_checkpoint(command, log_file, error_details, position, *args)
+
+        original_save_checkpoint = ImportLogsCommand.save_checkpoint
+        with mock.patch.object(ImportLogsCommand, 'save_checkpoint', save_checkpoint):
+            call_command('import_logs', self.file_path, batch_size=1, stdout=io.StringIO())
+
+        first_line_end = len('DB:T24VN,sql:SELECT * FROM users WHERE user_id = 32,exec_time_ms:50,exec_count:35\n')
+        self.assertEqual(positions, [(first_line_end, 1), (os.path.getsize(self.file_path), 4)])
+        log_file = LogFile.objects.get()
+        self.assertEqual(log_file.status, 'completed')
+        self.assertEqual((log_file.last_offset, log_file.last_line_number), (os.path.getsize(self.file_path), 4))
+
+    def test_resume_continues_from_last_checkpoint(self):
+        with open(self.file_path, 'a', encoding='utf-8') as f:
+            for i in range(100):
+                if i % 9 == 0:
+                    f.write(f'dòng lỗi {i}\n')
+                else:
+                    f.write(f'DB:WAY4,sql:SELECT * FROM t WHERE id = {i},exec_time_ms:{i},exec_count:{i}\n')
+
+        def snapshot():
+            log_file = LogFile.objects.latest('id')
+            rows = list(SqlLog.objects.order_by('line_number').values_list('line_number', 'sql_query'))
+            return (log_file.status, log_file.total_lines, log_file.processed_lines, log_file.failed_lines,
+                    log_file.error_details, rows)
+
+        call_command('import_logs', self.file_path, batch_size=7, stdout=io.StringIO())
+        expected = snapshot()
+
+        original_write_batch = SqlLogBatchWriter.write_batch
+
+        for options in ({}, {'workers': 3}):
+            SqlLog.objects.all().delete()
+            IngestedLine.objects.all().delete()
+            LogFile.objects.all().delete()
+            batches = []
+
+            def failing_write_batch(writer, rows):
+                batches.append(rows)
+                if len(batches) == 5:
+                    raise RuntimeError('mất kết nối')
+                original_write_batch(writer, rows)
+
+            with mock.patch.object(SqlLogBatchWriter, 'write_batch', failing_write_batch), \
+                    mock.patch('logs.management.commands.import_logs.RANGE_SIZE', 512):
+                with self.assertRaises(CommandError):
+                    call_command('import_logs', self.file_path, batch_size=7, stdout=io.StringIO(), **options)
+
+            log_file = LogFile.objects.get()
+            self.assertEqual(log_file.status, 'failed')
+            self.assertEqual(log_file.processed_lines, 28)
+            self.assertEqual(SqlLog.objects.count(), 28)
+
+            with mock.patch('logs.management.commands.import_logs.RANGE_SIZE', 512):
+                call_command('import_logs', self.file_path, batch_size=7, resume=True, stdout=io.StringIO(),
+                             **options)
+            self.assertEqual(LogFile.objects.count(), 1)
+            self.assertEqual(snapshot(), expected)
+
+    def test_compressed_input_matches_plain_input(self):
+        with open(self.file_path, 'rb') as f:
+            content = f.read()
+
+        def run_import(file_path, **options):
+            SqlLog.objects.all().delete()
+            IngestedLine.objects.all().delete()
+            call_command('import_logs', file_path, batch_size=1, stdout=io.StringIO(), **options)
+            log_file = LogFile.objects.latest('id')
+            rows = list(SqlLog.objects.order_by('line_number').values_list('line_number', 'sql_query'))
+            return (log_file.total_lines, log_file.processed_lines, log_file.failed_lines, rows)
+
+        expected = run_import(self.file_path)
+        compressors = {'.gz': gzip.compress, '.bz2': bz2.compress, '.xz': lzma.compress}
+        if zstandard is not None:
+            compressors['.zst'] = zstandard.ZstdCompressor().compress
+        for extension, compress in compressors.items():
+            compressed_path = self.file_path + extension
+            with open(compressed_path, 'wb') as f:
+                f.write(compress(content))
+            self.addCleanup(os.remove, compressed_path)
+            self.assertEqual(run_import(compressed_path, workers=2), expected, extension)
+
+    def test_reimport_of_same_file_is_skipped(self):
+        call_command('import_logs', self.file_path, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('import_logs', self.file_path, stdout=out)
+
+        self.assertIn('File already imported', out.getvalue())
+        self.assertEqual(SqlLog.objects.count(), 2)
+        self.assertEqual(LogFile.objects.count(), 1)
+
+    def test_checksum_read_before_import_only_for_same_size_file(self):
+        def import_file(**options):
+            with mock.patch.object(
+                ImportLogsCommand, 'compute_checksum', autospec=True, side_effect=ImportLogsCommand.compute_checksum
+            ) as compute_checksum:
+                call_command('import_logs', self.file_path, stdout=io.StringIO(), **options)
+            return compute_checksum.call_count
+
+        with open(self.file_path, 'rb') as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        # Chưa có lần import nào cùng kích thước: checksum chỉ được tính một lần, song song với import
+        self.assertEqual(import_file(), 1)
+        self.assertEqual(LogFile.objects.get().checksum, expected)
+        self.assertEqual(import_file(), 1)
+        self.assertEqual(LogFile.objects.count(), 1)
+        self.assertEqual(import_file(force=True), 1)
+        self.assertEqual(LogFile.objects.latest('id').checksum, expected)
+
+    def test_overlapping_import_only_adds_new_lines(self):
+        call_command('import_logs', self.file_path, method='copy', deduplicate=True, stdout=io.StringIO())
+        with open(self.file_path, 'a', encoding='utf-8') as f:
+            f.write('DB:WAY4,sql:SELECT 5,exec_time_ms:5,exec_count:5\n')
+
+        call_command('import_logs', self.file_path, method='copy', batch_size=2, deduplicate=True,
+                     stdout=io.StringIO())
+        log_file = LogFile.objects.latest('id')
+        self.assertEqual((log_file.processed_lines, log_file.duplicate_lines), (1, 2))
+        self.assertEqual(
+            list(SqlLog.objects.order_by('line_number').values_list('line_number', flat=True)), [1, 4, 5]
+        )
+        self.assertEqual(SqlLogRollup.objects.filter(period='day').aggregate(total=Sum('count'))['total'], 3)
+
+        # --force đọc lại file, vẫn bỏ qua dòng trùng nếu có --deduplicate; không có thì ghi lại tất cả
+        call_command('import_logs', self.file_path, force=True, deduplicate=True, stdout=io.StringIO())
+        self.assertEqual(LogFile.objects.latest('id').duplicate_lines, 3)
+        call_command('import_logs', self.file_path, force=True, stdout=io.StringIO())
+        self.assertEqual(SqlLog.objects.count(), 6)
+
+    def test_same_lines_from_another_file_are_not_duplicates(self):
+        def copy_of_file():
+            handle, path = tempfile.mkstemp(suffix='.log')
+            with os.fdopen(handle, 'wb') as f, open(self.file_path, 'rb') as source:
+                f.write(source.read())
+            return path
+
+        other_path = copy_of_file()
+        self.addCleanup(os.remove, other_path)
+        call_command('import_logs', self.file_path, deduplicate=True, stdout=io.StringIO())
+        call_command('import_logs', other_path, force=True, deduplicate=True, stdout=io.StringIO())
+        self.assertEqual(SqlLog.objects.count(), 4)
+        self.assertEqual(LogFile.objects.latest('id').duplicate_lines, 0)
+
+        # File mới cùng tên (sau khi rotate) có inode khác: số dòng bắt đầu lại từ 1 không bị bỏ qua
+        os.replace(copy_of_file(), self.file_path)
+        call_command('import_logs', self.file_path, force=True, deduplicate=True, stdout=io.StringIO())
+        self.assertEqual(SqlLog.objects.count(), 6)
+
+    def test_backfill_ledger_from_existing_rows(self):
+        call_command('import_logs', self.file_path, stdout=io.StringIO())
+        self.assertFalse(IngestedLine.objects.exists())
+        # Dòng 1 trong file đã đổi nội dung: không còn là dòng đã import
+        with open(self.file_path, 'r+', encoding='utf-8') as f:
+            f.write('DB:T24VN,sql:SELECT * FROM users WHERE user_id = 33')
+
+        out = io.StringIO()
+        call_command('backfill_ingested_lines', stdout=out)
+        self.assertIn('Recorded 1 deduplication hashes', out.getvalue())
+        call_command('import_logs', self.file_path, force=True, deduplicate=True, stdout=io.StringIO())
+        log_file = LogFile.objects.latest('id')
+        self.assertEqual((log_file.processed_lines, log_file.duplicate_lines), (1, 1))
+        self.assertEqual(SqlLog.objects.filter(line_number=1).count(), 2)
+
+    def test_backfill_skips_relative_paths_without_base_dir(self):
+        directory, name = os.path.split(self.file_path)
+        call_command('import_logs', self.file_path, stdout=io.StringIO())
+        LogFile.objects.update(file_path=name)
+
+        out = io.StringIO()
+        call_command('backfill_ingested_lines', stdout=out)
+        self.assertIn(f'Skipping {name}: relative path', out.getvalue())
+        self.assertFalse(IngestedLine.objects.exists())
+
+        call_command('backfill_ingested_lines', base_dir=directory, stdout=io.StringIO())
+        self.assertEqual(IngestedLine.objects.count(), 2)
+
+    def test_empty_file(self):
+        open(self.file_path, 'w').close()
+        out = io.StringIO()
+        call_command('import_logs', self.file_path, stdout=out)
+        self.assertIn('Import completed successfully', out.getvalue())
+        self.assertEqual(LogFile.objects.get().total_lines, 0)
+
+    def test_resume_rejects_clear_existing(self):
+        with self.assertRaises(CommandError):
+            call_command('import_logs', self.file_path, resume=True, clear_existing=True, stdout=io.StringIO())
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY chỉ có trên PostgreSQL')
+    def test_copy_writer_round_trips_special_characters(self):
+        sql_query = "SELECT 'a\tb' FROM t\nWHERE x = '\\\\'"
+        with SqlLogCopyWriter(batch_size=10) as writer:
+            writer.add('WAY4', sql_query, 10, 1, line_number=1)
+            writer.add('WAY4', 'SELECT 2', 20, 2)
+
+        self.assertEqual(writer.written_count, 2)
+        self.assertEqual(SqlLog.objects.get(line_number=1).sql_query, sql_query)
+        self.assertEqual(SqlLog.objects.get(sql_query='SELECT 2').fingerprint.normalized_sql, 'SELECT ?')
+        self.assertIsNone(SqlLog.objects.get(sql_query='SELECT 2').line_number)
+
+
+class CompactLogsCommandTests(TestCase):
+    """Test lệnh compact_logs"""
+
+    def setUp(self):
+        cache.clear()
+        old = timezone.now() - timedelta(days=40)
+        with SqlLogBatchWriter() as writer:
+            for i in range(10):
+                writer.add('WAY4' if i % 2 else 'T24VN', f'SELECT * FROM t WHERE id = {i}', i, 2, created_at=old)
+            for i in range(5):
+                writer.add('WAY4', 'SELECT 1', 1, 1, created_at=timezone.now() - timedelta(days=1))
+        # Dòng không qua import: chưa có mẫu câu SQL và chưa có trong bảng tổng hợp
+        SqlLog.objects.create(database_name='EBANK', sql_query='SELECT 2', exec_time_ms=7, exec_count=1, created_at=old)
+
+    def daily_total(self):
+        return SqlLogRollup.objects.filter(period='day').aggregate(total=Sum('count'))['total']
+
+    def test_compact_keeps_daily_totals(self):
+        self.assertEqual(self.daily_total(), 15)
+        out = io.StringIO()
+        call_command('compact_logs', days=30, batch_size=4, stdout=out)
+
+        self.assertEqual(SqlLog.objects.count(), 5)
+        self.assertFalse(SqlLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=30)).exists())
+        self.assertEqual(self.daily_total(), 16)
+        self.assertEqual(
+            SqlLogRollup.objects.get(period='day', database_name='EBANK').sum_exec_time_ms, 7
+        )
+        self.assertFalse(SqlLogRollup.objects.filter(
+            period='hour', bucket_start__lt=timezone.now() - timedelta(days=30)
+        ).exists())
+        self.assertEqual(cached_statistics(['WAY4', 'T24VN', 'EBANK'])['summary']['total_logs'], 16)
+
+        compaction = LogCompaction.objects.get()
+        self.assertEqual(compaction.deleted_rows, 11)
+        self.assertGreater(compaction.reclaimed_bytes, 0)
+        self.assertIsNotNone(compaction.finished_at)
+        self.assertIn('Compacted 11 rows', out.getvalue())
+
+        # Dựng lại bảng tổng hợp không làm mất số liệu của các dòng đã xóa
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.daily_total(), 16)
+
+    def test_dry_run(self):
+        out = io.StringIO()
+        call_command('compact_logs', days=30, dry_run=True, stdout=out)
+        self.assertIn(': 11 rows', out.getvalue())
+        self.assertEqual(SqlLog.objects.count(), 16)
+        self.assertFalse(LogCompaction.objects.exists())
+
+    def test_prunes_old_deduplication_hashes(self):
+        IngestedLine.objects.bulk_create(
+            [IngestedLine(row_hash=f'{i:040x}', ingested_at=timezone.now() - timedelta(days=i * 20))
+             for i in range(5)]
+        )
+        out = io.StringIO()
+        call_command('compact_logs', days=30, ledger_days=50, dry_run=True, stdout=out)
+        self.assertIn('Deduplication hashes recorded before', out.getvalue())
+        self.assertEqual(IngestedLine.objects.count(), 5)
+
+        out = io.StringIO()
+        call_command('compact_logs', days=30, ledger_days=50, batch_size=1, stdout=out)
+        self.assertIn('Deleted 2 deduplication hashes', out.getvalue())
+        self.assertEqual(
+            sorted(IngestedLine.objects.values_list('row_hash', flat=True)), [f'{i:040x}' for i in range(3)]
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Phân vùng bảng chỉ có trên PostgreSQL')
+class SqlLogPartitioningTests(TestCase):
+    """Test phân vùng SqlLog theo tháng và lệnh manage_partitions"""
+
+    def setUp(self):
+        cache.clear()
+        self.months = [timezone.make_aware(datetime(2025, month, 1)) for month in (7, 8, 9)]
+        with SqlLogBatchWriter() as writer:
+            for i in range(30):
+                writer.add('WAY4', f'SELECT {i}', i, 1, created_at=self.months[i % 3] + timedelta(days=14, hours=i))
+        self.max_id = SqlLog.objects.order_by('-id').values_list('id', flat=True).first()
+
+    def test_requires_convert(self):
+        with self.assertRaisesMessage(CommandError, '--convert'):
+            call_command('manage_partitions', stdout=io.StringIO())
+
+    def test_convert_prune_and_drop(self):
+        call_command('manage_partitions', convert=True, months_ahead=1, stdout=io.StringIO())
+
+        self.assertTrue(is_partitioned())
+        names = [name for _, name in list_partitions()]
+        self.assertEqual(names[:3], ['logs_sqllog_p2025_07', 'logs_sqllog_p2025_08', 'logs_sqllog_p2025_09'])
+        self.assertEqual(list_partitions()[-1][0].date(), (timezone.localdate().replace(day=1) + timedelta(days=32)).replace(day=1))
+        self.assertEqual(SqlLog.objects.count(), 30)
+
+        with SqlLogBatchWriter() as writer:
+            writer.add('WAY4', 'SELECT 1', 1, 1)
+        self.assertGreater(SqlLog.objects.latest('id').id, self.max_id)
+
+        # Lọc theo khoảng thời gian chỉ quét phân vùng của tháng 8
+        plan = SqlLog.objects.filter(created_at__gte=self.months[1], created_at__lt=self.months[2]).explain()
+        self.assertIn('logs_sqllog_p2025_08', plan)
+        self.assertNotIn('logs_sqllog_p2025_07', plan)
+
+        self.assertEqual(drop_partitions_before(self.months[2]), ['logs_sqllog_p2025_07', 'logs_sqllog_p2025_08'])
+        self.assertEqual(SqlLog.objects.filter(created_at__lt=self.months[2]).count(), 0)
+        self.assertEqual(SqlLog.objects.count(), 11)
+        self.assertFalse(SqlLogRollup.objects.filter(bucket_start__lt=self.months[2]).exists())
+
+    def test_create_partition_moves_rows_from_default(self):
+        call_command('manage_partitions', convert=True, months_ahead=0, stdout=io.StringIO())
+        future = timezone.now() + timedelta(days=800)
+        with SqlLogBatchWriter() as writer:
+            writer.add('WAY4', 'SELECT 1', 1, 1, created_at=future)
+
+        self.assertTrue(create_partition(future))
+        self.assertFalse(create_partition(future))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM logs_sqllog_default')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(SqlLog.objects.filter(created_at=future).count(), 1)
+
+
+class TailLogsCommandTests(TestCase):
+    """Test lệnh tail_logs (theo dõi file log liên tục)"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'logsql.log')
+        self.append('DB:T24VN,sql:SELECT 1,exec_time_ms:10,exec_count:1\n')
+
+        self.command = TailLogsCommand(stdout=io.StringIO())
+        self.command.start(self.file_path, from_beginning=True, flush_interval=0)
+        self.addCleanup(lambda: self.command.file.close())
+        self.writer = SqlLogBatchWriter(batch_size=100)
+
+    def append(self, text, mode='a'):
+        with open(self.file_path, mode, encoding='utf-8') as f:
+            f.write(text)
+
+    def imported(self):
+        return list(SqlLog.objects.order_by('id').values_list('sql_query', 'line_number'))
+
+    def test_imports_new_lines_and_waits_for_incomplete_line(self):
+        self.command.poll(self.writer)
+        self.assertEqual(self.imported(), [('SELECT 1', 1)])
+
+        self.append('dòng lỗi\nDB:WAY4,sql:SELECT 2,exec_time_ms:700,exec_count:200')
+        self.command.poll(self.writer)
+        self.assertEqual(self.imported(), [('SELECT 1', 1)])
+        self.assertEqual(self.command.failed_lines, 1)
+
+        self.append('\n')
+        self.command.poll(self.writer)
+        self.assertEqual(self.imported(), [('SELECT 1', 1), ('SELECT 2', 3)])
+
+    def test_waits_for_flush_interval(self):
+        self.command.flush_interval = 60
+        self.command.poll(self.writer)
+        self.assertEqual(self.imported(), [])
+        self.assertEqual(len(self.writer.pending), 1)
+
+    def test_detects_truncation(self):
+        self.command.poll(self.writer)
+        self.append('DB:WAY4,sql:SELECT 2,exec_time_ms:1,exec_count:1\n', mode='w')
+        self.command.poll(self.writer)
+        self.command.poll(self.writer)
+        self.assertEqual(self.imported(), [('SELECT 1', 1), ('SELECT 2', 1)])
+
+    def test_detects_rotation(self):
+        self.command.poll(self.writer)
+        self.append('DB:WAY4,sql:SELECT 2,exec_time_ms:1,exec_count:1')
+        os.rename(self.file_path, self.file_path + '.1')
+        self.append('DB:WAY4,sql:SELECT 3,exec_time_ms:1,exec_count:1\n', mode='w')
+
+        self.command.poll(self.writer)
+        self.command.poll(self.writer)
+        self.assertEqual(self.imported(), [('SELECT 1', 1), ('SELECT 2', 2), ('SELECT 3', 1)])
+
+    def test_command_records_log_file(self):
+        call_command('tail_logs', self.file_path, from_beginning=True, duration=0.05, poll_interval=10,
+                     stdout=io.StringIO())
+
+        log_file = LogFile.objects.get()
+        self.assertEqual(log_file.status, 'completed')
+        self.assertEqual((log_file.total_lines, log_file.processed_lines), (1, 1))
+        self.assertEqual(log_file.last_offset, os.path.getsize(self.file_path))
+
+    def test_resumes_from_checkpoint_of_previous_run(self):
+        def tail(**options):
+            call_command('tail_logs', self.file_path, duration=0.05, poll_interval=10, stdout=io.StringIO(), **options)
+            return LogFile.objects.latest('id')
+
+        crashed = tail(from_beginning=True)
+        # Lần chạy trước bị dừng đột ngột: LogFile vẫn ở trạng thái running
+        LogFile.objects.filter(pk=crashed.pk).update(status='running')
+        self.assertIsNone(ImportLogsCommand().find_unfinished_import(self.file_path, 'default'))
+
+        self.append('DB:WAY4,sql:SELECT 2,exec_time_ms:1,exec_count:1\n')
+        log_file = tail(deduplicate=True)
+        self.assertEqual((log_file.import_method, log_file.processed_lines), ('tail', 1))
+        self.assertEqual(self.imported(), [('SELECT 1', 1), ('SELECT 2', 2)])
+
+        # File đã bị rotate: checkpoint thuộc inode cũ, bắt đầu từ cuối file mới
+        handle, path = tempfile.mkstemp(dir=self.directory.name)
+        with os.fdopen(handle, 'w') as f:
+            f.write('DB:WAY4,sql:SELECT 3,exec_time_ms:1,exec_count:1\n')
+        os.replace(path, self.file_path)
+        log_file = tail()
+        self.assertEqual((log_file.processed_lines, log_file.inode), (0, os.stat(self.file_path).st_ino))
+        self.assertEqual(len(self.imported()), 2)
+
+
+class ExportSnapshotCommandTests(TestCase):
+    """Test lệnh export_snapshot"""
+
+    def setUp(self):
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('WAY4', "SELECT 'ĐẶNG' FROM t WHERE id = 1", 10, 1, line_number=1)
+            writer.add('WAY4', 'SELECT 2', 20, 2)
+            # Database mới xuất hiện ở batch sau: từ điển database_name phải lớn dần
+            writer.add('T24VN', 'SELECT 3', 30, 3, line_number=3)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, extension, **options):
+        path = os.path.join(self.directory.name, f'snapshot.{extension}')
+        call_command('export_snapshot', path, chunk_size=2, stdout=io.StringIO(), **options)
+        return load_snapshot(path).sort_values('id').reset_index(drop=True)
+
+    def assert_round_trip(self, extension):
+        df = self.export(extension)
+        expected = list(SqlLog.objects.order_by('id').values_list(
+            'database_name', 'sql_query', 'exec_time_ms', 'line_number', 'created_at'
+        ))
+        self.assertEqual(str(df['database_name'].dtype), 'category')
+        self.assertEqual([
+            (row.database_name, row.sql_query, row.exec_time_ms,
+             row.line_number, row.created_at.to_pydatetime())
+            for row in df.astype(object).where(df.notna(), None).itertuples()
+        ], expected)
+
+    def test_npz_round_trip(self):
+        self.assert_round_trip('npz')
+
+    @skipUnless(snapshot.pyarrow is not None, 'cần pyarrow')
+    def test_parquet_and_arrow_round_trip(self):
+        self.assert_round_trip('parquet')
+        self.assert_round_trip('arrow')
+
+    def test_filters(self):
+        df = self.export('npz', db_names=['WAY4'], since=timezone.localdate())
+        self.assertEqual(list(df['sql_query']), ["SELECT 'ĐẶNG' FROM t WHERE id = 1", 'SELECT 2'])
+        self.assertEqual(len(self.export('npz', until=timezone.localdate() - timedelta(days=1))), 0)
+
+    def test_invalid_date_is_a_usage_error(self):
+        path = os.path.join(self.directory.name, 'snapshot.npz')
+        with self.assertRaisesMessage(CommandError, 'argument --since: invalid date (expected YYYY-MM-DD): 2025-13-01'):
+            call_command('export_snapshot', path, '--since', '2025-13-01', stdout=io.StringIO())
+        self.assertFalse(os.path.exists(path))
+
+
+class ReportGenerationTests(TestCase):
+    """Test tạo báo cáo chi tiết / bất thường"""
+
+    def setUp(self):
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('WAY4', 'SELECT ' + 'x' * 150, 3000, 600, line_number=1)
+            writer.add('WAY4', 'SELECT 2', 10, 1, line_number=2)
+            writer.add('T24VN', 'SELECT 3', 1500, 300)
+        user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'mat-khau-123')
+        self.client.force_login(user)
+        # Luôn tạo báo cáo mới (cache báo cáo được test trong ReportCacheTests)
+        settings_override = self.settings(REPORT_CACHE_MAX_BYTES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def report(self, report_type, format_type):
+        # Báo cáo đọc theo values_list().iterator(), không tạo object SqlLog
+        with mock.patch.object(SqlLog, 'from_db', side_effect=AssertionError('SqlLog instantiated')), \
+                self.settings(REPORT_CHUNK_SIZE=2):
+            response = self.client.post(reverse('logs:generate_report'), {
+                'report_type': report_type, 'format_type': format_type,
+            })
+            if response.streaming:
+                # Đọc hết nội dung stream trong lúc vẫn còn mock
+                response.streamed = b''.join(response.streaming_content)
+            return response
+
+    def csv_rows(self, response):
+        self.assertTrue(response.streamed.startswith('\ufeff'.encode('utf-8')))
+        return list(csv.reader(io.StringIO(response.streamed.decode('utf-8-sig'))))
+
+    def test_detailed_json_and_csv(self):
+        logs = self.report('detailed', 'json').json()['logs']
+        self.assertEqual([log['ID'] for log in logs],
+                         list(SqlLog.objects.order_by('-created_at').values_list('id', flat=True)))
+        first = next(log for log in logs if log['Dòng số'] == 1)
+        self.assertEqual((first['Thời gian TB (ms)'], len(first['SQL Query'])), (5.0, 157))
+
+        rows = self.csv_rows(self.report('detailed', 'csv'))
+        self.assertEqual(rows[4][:3], ['ID', 'Database', 'SQL Query'])
+        self.assertEqual(len(rows), 8)
+
+    def test_abnormal_report(self):
+        logs = self.report('abnormal', 'json').json()['abnormal_logs']
+        self.assertEqual([(log['Database'], log['Mức độ nghiêm trọng']) for log in logs],
+                         [('WAY4', 'Rất cao'), ('T24VN', 'Cao')])
+        self.assertEqual(logs[0]['SQL Query'], 'SELECT ' + 'x' * 93 + '...')
+
+        rows = self.csv_rows(self.report('abnormal', 'csv'))
+        self.assertEqual([row[1] for row in rows[6:]], ['WAY4', 'T24VN'])
+
+    def test_csv_header_is_sent_before_querying_logs(self):
+        response = self.client.post(reverse('logs:generate_report'), {
+            'report_type': 'detailed', 'format_type': 'csv',
+        })
+        self.assertTrue(response.streaming)
+        content = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            first = next(content).decode('utf-8-sig')
+        self.assertTrue(first.startswith('BÁO CÁO CHI TIẾT SQL LOGS'))
+        with self.assertNumQueries(1):
+            rest = b''.join(content).decode('utf-8')
+        self.assertEqual(rest.count('\r\n'), 3)
+
+    def test_pdf_reports(self):
+        for report_type in ('summary', 'detailed', 'abnormal'):
+            response = self.report(report_type, 'pdf')
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertEqual(int(response['Content-Length']), len(response.streamed))
+            self.assertTrue(response.streamed.startswith(b'%PDF'), report_type)
+            if pdf_rendering.pdf_font() == pdf_rendering.FONT_NAME:
+                # Font Unicode được nhúng (subset) để hiển thị tiếng Việt
+                self.assertIn(b'/FontFile2', response.streamed, report_type)
+
+
+VERA_FONT = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf')
+UNICODE_FONT = next((path for path in pdf_rendering.SYSTEM_FONT_PATHS if os.path.isfile(path)), None)
+
+
+class PdfRenderingTests(SimpleTestCase):
+    """Test font và style PDF dùng chung"""
+
+    def setUp(self):
+        pdf_rendering.reset()
+        self.addCleanup(pdf_rendering.reset)
+        fonts_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(fonts_dir.cleanup)
+        patcher = mock.patch.object(pdf_rendering, 'BUNDLED_FONT_DIR', fonts_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_font_without_vietnamese_glyphs_falls_back(self):
+        with mock.patch.object(pdf_rendering, 'SYSTEM_FONT_PATHS', ['/khong/ton/tai.ttf', VERA_FONT]), \
+                self.settings(PDF_FONT_PATH=None):
+            self.assertEqual(pdf_rendering.pdf_font(), pdf_rendering.FALLBACK_FONT_NAME)
+
+    @skipUnless(UNICODE_FONT, 'no Unicode TTF font installed')
+    def test_font_and_styles_are_built_once(self):
+        with mock.patch.object(pdf_rendering, 'SYSTEM_FONT_PATHS', []), \
+                self.settings(PDF_FONT_PATH=UNICODE_FONT), \
+                mock.patch.object(pdf_rendering, 'TTFont', wraps=pdf_rendering.TTFont) as ttfont:
+            self.assertEqual(pdf_rendering.pdf_font(), pdf_rendering.FONT_NAME)
+            styles = pdf_rendering.paragraph_styles()
+            self.assertIs(pdf_rendering.paragraph_styles(), styles)
+            self.assertEqual(styles['title'].fontName, pdf_rendering.FONT_NAME)
+            self.assertIs(pdf_rendering.data_table_style(8, 6), pdf_rendering.data_table_style(8, 6))
+            self.assertIn(('FONTNAME', (0, 0), (-1, -1), pdf_rendering.FONT_NAME),
+                          pdf_rendering.info_table_style().getCommands())
+        self.assertEqual(ttfont.call_count, 1)
+
+    def test_pages_are_compressed_as_they_are_drawn(self):
+        # CompressingCanvas dùng cấu trúc nội bộ của ReportLab: phát hiện khi nâng cấp làm nó mất tác dụng
+        buffer = io.BytesIO()
+        canvas = pdf_rendering.CompressingCanvas(buffer, pageCompression=1)
+        canvas.drawString(100, 100, 'SELECT 1 FROM dual')
+        canvas.showPage()
+        self.assertIsNone(canvas._doc.Pages.pages[-1].stream)
+        canvas.save()
+        self.assertIn(b'/FlateDecode', buffer.getvalue())
+        self.assertNotIn(b'SELECT 1 FROM dual', buffer.getvalue())
+
+    def test_large_table_is_laid_out_page_by_page(self):
+        pulled = []
+        pages = []
+
+        def rows():
+            for i in range(500):
+                pulled.append(i)
+                yield [i, 'WAY4', f'SELECT {i}']
+
+        class Doc(pdf_rendering.StreamingDocTemplate):
+            def afterPage(self):
+                pages.append(len(pulled))
+
+        tables = pdf_rendering.iter_table_chunks(
+            ['ID', 'Database', 'SQL Query'], rows(), None, pdf_rendering.data_table_style(8, 6), 20
+        )
+        with mock.patch.object(pdf_rendering, 'StreamingDocTemplate', Doc), \
+                self.settings(REPORT_PDF_SPOOL_BYTES=1024):
+            output = pdf_rendering.render_pdf(tables)
+        self.addCleanup(output.close)
+
+        # Dòng được đọc dần theo trang, không đọc hết trước khi vẽ trang đầu
+        self.assertGreater(len(pages), 5)
+        self.assertLess(pages[0], 100)
+        self.assertEqual(pages[-1], 500)
+        # PDF vượt REPORT_PDF_SPOOL_BYTES được ghi ra file tạm
+        self.assertTrue(output._rolled)
+        self.assertTrue(output.read(5).startswith(b'%PDF'))
+
+
+class ReportJobTests(TestCase):
+    """Test hàng đợi báo cáo tạo nền và lệnh run_report_worker"""
+
+    def setUp(self):
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            for i in range(5):
+                writer.add('WAY4', f'SELECT {i}', 600 + i, 150, line_number=i + 1)
+            writer.add('T24VN', 'SELECT 9', 10, 1, line_number=6)
+        self.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'mat-khau-123')
+        self.client.force_login(self.user)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media_root.name, REPORT_CHUNK_SIZE=2, REPORT_CACHE_MAX_BYTES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def queue(self, report_type='detailed', format_type='csv', **data):
+        response = self.client.post(reverse('logs:generate_report'), {
+            'report_type': report_type, 'format_type': format_type, 'run_in_background': '1', **data,
+        })
+        self.assertRedirects(response, reverse('logs:report_jobs'))
+        return ReportJob.objects.latest('id')
+
+    def test_worker_builds_downloadable_report(self):
+        job = self.queue(database_filter='WAY4')
+        self.assertEqual((job.status, job.database_filter), ('pending', 'WAY4'))
+        self.assertEqual(sorted(job.database_names), ['T24VN', 'WAY4'])
+
+        out = io.StringIO()
+        call_command('run_report_worker', once=True, stdout=out)
+        self.assertIn(f'Job #{job.id} completed', out.getvalue())
+
+        status = self.client.get(reverse('logs:report_job_status', args=[job.id])).json()
+        self.assertEqual((status['status'], status['progress']), ('completed', 100))
+        self.assertEqual((status['processed_rows'], status['total_rows']), (5, 5))
+
+        response = self.client.get(status['download_url'])
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('attachment; filename="bao_cao_chi_tiet_', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual([row[1] for row in rows[5:]], ['WAY4'] * 5)
+        self.assertContains(self.client.get(reverse('logs:report_jobs')), 'Tải về')
+
+        # Job của user khác không xem / tải được
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'mat-khau-123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(status['download_url']).status_code, 404)
+
+    def test_large_pdf_is_queued_instead_of_built_in_request(self):
+        with self.settings(REPORT_PDF_SYNC_MAX_ROWS=3):
+            response = self.client.post(reverse('logs:generate_report'), {
+                'report_type': 'detailed', 'format_type': 'pdf', 'database_filter': 'T24VN',
+            })
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertFalse(ReportJob.objects.exists())
+
+            response = self.client.post(reverse('logs:generate_report'), {
+                'report_type': 'abnormal', 'format_type': 'pdf',
+            })
+        self.assertRedirects(response, reverse('logs:report_jobs'))
+        job = ReportJob.objects.get()
+        self.assertEqual((job.report_type, job.format_type, job.status), ('abnormal', 'pdf', 'pending'))
+
+    def test_failed_job_records_error(self):
+        job = self.queue('summary', 'pdf')
+        with mock.patch('logs.report_jobs.build_report', side_effect=RuntimeError('hết bộ nhớ')):
+            call_command('run_report_worker', once=True, stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error_message), ('failed', 'hết bộ nhớ'))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claim_expiry_and_stale_jobs(self):
+        first, second = self.queue('abnormal', 'pdf'), self.queue('summary', 'json')
+        self.assertEqual(claim_job('worker-1'), first)
+        self.assertEqual(claim_job('worker-2'), second)
+        self.assertIsNone(claim_job('worker-3'))
+
+        # Worker bị dừng: job không cập nhật tiến độ được đưa lại vào hàng đợi
+        later = timezone.now() + timedelta(hours=1)
+        self.assertEqual(requeue_stale_jobs(now=later), 2)
+        job = run_job(claim_job('worker-3'))
+        self.assertEqual((job.id, job.status, job.total_rows), (first.id, 'completed', 5))
+        self.assertTrue(job.artifact.storage.exists(job.artifact.name))
+
+        self.assertEqual(purge_expired_jobs(now=timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(job.artifact.storage.exists(job.artifact.name))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'expired')
+        self.assertEqual(self.client.get(reverse('logs:report_job_download', args=[job.id])).status_code, 404)
+
+
+class ReportCacheTests(TestCase):
+    """Test cache file báo cáo (logs/report_cache.py)"""
+
+    def setUp(self):
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('WAY4', 'SELECT 1', 3000, 600, line_number=1)
+            writer.add('T24VN', 'SELECT 2', 1500, 300, line_number=2)
+        user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'mat-khau-123')
+        self.client.force_login(user)
+        cache_root = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_root.cleanup)
+        self.cache_dir = cache_root.name
+        settings_override = self.settings(REPORT_CACHE_DIR=self.cache_dir, REPORT_CACHE_MAX_BYTES=1024 * 1024)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def report(self, report_type='detailed', format_type='csv', **data):
+        response = self.client.post(reverse('logs:generate_report'), {
+            'report_type': report_type, 'format_type': format_type, **data,
+        })
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def cached_files(self):
+        return sorted(name for name in os.listdir(self.cache_dir) if name.endswith('.bin'))
+
+    def test_second_request_is_served_from_cache(self):
+        response, content = self.report()
+        self.assertNotIn('X-Report-Cache', response)
+        self.assertEqual(len(self.cached_files()), 1)
+
+        with mock.patch('logs.reports.generate_detailed_report', side_effect=AssertionError('report rebuilt')):
+            cached, cached_content = self.report()
+        self.assertEqual(cached['X-Report-Cache'], 'hit')
+        self.assertEqual(cached['X-Report-Generated-At'], response['X-Report-Generated-At'])
+        self.assertEqual(cached_content, content)
+
+        # Báo cáo trong cache từ hôm trước: tên file theo thời gian tải, header giữ thời gian tạo
+        meta_path = os.path.join(self.cache_dir, self.cached_files()[0][:-len('.bin')] + '.json')
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        meta.update(
+            content_disposition='attachment; filename="bao_cao_chi_tiet_20200101_000000.csv"',
+            generated_at='2020-01-01T00:00:00+07:00',
+        )
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        cached, _ = self.report()
+        self.assertEqual(cached['X-Report-Generated-At'], '2020-01-01T00:00:00+07:00')
+        self.assertIn(f'bao_cao_chi_tiet_{timezone.localtime():%Y%m%d}_', cached['Content-Disposition'])
+
+        # Định dạng / bộ lọc khác là báo cáo khác
+        self.report('detailed', 'json')
+        self.report('detailed', 'csv', database_filter='WAY4')
+        self.assertEqual(len(self.cached_files()), 3)
+
+    def test_import_invalidates_cached_report(self):
+        _, before = self.report('summary', 'json')
+        self.assertEqual(self.report('summary', 'json')[0]['X-Report-Cache'], 'hit')
+
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('WAY4', 'SELECT 3', 10, 1, line_number=3)
+        response, after = self.report('summary', 'json')
+        self.assertNotIn('X-Report-Cache', response)
+        self.assertNotEqual(after, before)
+
+        # Database khác không đổi: báo cáo lọc theo T24VN vẫn dùng cache
+        self.report('summary', 'json', database_filter='T24VN')
+        with SqlLogBatchWriter(batch_size=10) as writer:
+            writer.add('WAY4', 'SELECT 4', 10, 1, line_number=4)
+        response, _ = self.report('summary', 'json', database_filter='T24VN')
+        self.assertEqual(response['X-Report-Cache'], 'hit')
+
+    def test_abandoned_stream_is_not_cached(self):
+        response = StreamingHttpResponse(iter([b'a', b'b']), content_type='text/csv')
+        content = report_cache._tee('abandoned', response, iter([b'a', b'b']))
+        self.assertEqual(next(content), b'a')
+        # Client ngắt kết nối: generator bị đóng giữa chừng
+        content.close()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+        content = report_cache._tee('complete', response, iter([b'a', b'b']))
+        self.assertEqual(b''.join(content), b'ab')
+        self.assertEqual(self.cached_files(), ['complete.bin'])
+
+    def test_least_recently_used_reports_are_evicted(self):
+        self.report('detailed', 'json')
+        self.report('abnormal', 'json')
+        self.report('summary', 'json')
+        files = self.cached_files()
+        self.assertEqual(len(files), 3)
+
+        # File được đọc gần nhất là file cuối cùng bị xóa
+        paths = [os.path.join(self.cache_dir, name) for name in files]
+        for age, path in enumerate(paths):
+            os.utime(path, (1000 + age, 1000 + age))
+        oldest = files[0]
+        limit = sum(os.path.getsize(path) for path in paths[1:])
+        self.assertEqual(report_cache.evict(limit), 1)
+        self.assertEqual(self.cached_files(), files[1:])
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, oldest[:-4] + '.json')))
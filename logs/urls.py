@@ -15,6 +15,9 @@ urlpatterns = [
     path('log-files/', views.log_files, name='log_files'),
     path('abnormal-queries/', views.abnormal_queries, name='abnormal_queries'),
     path('generate-report/', views.generate_report, name='generate_report'),
+    path('reports/', views.report_jobs, name='report_jobs'),
+    path('reports/<int:job_id>/status/', views.report_job_status, name='report_job_status'),
+    path('reports/<int:job_id>/download/', views.report_job_download, name='report_job_download'),
     path('import-log/', views.import_log_file, name='import_log_file'),
     path('api/logs/', views.api_logs, name='api_logs'),
     
@@ -1,7 +1,8 @@
-from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import FileResponse, JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Count, Avg, Sum
+from django.db.models import Count, Avg
+from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -9,21 +10,56 @@ from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 import pandas as pd
-import io
-import csv
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import os
-from datetime import datetime
+import hashlib
+import itertools
+from datetime import date, datetime, timedelta
 import json
-from .models import SqlLog, LogFile
+from .models import SqlLog, LogFile, ReportJob
 from .sql_analyzer import SQLAnalyzer
 from .forms import LogImportForm
+from .ingestion import iter_uploaded_lines, upload_source, SqlLogBatchWriter
+from .rollups import cached_statistics, count_logs
+from .reports import REPORT_TYPES, build_report, pdf_sync_row_limit, report_row_count
+from . import report_cache
+from .pagination import keyset_paginate
+
+
+def parse_per_page(value, default=20, maximum=100):
+    """Số dòng mỗi trang từ query string, giới hạn trong [1, maximum]"""
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_date_range(request):
+    """
+    Điều kiện created_at theo tham số date_from/date_to (YYYY-MM-DD, tính cả hai ngày)
+
+    So sánh trực tiếp trên created_at (không dùng __date) để PostgreSQL loại bỏ được
+    các phân vùng tháng không liên quan khi SqlLog được phân vùng.
+
+    Returns:
+        (filters, values): kwargs cho filter() và các giá trị hợp lệ để hiển thị lại
+    """
+    filters = {}
+    values = {}
+    for param, lookup, offset in (('date_from', 'created_at__gte', 0), ('date_to', 'created_at__lt', 1)):
+        value = request.GET.get(param, '')
+        try:
+            day = date.fromisoformat(value) + timedelta(days=offset)
+        except ValueError:
+            continue
+        filters[lookup] = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        values[param] = value
+    return filters, values
+
+
+def approximate_total(database_names, date_filters):
+    """Tổng số logs gần đúng từ bảng tổng hợp (thống kê đã cache nếu không lọc ngày)"""
+    if not date_filters:
+        return cached_statistics(database_names)['summary']['total_logs']
+    return count_logs(database_names, date_filters.get('created_at__gte'), date_filters.get('created_at__lt'))
 
 
 def get_user_accessible_databases(user):
@@ -34,39 +70,13 @@ def get_user_accessible_databases(user):
         return user.get_accessible_databases()
 
 
-def register_vietnamese_font():
-    """Đăng ký font hỗ trợ tiếng Việt cho ReportLab"""
-    try:
-        # Thử các font hệ thống Windows có sẵn
-        font_paths = [
-            'C:/Windows/Fonts/arial.ttf',
-            'C:/Windows/Fonts/arialuni.ttf', 
-            'C:/Windows/Fonts/tahoma.ttf',
-            'C:/Windows/Fonts/calibri.ttf',
-            'C:/Windows/Fonts/segoeui.ttf'
-        ]
-        
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    pdfmetrics.registerFont(TTFont('VietnameseFont', font_path))
-                    return True
-                except:
-                    continue
-        
-        # Fallback: sử dụng font mặc định
-        return False
-    except:
-        return False
-
-
 @login_required
 def index(request):
     """Trang chủ hiển thị danh sách logs"""
     # Lấy tham số từ request
-    page_number = request.GET.get('page', 1)
+    cursor = request.GET.get('cursor', '')
     database_filter = request.GET.get('database', '')
-    per_page = request.GET.get('per_page', 20)
+    per_page = parse_per_page(request.GET.get('per_page'))
     
     # Lấy danh sách database user có quyền truy cập
     user_accessible_databases = get_user_accessible_databases(request.user)
@@ -82,16 +92,25 @@ def index(request):
     if database_filter:
         logs_query = logs_query.filter(database_name=database_filter)
     
-    # Phân trang
-    paginator = Paginator(logs_query, per_page)
-    page_obj = paginator.get_page(page_number)
+    # Lọc theo khoảng ngày
+    date_filters, date_values = get_date_range(request)
+    logs_query = logs_query.filter(**date_filters)
+    
+    # Phân trang keyset theo (created_at, id), không COUNT(*) và OFFSET
+    try:
+        page_obj = keyset_paginate(logs_query, cursor, per_page)
+    except ValueError:
+        page_obj = keyset_paginate(logs_query, None, per_page)
     
     # Lấy danh sách database user có quyền truy cập
     databases = user_accessible_databases
     
     # Kiểm tra có dữ liệu cho database được chọn không
     has_data = logs_query.exists() if database_filter else True
-    total_count = paginator.count
+    # Tổng gần đúng từ bảng tổng hợp
+    total_count = approximate_total(
+        [database_filter] if database_filter else user_accessible_databases, date_filters
+    )
     
     context = {
         'page_obj': page_obj,
@@ -100,6 +119,7 @@ def index(request):
         'per_page': per_page,
         'has_data': has_data,
         'total_count': total_count,
+        **date_values,
     }
     
     return render(request, 'logs/index.html', context)
@@ -116,6 +136,7 @@ def statistics(request):
     
     # Query logs cơ bản - chỉ lấy logs từ databases user có quyền
     logs_query = SqlLog.objects.filter(database_name__in=user_accessible_databases)
+    selected_databases = user_accessible_databases
     if database_filter:
         # Kiểm tra quyền database nếu có filter
         if not request.user.has_database_permission(database_filter):
@@ -123,20 +144,17 @@ def statistics(request):
             database_filter = ''
         else:
             logs_query = logs_query.filter(database_name=database_filter)
-    
-    # Thống kê tổng quan
-    total_logs = logs_query.count()
-    total_exec_time = logs_query.aggregate(total=Sum('exec_time_ms'))['total'] or 0
-    total_exec_count = logs_query.aggregate(total=Sum('exec_count'))['total'] or 0
-    avg_exec_time = logs_query.aggregate(avg=Avg('exec_time_ms'))['avg'] or 0
-    
-    # Thống kê theo database (chỉ databases user có quyền)
-    db_stats = logs_query.values('database_name').annotate(
-        count=Count('id'),
-        total_exec_time=Sum('exec_time_ms'),
-        total_exec_count=Sum('exec_count'),
-        avg_exec_time=Avg('exec_time_ms')
-    ).order_by('-count')
+            selected_databases = [database_filter]
+    
+    # Thống kê tổng quan, theo database và top mẫu câu SQL: đọc từ bảng tổng hợp
+    # trong một truy vấn, cache đến khi có dữ liệu mới cho các database này
+    stats = cached_statistics(selected_databases)
+    summary = stats['summary']
+    db_stats = stats['db_stats']
+    total_logs = summary['total_logs']
+    total_exec_time = summary['total_exec_time']
+    total_exec_count = summary['total_exec_count']
+    avg_exec_time = summary['avg_exec_time']
     
     # Phân loại databases
     databases_with_data = [stat['database_name'] for stat in db_stats if stat['count'] > 0]
@@ -148,16 +166,17 @@ def statistics(request):
     # Top queries được thực thi nhiều nhất (theo filter)
     most_executed = logs_query.order_by('-exec_count')[:10]
     
-    # Thống kê theo thời gian (theo filter)
-    recent_logs = logs_query.filter(
-        created_at__gte=timezone.now() - timezone.timedelta(days=7)
-    ).count()
+    # Top mẫu câu SQL theo tổng thời gian (GROUP BY fingerprint_id trên bảng tổng hợp)
+    template_stats = stats['top_templates']
+    
+    # Thống kê theo thời gian (theo filter, từ bucket theo giờ)
+    recent_logs = summary['recent_logs']
     
     # Lấy danh sách databases để filter (chỉ databases user có quyền)
     all_databases = user_accessible_databases
     
     # Kiểm tra có dữ liệu cho database được chọn không
-    has_data = logs_query.exists() if database_filter else True
+    has_data = total_logs > 0 if database_filter else True
     
     context = {
         'total_logs': total_logs,
@@ -169,6 +188,7 @@ def statistics(request):
         'databases_without_data': databases_without_data,
         'slowest_queries': slowest_queries,
         'most_executed': most_executed,
+        'top_templates': template_stats,
         'recent_logs': recent_logs,
         'all_databases': all_databases,
         'selected_database': database_filter,
@@ -217,6 +237,10 @@ def abnormal_queries(request):
         else:
             abnormal_query = abnormal_query.filter(database_name=database_filter)
     
+    # Lọc theo khoảng ngày
+    date_filters, date_values = get_date_range(request)
+    abnormal_query = abnormal_query.filter(**date_filters)
+    
     # Phân trang
     paginator = Paginator(abnormal_query, per_page)
     page_obj = paginator.get_page(page_number)
@@ -226,7 +250,7 @@ def abnormal_queries(request):
     
     # Thống kê truy vấn bất thường (chỉ trong databases user có quyền)
     total_abnormal = abnormal_query.count()
-    total_logs = SqlLog.objects.filter(database_name__in=user_accessible_databases).count()
+    total_logs = SqlLog.objects.filter(database_name__in=user_accessible_databases, **date_filters).count()
     abnormal_percentage = (total_abnormal / total_logs * 100) if total_logs > 0 else 0
     
     # Thống kê theo database
@@ -255,6 +279,7 @@ def abnormal_queries(request):
         'abnormal_percentage': round(abnormal_percentage, 2),
         'db_abnormal_stats': db_abnormal_stats,
         'has_data': abnormal_query.exists() if database_filter else True,
+        **date_values,
     }
     
     return render(request, 'logs/abnormal_queries.html', context)
@@ -263,9 +288,10 @@ def abnormal_queries(request):
 @login_required
 def api_logs(request):
     """API endpoint để lấy dữ liệu logs dưới dạng JSON"""
-    page_number = request.GET.get('page', 1)
+    cursor = request.GET.get('cursor', '')
     database_filter = request.GET.get('database', '')
-    per_page = min(int(request.GET.get('per_page', 20)), 100)  # Giới hạn tối đa 100
+    per_page = parse_per_page(request.GET.get('per_page'))  # Giới hạn tối đa 100
+    include_total = request.GET.get('include_total', '') in ('1', 'true')
     
     # Lấy danh sách database user có quyền truy cập
     user_accessible_databases = get_user_accessible_databases(request.user)
@@ -279,9 +305,15 @@ def api_logs(request):
             return JsonResponse({'error': f'Bạn không có quyền truy cập database "{database_filter}"!'}, status=403)
         logs_query = logs_query.filter(database_name=database_filter)
     
-    # Phân trang
-    paginator = Paginator(logs_query, per_page)
-    page_obj = paginator.get_page(page_number)
+    # Lọc theo khoảng ngày (date_from/date_to)
+    date_filters, _ = get_date_range(request)
+    logs_query = logs_query.filter(**date_filters)
+    
+    # Phân trang keyset: cursor next/prev lấy từ response trước
+    try:
+        page_obj = keyset_paginate(logs_query, cursor, per_page)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     # Chuyển đổi thành JSON
     logs_data = []
@@ -299,11 +331,15 @@ def api_logs(request):
     return JsonResponse({
         'logs': logs_data,
         'pagination': {
-            'current_page': page_obj.number,
-            'total_pages': paginator.num_pages,
-            'total_count': paginator.count,
-            'has_next': page_obj.has_next(),
-            'has_previous': page_obj.has_previous(),
+            'per_page': per_page,
+            'next': page_obj.next_cursor,
+            'prev': page_obj.prev_cursor,
+            'has_next': page_obj.has_next,
+            'has_previous': page_obj.has_previous,
+            # Tổng gần đúng (từ bảng tổng hợp), chỉ trả về khi được yêu cầu
+            'approximate_total': approximate_total(
+                [database_filter] if database_filter else user_accessible_databases, date_filters
+            ) if include_total else None,
         }
     })
 
@@ -319,22 +355,40 @@ def generate_report(request):
         # Lấy danh sách database user có quyền truy cập
         user_accessible_databases = get_user_accessible_databases(request.user)
         
-        # Lấy dữ liệu theo filter - chỉ databases user có quyền
-        logs_query = SqlLog.objects.filter(database_name__in=user_accessible_databases)
         if database_filter:
             # Kiểm tra quyền database nếu có filter
             if not request.user.has_database_permission(database_filter):
                 messages.error(request, f'Bạn không có quyền truy cập database "{database_filter}"!')
                 return redirect('logs:generate_report')
-            logs_query = logs_query.filter(database_name=database_filter)
         
-        if report_type == 'summary':
-            return generate_summary_report(logs_query, format_type, database_filter)
-        elif report_type == 'detailed':
-            return generate_detailed_report(logs_query, format_type, database_filter)
-        elif report_type == 'abnormal':
-            abnormal_query = logs_query.filter(exec_time_ms__gt=500, exec_count__gt=100)
-            return generate_abnormal_report(abnormal_query, format_type, database_filter)
+        run_in_background = report_type in REPORT_TYPES and request.POST.get('run_in_background')
+        sync_limit = pdf_sync_row_limit()
+        if report_type in REPORT_TYPES and not run_in_background and format_type == 'pdf' and sync_limit:
+            # PDF nhiều dòng mất hàng chục giây để dựng: tự chuyển sang tạo nền (trừ khi đã có trong cache)
+            total = report_row_count(report_type, format_type, user_accessible_databases, database_filter)
+            if total is not None and total > sync_limit:
+                cached = report_cache.get(
+                    report_cache.report_key(report_type, format_type, user_accessible_databases, database_filter)
+                )
+                if cached is not None:
+                    return cached
+                run_in_background = True
+                messages.info(request, f'Báo cáo PDF có {total} dòng (hơn {sync_limit}) nên được tạo nền.')
+        
+        if run_in_background:
+            # Báo cáo lớn: đưa vào hàng đợi cho run_report_worker thay vì tạo trong request
+            job = ReportJob.objects.create(
+                user=request.user,
+                report_type=report_type,
+                format_type=format_type if format_type in ('csv', 'pdf', 'json') else 'json',
+                database_filter=database_filter,
+                database_names=list(user_accessible_databases),
+            )
+            messages.success(request, f'Đã đưa báo cáo #{job.id} vào hàng đợi. Trang sẽ tự cập nhật khi báo cáo sẵn sàng.')
+            return redirect('logs:report_jobs')
+        
+        if report_type in REPORT_TYPES:
+            return build_report(report_type, format_type, user_accessible_databases, database_filter)
     
     # GET request - hiển thị form
     databases = get_user_accessible_databases(request.user)
@@ -344,485 +398,41 @@ def generate_report(request):
     return render(request, 'logs/report.html', context)
 
 
-def generate_summary_report(logs_query, format_type, database_filter):
-    """Tạo báo cáo tổng hợp"""
-    # Thống kê tổng quan
-    total_logs = logs_query.count()
-    total_exec_time = logs_query.aggregate(total=Sum('exec_time_ms'))['total'] or 0
-    total_exec_count = logs_query.aggregate(total=Sum('exec_count'))['total'] or 0
-    avg_exec_time = logs_query.aggregate(avg=Avg('exec_time_ms'))['avg'] or 0
-    
-    # Thống kê theo database
-    db_stats = logs_query.values('database_name').annotate(
-        count=Count('id'),
-        total_exec_time=Sum('exec_time_ms'),
-        total_exec_count=Sum('exec_count'),
-        avg_exec_time=Avg('exec_time_ms')
-    ).order_by('-count')
-    
-    # Top queries chậm nhất
-    slowest_queries = logs_query.order_by('-exec_time_ms')[:10]
-    
-    # Top queries được thực thi nhiều nhất
-    most_executed = logs_query.order_by('-exec_count')[:10]
-    
-    data = {
-        'summary': {
-            'total_logs': total_logs,
-            'total_exec_time': total_exec_time,
-            'total_exec_count': total_exec_count,
-            'avg_exec_time': round(avg_exec_time, 2) if avg_exec_time else 0,
-            'database_filter': database_filter,
-            'generated_at': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-        },
-        'db_stats': list(db_stats),
-        'slowest_queries': [
-            {
-                'database_name': q.database_name,
-                'sql_query': q.sql_query[:100] + '...' if len(q.sql_query) > 100 else q.sql_query,
-                'exec_time_ms': q.exec_time_ms,
-                'exec_count': q.exec_count,
-                'avg_time_per_execution': float(q.avg_time_per_execution)
-            } for q in slowest_queries
-        ],
-        'most_executed': [
-            {
-                'database_name': q.database_name,
-                'sql_query': q.sql_query[:100] + '...' if len(q.sql_query) > 100 else q.sql_query,
-                'exec_time_ms': q.exec_time_ms,
-                'exec_count': q.exec_count,
-                'avg_time_per_execution': float(q.avg_time_per_execution)
-            } for q in most_executed
-        ]
+@login_required
+def report_jobs(request):
+    """Danh sách báo cáo tạo nền của user"""
+    jobs = ReportJob.objects.filter(user=request.user).order_by('-created_at')[:50]
+    return render(request, 'logs/report_jobs.html', {'jobs': jobs})
+
+
+def report_job_data(job):
+    """Trạng thái job dạng dict cho API"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'error_message': job.error_message,
+        'download_url': reverse('logs:report_job_download', args=[job.id]) if job.status == 'completed' else None,
     }
-    
-    if format_type == 'csv':
-        return export_summary_csv(data)
-    elif format_type == 'pdf':
-        return export_summary_pdf(data)
-    else:
-        return JsonResponse(data)
-
-
-def generate_detailed_report(logs_query, format_type, database_filter):
-    """Tạo báo cáo chi tiết"""
-    logs_data = logs_query.order_by('-created_at')
-    
-    data = [
-        {
-            'ID': log.id,
-            'Database': log.database_name,
-            'SQL Query': log.sql_query,
-            'Thời gian (ms)': log.exec_time_ms,
-            'Số lần thực thi': log.exec_count,
-            'Thời gian TB (ms)': round(float(log.avg_time_per_execution), 2),
-            'Dòng số': log.line_number or '',
-            'Thời gian tạo': log.created_at.strftime('%d/%m/%Y %H:%M:%S')
-        } for log in logs_data
-    ]
-    
-    if format_type == 'csv':
-        return export_detailed_csv(data, database_filter)
-    elif format_type == 'pdf':
-        return export_detailed_pdf(data, database_filter)
-    else:
-        return JsonResponse({'logs': data})
-
-
-def generate_abnormal_report(abnormal_query, format_type, database_filter):
-    """Tạo báo cáo truy vấn bất thường"""
-    abnormal_data = abnormal_query.order_by('-exec_time_ms')
-    
-    data = [
-        {
-            'ID': log.id,
-            'Database': log.database_name,
-            'SQL Query': log.sql_query[:100] + '...' if len(log.sql_query) > 100 else log.sql_query,
-            'Thời gian (ms)': log.exec_time_ms,
-            'Số lần thực thi': log.exec_count,
-            'Thời gian TB (ms)': round(float(log.avg_time_per_execution), 2),
-            'Mức độ nghiêm trọng': 'Rất cao' if log.exec_time_ms > 2000 and log.exec_count > 500 else 
-                                  'Cao' if log.exec_time_ms > 1000 and log.exec_count > 200 else 'Trung bình',
-            'Dòng số': log.line_number or '',
-            'Thời gian tạo': log.created_at.strftime('%d/%m/%Y %H:%M:%S')
-        } for log in abnormal_data
-    ]
-    
-    if format_type == 'csv':
-        return export_abnormal_csv(data, database_filter)
-    elif format_type == 'pdf':
-        return export_abnormal_pdf(data, database_filter)
-    else:
-        return JsonResponse({'abnormal_logs': data})
 
 
-def export_summary_csv(data):
-    """Xuất báo cáo tổng hợp ra CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="bao_cao_tong_hop_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Header
-    writer.writerow(['BÁO CÁO TỔNG HỢP SQL LOGS'])
-    writer.writerow(['Thời gian tạo:', data['summary']['generated_at']])
-    writer.writerow(['Database filter:', data['summary']['database_filter'] or 'Tất cả'])
-    writer.writerow([])
-    
-    # Thống kê tổng quan
-    writer.writerow(['THỐNG KÊ TỔNG QUAN'])
-    writer.writerow(['Tổng số logs:', data['summary']['total_logs']])
-    writer.writerow(['Tổng thời gian (ms):', data['summary']['total_exec_time']])
-    writer.writerow(['Tổng số lần thực thi:', data['summary']['total_exec_count']])
-    writer.writerow(['Thời gian TB (ms):', data['summary']['avg_exec_time']])
-    writer.writerow([])
-    
-    # Thống kê theo database
-    writer.writerow(['THỐNG KÊ THEO DATABASE'])
-    writer.writerow(['Database', 'Số logs', 'Tổng thời gian (ms)', 'Tổng số lần thực thi', 'Thời gian TB (ms)'])
-    for stat in data['db_stats']:
-        writer.writerow([
-            stat['database_name'],
-            stat['count'],
-            stat['total_exec_time'],
-            stat['total_exec_count'],
-            round(stat['avg_exec_time'], 2) if stat['avg_exec_time'] else 0
-        ])
-    writer.writerow([])
-    
-    # Top queries chậm nhất
-    writer.writerow(['TOP 10 QUERIES CHẬM NHẤT'])
-    writer.writerow(['Database', 'SQL Query', 'Thời gian (ms)', 'Số lần thực thi', 'Thời gian TB (ms)'])
-    for query in data['slowest_queries']:
-        writer.writerow([
-            query['database_name'],
-            query['sql_query'],
-            query['exec_time_ms'],
-            query['exec_count'],
-            query['avg_time_per_execution']
-        ])
-    writer.writerow([])
-    
-    # Top queries được thực thi nhiều nhất
-    writer.writerow(['TOP 10 QUERIES ĐƯỢC THỰC THI NHIỀU NHẤT'])
-    writer.writerow(['Database', 'SQL Query', 'Thời gian (ms)', 'Số lần thực thi', 'Thời gian TB (ms)'])
-    for query in data['most_executed']:
-        writer.writerow([
-            query['database_name'],
-            query['sql_query'],
-            query['exec_time_ms'],
-            query['exec_count'],
-            query['avg_time_per_execution']
-        ])
-    
-    return response
-
-
-def export_summary_pdf(data):
-    """Xuất báo cáo tổng hợp ra PDF"""
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="bao_cao_tong_hop_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Đăng ký font tiếng Việt
-    font_registered = register_vietnamese_font()
-    font_name = 'VietnameseFont' if font_registered else 'Helvetica'
-    
-    # Tạo các style với font tiếng Việt
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_name,
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontName=font_name,
-        fontSize=14,
-        spaceAfter=12
-    )
-    story.append(Paragraph("BÁO CÁO TỔNG HỢP SQL LOGS", title_style))
-    story.append(Spacer(1, 12))
-    
-    # Thông tin báo cáo
-    info_data = [
-        ['Thời gian tạo:', data['summary']['generated_at']],
-        ['Database filter:', data['summary']['database_filter'] or 'Tất cả'],
-    ]
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), font_name),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    story.append(info_table)
-    story.append(Spacer(1, 20))
-    
-    # Thống kê tổng quan
-    story.append(Paragraph("THỐNG KÊ TỔNG QUAN", heading_style))
-    summary_data = [
-        ['Chỉ số', 'Giá trị'],
-        ['Tổng số logs', str(data['summary']['total_logs'])],
-        ['Tổng thời gian (ms)', str(data['summary']['total_exec_time'])],
-        ['Tổng số lần thực thi', str(data['summary']['total_exec_count'])],
-        ['Thời gian TB (ms)', str(data['summary']['avg_exec_time'])],
-    ]
-    summary_table = Table(summary_data, colWidths=[2*inch, 2*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, -1), font_name),  # Set font cho tất cả các dòng
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),  # Font size cho dữ liệu
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(summary_table)
-    story.append(Spacer(1, 20))
-    
-    # Thống kê theo database
-    story.append(Paragraph("THỐNG KÊ THEO DATABASE", heading_style))
-    db_data = [['Database', 'Số logs', 'Tổng thời gian (ms)', 'Tổng số lần thực thi', 'Thời gian TB (ms)']]
-    for stat in data['db_stats']:
-        db_data.append([
-            stat['database_name'],
-            str(stat['count']),
-            str(stat['total_exec_time']),
-            str(stat['total_exec_count']),
-            str(round(stat['avg_exec_time'], 2)) if stat['avg_exec_time'] else '0'
-        ])
-    
-    db_table = Table(db_data, colWidths=[1.2*inch, 0.8*inch, 1.2*inch, 1.2*inch, 1.2*inch])
-    db_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, -1), font_name),  # Set font cho tất cả các dòng
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    story.append(db_table)
-    
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    return response
-
-
-def export_detailed_csv(data, database_filter):
-    """Xuất báo cáo chi tiết ra CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="bao_cao_chi_tiet_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Header
-    writer.writerow(['BÁO CÁO CHI TIẾT SQL LOGS'])
-    writer.writerow(['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')])
-    writer.writerow(['Database filter:', database_filter or 'Tất cả'])
-    writer.writerow([])
-    
-    # Data headers
-    if data:
-        writer.writerow(data[0].keys())
-        for row in data:
-            writer.writerow(row.values())
-    
-    return response
-
-
-def export_detailed_pdf(data, database_filter):
-    """Xuất báo cáo chi tiết ra PDF"""
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="bao_cao_chi_tiet_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Đăng ký font tiếng Việt
-    font_registered = register_vietnamese_font()
-    font_name = 'VietnameseFont' if font_registered else 'Helvetica'
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_name,
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("BÁO CÁO CHI TIẾT SQL LOGS", title_style))
-    story.append(Spacer(1, 12))
-    
-    # Thông tin báo cáo
-    info_data = [
-        ['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
-        ['Database filter:', database_filter or 'Tất cả'],
-        ['Tổng số records:', str(len(data))],
-    ]
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), font_name),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    story.append(info_table)
-    story.append(Spacer(1, 20))
-    
-    # Data table
-    if data:
-        headers = list(data[0].keys())
-        table_data = [headers]
-        
-        for row in data[:50]:  # Limit to 50 rows for PDF
-            table_data.append([str(row[header]) for header in headers])
-        
-        data_table = Table(table_data, colWidths=[0.8*inch] * len(headers))
-        data_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), font_name),  # Set font cho tất cả các dòng
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 6),
-        ]))
-        story.append(data_table)
-        
-        if len(data) > 50:
-            story.append(Spacer(1, 12))
-            story.append(Paragraph(f"* Chỉ hiển thị 50 records đầu tiên trong tổng số {len(data)} records", styles['Normal']))
-    
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    return response
-
-
-def export_abnormal_csv(data, database_filter):
-    """Xuất báo cáo truy vấn bất thường ra CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="bao_cao_bat_thuong_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Header
-    writer.writerow(['BÁO CÁO TRUY VẤN BẤT THƯỜNG'])
-    writer.writerow(['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')])
-    writer.writerow(['Database filter:', database_filter or 'Tất cả'])
-    writer.writerow(['Quy tắc: exec_time_ms > 500 VÀ exec_count > 100'])
-    writer.writerow([])
-    
-    # Data headers
-    if data:
-        writer.writerow(data[0].keys())
-        for row in data:
-            writer.writerow(row.values())
-    
-    return response
-
-
-def export_abnormal_pdf(data, database_filter):
-    """Xuất báo cáo truy vấn bất thường ra PDF"""
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="bao_cao_bat_thuong_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Đăng ký font tiếng Việt
-    font_registered = register_vietnamese_font()
-    font_name = 'VietnameseFont' if font_registered else 'Helvetica'
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_name,
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
+@login_required
+def report_job_status(request, job_id):
+    """API trạng thái một báo cáo tạo nền (trang danh sách poll định kỳ)"""
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+    return JsonResponse(report_job_data(job))
+
+
+@login_required
+def report_job_download(request, job_id):
+    """Tải file của báo cáo tạo nền đã hoàn thành"""
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user, status='completed')
+    return FileResponse(
+        job.artifact.open('rb'), as_attachment=True, filename=job.file_name, content_type=job.content_type
     )
-    story.append(Paragraph("BÁO CÁO TRUY VẤN BẤT THƯỜNG", title_style))
-    story.append(Spacer(1, 12))
-    
-    # Thông tin báo cáo
-    info_data = [
-        ['Thời gian tạo:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
-        ['Database filter:', database_filter or 'Tất cả'],
-        ['Quy tắc:', 'exec_time_ms > 500 VÀ exec_count > 100'],
-        ['Tổng số records:', str(len(data))],
-    ]
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), font_name),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    story.append(info_table)
-    story.append(Spacer(1, 20))
-    
-    # Data table
-    if data:
-        headers = list(data[0].keys())
-        table_data = [headers]
-        
-        for row in data:
-            table_data.append([str(row[header]) for header in headers])
-        
-        data_table = Table(table_data, colWidths=[0.7*inch] * len(headers))
-        data_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), font_name),  # Set font cho tất cả các dòng
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 6),
-        ]))
-        story.append(data_table)
-    
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    return response
 
 
 @login_required
@@ -834,6 +444,7 @@ def import_log_file(request):
             log_file = form.cleaned_data['log_file']
             database_name = form.cleaned_data['database_name']
             skip_unauthorized = form.cleaned_data['skip_unauthorized']
+            deduplicate = form.cleaned_data['deduplicate']
             
             # Kiểm tra quyền database
             user_accessible_databases = get_user_accessible_databases(request.user)
@@ -848,12 +459,16 @@ def import_log_file(request):
             
             # Xử lý import file
             try:
-                result = process_log_file(log_file, database_name, request.user, skip_unauthorized)
+                result = process_log_file(log_file, database_name, request.user, skip_unauthorized, deduplicate)
                 
                 if result['success']:
                     messages.success(request, f'Import thành công! Đã thêm {result["imported_count"]} logs từ database "{database_name}".')
+                    if result['duplicate_count'] > 0:
+                        messages.info(request, f'Đã bỏ qua {result["duplicate_count"]} dòng đã được import trước đó.')
                     if result['skipped_count'] > 0:
                         messages.warning(request, f'Đã bỏ qua {result["skipped_count"]} logs do không có quyền truy cập.')
+                    if result['errors']:
+                        messages.warning(request, f'Một số batch ghi lỗi: {"; ".join(result["errors"])}')
                 else:
                     messages.error(request, f'Import thất bại: {result["error"]}')
                     
@@ -880,21 +495,28 @@ def import_log_file(request):
     return render(request, 'logs/import_log.html', context)
 
 
-def process_log_file(log_file, database_name, user, skip_unauthorized=True):
+def process_log_file(log_file, database_name, user, skip_unauthorized=True, deduplicate=False):
     """Xử lý file log và import vào database"""
     try:
-        # Đọc nội dung file
-        content = log_file.read().decode('utf-8', errors='ignore')
-        lines = content.split('\n')
-        
-        imported_count = 0
         skipped_count = 0
         error_count = 0
         
         # Lấy danh sách database user có quyền
         user_accessible_databases = get_user_accessible_databases(user)
         
-        for line_num, line in enumerate(lines, 1):
+        # Đọc file theo từng chunk thay vì nạp toàn bộ nội dung vào bộ nhớ,
+        # checksum được tính trong cùng lượt đọc
+        digest = hashlib.sha256()
+        lines = iter_uploaded_lines(log_file, digest=digest)
+        first_line = next(lines)
+        
+        # Ghi theo batch bằng bulk_create thay vì save() từng dòng
+        # (kích thước batch lấy từ settings.LOG_IMPORT_BATCH_SIZE). Nếu deduplicate, các
+        # dòng đã import từ file có cùng dòng đầu tiên (cùng số dòng, thời gian và nội
+        # dung) được bỏ qua, kể cả khi file được upload dưới tên khác
+        writer = SqlLogBatchWriter(deduplicate=deduplicate, source=upload_source(first_line))
+        
+        for line_num, line in enumerate(itertools.chain([first_line], lines), 1):
             line = line.strip()
             if not line or line.startswith('#'):
                 continue
@@ -915,6 +537,8 @@ def process_log_file(log_file, database_name, user, skip_unauthorized=True):
                             skipped_count += 1
                             continue
                         else:
+                            # Giữ lại các dòng hợp lệ đã đọc trước dòng lỗi
+                            writer.flush()
                             return {
                                 'success': False,
                                 'error': f'Dòng {line_num}: Không có quyền truy cập database "{db_name}"'
@@ -922,7 +546,8 @@ def process_log_file(log_file, database_name, user, skip_unauthorized=True):
                     
                     # Parse timestamp
                     try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
+                        # Thời gian trong file log là giờ địa phương (TIME_ZONE)
+                        timestamp = timezone.make_aware(datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S'))
                     except ValueError:
                         timestamp = timezone.now()
                     
@@ -934,49 +559,63 @@ def process_log_file(log_file, database_name, user, skip_unauthorized=True):
                         exec_time_ms = 0
                         exec_count = 1
                     
-                    # Tạo SqlLog object
-                    sql_log = SqlLog(
-                        database_name=db_name,
-                        sql_query=sql_query,
-                        exec_time_ms=exec_time_ms,
-                        exec_count=exec_count,
-                        created_at=timestamp,
-                        line_number=line_num
-                    )
-                    sql_log.save()
-                    imported_count += 1
-                    
                 else:
                     error_count += 1
+                    continue
                     
             except Exception as e:
                 error_count += 1
                 if not skip_unauthorized:
+                    writer.flush()
                     return {
                         'success': False,
                         'error': f'Dòng {line_num}: {str(e)}'
                     }
+                continue
+            
+            # Ngoài try của từng dòng: lỗi khi ghi batch không bị tính thành lỗi của một dòng
+            writer.add(db_name, sql_query, exec_time_ms, exec_count,
+                       line_number=line_num, created_at=timestamp)
+        
+        # Ghi batch cuối cùng
+        writer.flush()
+        imported_count = writer.written_count
+        # Các dòng thuộc batch ghi lỗi được tính là lỗi
+        error_count += writer.failed_count
         
         # Tạo LogFile record
         LogFile.objects.create(
             file_name=log_file.name,
+            file_path=log_file.name,
             file_size=log_file.size,
+            checksum=digest.hexdigest(),
             processed_at=timezone.now(),
             processed_by=user,
             imported_count=imported_count,
             skipped_count=skipped_count,
-            error_count=error_count
+            error_count=error_count,
+            duplicate_lines=writer.duplicate_count,
+            error_details='\n'.join(writer.errors) if writer.errors else None
         )
         
+        # Batch ghi lỗi: thất bại nếu không ghi được dòng nào hoặc không cho phép bỏ qua lỗi
+        if writer.failed_count and (not imported_count or not skip_unauthorized):
+            return {
+                'success': False,
+                'error': f'Không ghi được {writer.failed_count} dòng: {"; ".join(writer.errors)}'
+            }
+        
         return {
             'success': True,
             'imported_count': imported_count,
             'skipped_count': skipped_count,
-            'error_count': error_count
+            'error_count': error_count,
+            'duplicate_count': writer.duplicate_count,
+            'errors': writer.errors,
         }
         
     except Exception as e:
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
@@ -4,23 +4,16 @@
 Script test đơn giản để kiểm tra việc đọc file log
 """
 
-import re
 from typing import List, Dict, Optional
 
+from logs import parsing
+
 def parse_log_line(line: str) -> Optional[Dict]:
     """Parse một dòng log thành dictionary"""
     try:
-        pattern = r'DB:([^,]+),sql:([^,]+),exec_time_ms:(\d+),exec_count:(\d+)'
-        match = re.match(pattern, line.strip())
-        
-        if match:
-            database_name, sql_query, exec_time_ms, exec_count = match.groups()
-            return {
-                'database_name': database_name,
-                'sql_query': sql_query,
-                'exec_time_ms': int(exec_time_ms),
-                'exec_count': int(exec_count)
-            }
+        parsed = parsing.parse_log_line(line)
+        if parsed:
+            return dict(zip(parsing.LOG_FIELDS, parsed))
         return None
     except Exception as e:
         print(f"Lỗi khi parse dòng '{line}': {e}")